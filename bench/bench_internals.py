@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# Micro-benchmarks for the pure-Python hot paths of FSM handling and MCTS.
+# Synthetic protocol-like FSMs (layered states, reset edges, self-loops and
+# learned H-states with probe loops) and MCTS trees of growing size are
+# generated from a seed; every operation is timed and its peak traced memory
+# recorded, then compared with the stored baseline. A run exits 1 when any
+# operation is slower or bigger than the baseline by more than the tolerance.
+#
+#   ./bench/bench_internals.py                 # compare with bench/baselines/internals.json
+#   ./bench/bench_internals.py --save          # record a new baseline on this machine
+
+import argparse, gc, json, math, os, platform, random, sys, tempfile, time, tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fsm_helper import load_fsm, get_all_paths
+from objects import FSM, State, MCTSSchedule, MCTSNode
+from bench_mcts_backend import SynthFSM, grow_tree
+
+BASELINE = Path(__file__).resolve().parent / "baselines" / "internals.json"
+
+INPUTS = ["registrationRequest", "registrationRequestGUTI", "registrationComplete", "deregistrationRequest",
+          "serviceRequest", "securityModeReject", "authenticationResponse", "authenticationFailure",
+          "deregistrationAccept", "securityModeComplete", "identityResponse", "configurationUpdateComplete"]
+OUTPUTS = ["authenticationRequest", "securityModeCommand", "registrationAccept", "registrationReject",
+           "deregistrationAccept", "serviceReject", "serviceAccept", "identityRequest", "null_action"]
+
+# (layers, width, learned H-states) per FSM size
+FSM_SIZES = {"S": (4, 4, 4), "M": (6, 5, 16), "L": (8, 6, 48)}
+TREE_SIZES = (1000, 10000, 50000)
+MIN_BATCH_SEC = 0.05
+
+
+# ---------------- generators ---------------- #
+def synth_transitions(layers: int, width: int, seed: int, fanout: int = 2):
+    # s0 -> layer 1 -> ... -> layer N; every state resets to s0 and has self-loops
+    rng = random.Random(seed)
+    grid = [["s0"]] + [[f"s{1 + l * width + i}" for i in range(width)] for l in range(layers)]
+    states = [s for layer in grid for s in layer]
+    trans = []
+    for l, layer in enumerate(grid):
+        nxt = grid[l + 1] if l + 1 < len(grid) else []
+        for s in layer:
+            for dst in rng.sample(nxt, min(fanout, len(nxt))):
+                trans.append([s, rng.choice(INPUTS), rng.choice(OUTPUTS[:-1]), dst])
+            if s != "s0":
+                trans.append([s, "deregistrationRequest", "deregistrationAccept", "s0"])
+            for inp in rng.sample(INPUTS, 4):
+                trans.append([s, inp, "null_action", s])
+    return states, trans
+
+
+def write_dot(path: Path, states: list, trans: list):
+    lines = ["digraph g {", ""]
+    lines += [f'\t{s} [shape="circle" label="{s}"];' for s in states]
+    lines += [f'\t{t[0]} -> {t[3]} [label="{t[1]} / {t[2]}"];' for t in trans]
+    lines += ["", '__start0 [label="" shape="none" width="0" height="0"];', "__start0 -> s0;", "", "}"]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def add_learned(fsm: FSM, n: int, seed: int):
+    # what the worker leaves behind: fuzz-input edge into a new H-state plus its probe self-loops
+    rng = random.Random(seed)
+    names = fsm.get_state_names()
+    for _ in range(n):
+        src = rng.choice(names)
+        h = fsm.add_new_state()
+        msg = f"{rng.choice(INPUTS)}:{rng.getrandbits(64):016X}:1:2"
+        fsm.transitions.append([src, msg, rng.choice(OUTPUTS), h.name])
+        for inp in INPUTS:
+            fsm.transitions.append([h.name, inp, rng.choice(OUTPUTS), h.name])
+        get_all_paths(fsm, h)
+        h.oracle.decide_state(h)
+        for p in h.paths[:4]:
+            p.count = rng.randint(1, 50)
+            p.succ = rng.randint(0, p.count)
+    return fsm
+
+
+def build_fsm(dot: Path, layers: int, width: int, learned: int, seed: int) -> FSM:
+    with redirect_stdout(DEVNULL):
+        fsm = load_fsm(str(dot))
+        add_learned(fsm, learned, seed)
+    rng = random.Random(seed)
+    for s in fsm.states:
+        s.count = rng.randint(0, 100)
+        for t in fsm.transitions:
+            if t[0] == s.name and rng.random() < 0.3:
+                fsm.mark_edge(t[0], t[1], t[2], t[3])
+    return fsm
+
+
+def fresh_states(fsm: FSM) -> FSM:
+    # same graph, no paths yet
+    return FSM([State(s.name, []) for s in fsm.states], fsm.init_state, fsm.transitions)
+
+
+def grown_schedule(fsm, n_nodes: int, seed: int) -> MCTSSchedule:
+    sch = MCTSSchedule(fsm.init_state)
+    # grow_tree adds children directly, keep the schedule's node count in step
+    sch.n_nodes = grow_tree(sch, fsm, n_nodes, seed)
+    return sch
+
+
+# ---------------- measurement ---------------- #
+DEVNULL = open(os.devnull, "w")
+
+
+def measure(setup, run, n: int, repeat: int) -> dict:
+    # memory first (traced peak of one batch, independent of --repeat), then the best of
+    # `repeat` timed batches of n calls; the minimum is the least disturbed by other load
+    ctx = setup()
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    with redirect_stdout(DEVNULL):
+        run(ctx, n)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    times = []
+    nt = n
+    for i in range(repeat + 1):
+        ctx = setup()
+        gc.collect()
+        with redirect_stdout(DEVNULL):
+            t0 = time.perf_counter()
+            run(ctx, nt)
+            dt = time.perf_counter() - t0
+        if i == 0:
+            # calibration batch: grow short batches to MIN_BATCH_SEC so timer noise stays small
+            if dt < MIN_BATCH_SEC:
+                nt = n * math.ceil(MIN_BATCH_SEC / max(dt, 1e-6))
+            continue
+        times.append(dt / nt)
+    return {"n": nt, "sec": min(times), "peak_kb": peak / 1024.0}
+
+
+def fsm_cases(tmp: Path, seed: int):
+    for size, (layers, width, learned) in FSM_SIZES.items():
+        states, trans = synth_transitions(layers, width, seed)
+        dot = tmp / f"synth_{size}.dot"
+        write_dot(dot, states, trans)
+        fsm = build_fsm(dot, layers, width, learned, seed)
+        js = fsm.to_json()
+        richest = max(fsm.states, key=lambda s: len(s.paths))
+        meta = {"states": len(fsm.states), "transitions": len(fsm.transitions),
+                "paths": sum(len(s.paths) for s in fsm.states)}
+
+        def run_paths(f, n):
+            for _ in range(n):
+                for s in f.states:
+                    s.paths = []
+                    get_all_paths(f, s)
+
+        def run_decide(f, n):
+            for _ in range(n):
+                for s in f.states:
+                    s.oracle.decide_state(s)
+
+        def run_select(st, n):
+            random.seed(seed)
+            for _ in range(n):
+                st.select_path()
+
+        yield "load_fsm", size, meta, lambda d=dot: str(d), lambda p, n: [load_fsm(p) for _ in range(n)], 1
+        yield "get_all_paths", size, meta, lambda f=fsm: fresh_states(f), run_paths, 1
+        yield "FSM.to_json", size, meta, lambda f=fsm: f, lambda f, n: [f.to_json() for _ in range(n)], 3
+        yield "FSM.from_json", size, meta, lambda j=js: j, lambda j, n: [FSM.from_json(j) for _ in range(n)], 3
+        yield "Oracle.decide_state", size, meta, lambda f=fsm: f, run_decide, 3
+        yield "State.select_path", size, {**meta, "state_paths": len(richest.paths)}, \
+            lambda st=richest: st, run_select, 2000
+
+
+def mcts_cases(seed: int):
+    synth = SynthFSM(200, 24, seed)
+    for size in TREE_SIZES:
+        sch = grown_schedule(synth, size, seed)
+        meta = {"nodes": sch.n_nodes}
+        # busiest subtree below the root, what a per-node dump typically serializes
+        top = max(sch.root.children.values(), key=lambda c: c.n_sel)
+
+        def run_choose(s, n):
+            random.seed(seed)
+            for _ in range(n):
+                s.choose_state(synth, None)
+
+        # choose_state expands the tree, every batch starts from a fresh copy of the grown one
+        def fresh(size=size):
+            return grown_schedule(synth, size, seed)
+
+        def setup_bp(size=size):
+            s = fresh(size)
+            random.seed(seed)
+            return s, [s.choose_state(synth, None)[1] for _ in range(200)]
+
+        def run_bp(ctx, n):
+            s, paths = ctx
+            for i in range(n):
+                s.backpropagate(paths[i % len(paths)], new_transition=i % 7 == 0, cost=1.0)
+
+        yield "MCTSSchedule.choose_state", size, meta, fresh, run_choose, 200
+        yield "MCTSSchedule.backpropagate", size, meta, setup_bp, run_bp, 200
+        yield "MCTSSchedule.to_dict", size, meta, lambda s=sch: s, lambda s, n: [s.to_dict() for _ in range(n)], 1
+        yield "MCTSNode.to_dict", size, {**meta, "subtree_root": top.state_path[-1]}, \
+            lambda t=top: t, lambda t, n: [t.to_dict() for _ in range(n)], 1
+        yield "MCTSNode.from_dict", size, meta, lambda s=sch: s.root.to_dict(), \
+            lambda d, n: [MCTSNode.from_dict(d) for _ in range(n)], 1
+
+
+# ---------------- baseline ---------------- #
+def host_info() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+
+def compare(results: dict, baseline: dict, tol: float, mem_tol: float, floor_us: float) -> list:
+    regressions = []
+    base = baseline.get("results", {})
+    for key, r in results.items():
+        b = base.get(key)
+        if b is None:
+            r["vs_base"] = None
+            continue
+        t_ratio = r["sec"] / b["sec"] if b["sec"] > 0 else 1.0
+        m_ratio = r["peak_kb"] / b["peak_kb"] if b["peak_kb"] > 0 else 1.0
+        r["vs_base"] = {"time": t_ratio, "mem": m_ratio}
+        if t_ratio > tol and (r["sec"] - b["sec"]) * 1e6 > floor_us:
+            regressions.append(f"{key}: time x{t_ratio:.2f} ({b['sec'] * 1e3:.3f} -> {r['sec'] * 1e3:.3f} ms)")
+        if m_ratio > mem_tol and r["peak_kb"] - b["peak_kb"] > 64:
+            regressions.append(f"{key}: peak memory x{m_ratio:.2f} ({b['peak_kb']:.0f} -> {r['peak_kb']:.0f} KiB)")
+    return regressions
+
+
+def print_table(results: dict):
+    print(f"{'operation':>28s} {'size':>6s} {'ms/op':>10s} {'peak KiB':>10s} {'x prev':>7s} {'vs base':>14s}")
+    prev = {}
+    for key, r in results.items():
+        op, size = key.rsplit("@", 1)
+        grow = f"{r['sec'] / prev[op]:7.1f}" if op in prev and prev[op] > 0 else f"{'':>7s}"
+        prev[op] = r["sec"]
+        vb = r.get("vs_base")
+        vs = f"t{vb['time']:5.2f} m{vb['mem']:5.2f}" if vb else f"{'-':>14s}"
+        print(f"{op:>28s} {size:>6s} {r['sec'] * 1e3:10.3f} {r['peak_kb']:10.1f} {grow} {vs:>14s}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", type=str, default="", help="comma separated operation name filter")
+    ap.add_argument("--baseline", type=str, default=str(BASELINE))
+    ap.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=1.5, help="allowed time ratio over baseline")
+    ap.add_argument("--mem-tolerance", type=float, default=1.25, help="allowed peak memory ratio over baseline")
+    ap.add_argument("--floor-us", type=float, default=50.0, help="ignore time regressions below this many us/op")
+    ap.add_argument("--json", type=str, default="", help="write the results here")
+    args = ap.parse_args()
+
+    only = [x for x in args.only.split(",") if x]
+    results, metas = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = list(fsm_cases(Path(tmp), args.seed)) + list(mcts_cases(args.seed))
+        for op, size, meta, setup, run, n in cases:
+            if only and not any(o in op for o in only):
+                continue
+            key = f"{op}@{size}"
+            results[key] = measure(setup, run, n, args.repeat)
+            metas[key] = meta
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    regressions = [] if args.save else compare(results, baseline, args.tolerance, args.mem_tolerance, args.floor_us)
+    print_table(results)
+    if baseline and not args.save and baseline.get("host") != host_info():
+        print(f"note: baseline recorded on {baseline.get('host')}, timings are only comparable on the same host")
+
+    out = {"host": host_info(), "seed": args.seed, "repeat": args.repeat, "results": results, "meta": metas}
+    if args.json:
+        Path(args.json).write_text(json.dumps(out, indent=2))
+    if args.save:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(out, indent=2) + "\n")
+        print(f"baseline written to {baseline_path}")
+        return 0
+    if not baseline:
+        print(f"no baseline at {baseline_path}, run with --save first")
+        return 0
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
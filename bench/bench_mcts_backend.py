@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Compare the dict-of-children MCTS tree with the numpy array backend.
+# Both schedules are driven with the same seed and the same synthetic rewards;
+# the selected leaf paths must match step for step.
+
+import argparse, contextlib, io, os, random, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from objects import MCTSSchedule, ArrayMCTSSchedule
+
+
+class SynthFSM:
+    # minimal FSM stand-in: only init_state and transitions are used by MCTSSchedule
+    def __init__(self, n_states: int, degree: int, seed: int):
+        rng = random.Random(seed)
+        names = [f"s{i}" for i in range(n_states)]
+        self.init_state = names[0]
+        self.transitions = []
+        for src in names:
+            for dst in rng.sample(names, min(degree, n_states)):
+                self.transitions.append([src, f"in_{dst}", f"out_{dst}", dst])
+
+
+def run_episodes(schedule, fsm, episodes: int, seed: int):
+    random.seed(seed)
+    rng = random.Random(seed + 1)
+    picks = []
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        for _ in range(episodes):
+            leaf, path = schedule.choose_state(fsm, None)
+            schedule.backpropagate(path, new_state=rng.random() < 0.05,
+                                   new_transition=rng.random() < 0.1,
+                                   error_reward=rng.random() * 0.2,
+                                   new_fields_cnt=rng.randint(0, 3),
+                                   cost=rng.uniform(0.5, 6.0))
+            for sn in leaf.state_path:
+                schedule.state_visits[sn] += 1
+            if rng.random() < 0.1:
+                schedule.sink_hits[leaf.state_path[-1]] += 2
+            picks.append(tuple(leaf.state_path))
+            out.seek(0); out.truncate()
+    return picks
+
+
+def grow_tree(schedule, fsm, n_nodes: int, seed: int, max_depth: int = 12):
+    # random walks from the root until the tree holds n_nodes nodes
+    rng = random.Random(seed)
+    succ = {}
+    for t in fsm.transitions:
+        if t[0] != t[3]:
+            succ.setdefault(t[0], []).append(t[3])
+    count = 1
+    while count < n_nodes:
+        node = schedule.root
+        for _ in range(rng.randint(1, max_depth)):
+            nxt = rng.choice(succ[node.state_path[-1]])
+            if node.has_child(nxt):
+                node = node.children[nxt]
+            else:
+                node = node.add_child(nxt)
+                count += 1
+            n = rng.randint(1, 20)
+            for _ in range(n):
+                node.add_reward(rng.random() * 0.1)
+        # keep parent counts >= child counts along the walk
+        p = node.parent
+        while p is not None:
+            p.add_reward(0.0)
+            p = p.parent
+    return count
+
+
+def time_select(schedule, fsm, rounds: int, seed: int):
+    random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        picks = [tuple(schedule._select(fsm)[-1].state_path) for _ in range(rounds)]
+        dt = time.perf_counter() - t0
+    return dt, picks
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--states", type=int, default=200)
+    ap.add_argument("--degree", type=int, default=24)
+    ap.add_argument("--episodes", type=int, default=2000)
+    ap.add_argument("--sizes", type=str, default="1000,10000,50000")
+    ap.add_argument("--rounds", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--mode", choices=("reward", "rate"), default="reward")
+    args = ap.parse_args()
+
+    fsm = SynthFSM(args.states, args.degree, args.seed)
+
+    print(f"== episodes: states={args.states} degree={args.degree} episodes={args.episodes} mode={args.mode}")
+    res = {}
+    for cls in (MCTSSchedule, ArrayMCTSSchedule):
+        sch = cls(fsm.init_state, select_mode=args.mode)
+        t0 = time.perf_counter()
+        picks = run_episodes(sch, fsm, args.episodes, args.seed)
+        res[cls.__name__] = (time.perf_counter() - t0, picks)
+        print(f"{cls.__name__:>18s}: {res[cls.__name__][0]:8.3f}s")
+    same = res["MCTSSchedule"][1] == res["ArrayMCTSSchedule"][1]
+    print(f"identical selections: {same}")
+
+    for size in (int(x) for x in args.sizes.split(",")):
+        print(f"== select on grown tree: nodes={size} rounds={args.rounds}")
+        picks = {}
+        for cls in (MCTSSchedule, ArrayMCTSSchedule):
+            sch = cls(fsm.init_state, select_mode=args.mode)
+            grow_tree(sch, fsm, size, args.seed)
+            dt, picks[cls.__name__] = time_select(sch, fsm, args.rounds, args.seed)
+            print(f"{cls.__name__:>18s}: {dt:8.3f}s  {dt / args.rounds * 1e6:10.1f} us/select")
+        print(f"identical selections: {picks['MCTSSchedule'] == picks['ArrayMCTSSchedule']}")
+        same = same and picks["MCTSSchedule"] == picks["ArrayMCTSSchedule"]
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# Run the real core_fuzzer.py worker loop against the offline UE simulator.
+# The harness plays the master: it writes a throw-away work dir with its own
+# .env, puts fake nr-ue / nr-cli executables (bench/fake_ue.py) first in PATH,
+# bumps ctrl/epoch and serves the worker's reset requests by truncating the
+# fake core.log. No open5gs or UERANSIM is needed, MongoDB still is: pass
+# --mongo-uri or --mongod to start a private mongod for the run.
+# Reports execs/sec, alignment rate and per-phase cost from the worker's
+# metrics.jsonl, so loop changes can be compared on any machine.
+
+import argparse, json, os, shutil, signal, socket, subprocess, sys, tempfile, time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+FAKE_UE = REPO / "bench" / "fake_ue.py"
+WID = 0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port: int, timeout: float) -> bool:
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def read_env(path: Path) -> dict:
+    env = {}
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#") and "=" in line:
+            k, v = line.split("=", 1)
+            env[k.strip()] = v.strip().strip('"')
+    return env
+
+
+def write_env(path: Path, env: dict):
+    path.write_text("".join(f'{k}="{v}"\n' for k, v in env.items()))
+
+
+def install_fake_bin(bin_dir: Path):
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    ue = bin_dir / "nr-ue"
+    ue.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_UE}" "$@"\n')
+    cli = bin_dir / "nr-cli"
+    cli.write_text("#!/bin/sh\nexit 0\n")
+    for p in (ue, cli):
+        p.chmod(0o755)
+
+
+def start_mongod(work: Path):
+    mongod = shutil.which("mongod")
+    if mongod is None:
+        sys.exit("--mongod given but no mongod in PATH")
+    port = free_port()
+    dbpath = work / "mongo"
+    dbpath.mkdir()
+    proc = subprocess.Popen([mongod, "--dbpath", str(dbpath), "--port", str(port), "--bind_ip", "127.0.0.1",
+                             "--quiet", "--logpath", str(work / "mongod.log")],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_port(port, 30):
+        proc.kill()
+        sys.exit("mongod did not come up, see mongod.log")
+    return proc, f"mongodb://127.0.0.1:{port}"
+
+
+def drop_worker_collections(uri: str, db_name: str):
+    from pymongo.mongo_client import MongoClient
+    db = MongoClient(uri, serverSelectionTimeoutMS=5000)["CoreFuzzer"]
+    for name in (f"{db_name}_w{WID}", f"{db_name}_pool"):
+        db.drop_collection(name)
+
+
+class FakeMaster:
+    # the part of run_parallel.py the worker talks to: ctrl/epoch and reset requests
+    def __init__(self, work: Path):
+        self.ctrl = work / "ctrl"
+        self.req_dir = self.ctrl / "reset_requests"
+        self.core_log = work / "logs" / "core.log"
+        self.epoch = 1
+        self.resets = 0
+        self.reasons = {}
+        self.req_dir.mkdir(parents=True, exist_ok=True)
+        (self.ctrl / "epoch").write_text(str(self.epoch))
+
+    def poll(self):
+        reqs = list(self.req_dir.glob("*.req"))
+        if not reqs:
+            return
+        pending = self.ctrl / "reset_pending"
+        pending.write_text(str(int(time.time())))
+        time.sleep(0.5)
+        self.core_log.write_text("")    # a restarted core starts a fresh log
+        for r in reqs:
+            reason = r.stem.split("_", 2)[-1]
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            r.unlink(missing_ok=True)
+        self.epoch += 1
+        self.resets += 1
+        (self.ctrl / "epoch").write_text(str(self.epoch))
+        pending.unlink(missing_ok=True)
+
+
+def last_snapshot(path: Path):
+    if not path.exists():
+        return None
+    lines = [l for l in path.read_text().splitlines() if l.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def report(snap: dict, master: FakeMaster, wall: float) -> dict:
+    phase_sec = snap.get("phase_sec", {})
+    phase_cnt = snap.get("phase_cnt", {})
+    up = snap.get("uptime", wall) or wall
+    res = {
+        "wall_sec": wall,
+        "uptime_sec": up,
+        "execs": snap.get("execs", 0),
+        "execs_per_sec": snap.get("execs_per_sec", 0.0),
+        "episodes": snap.get("episodes", 0),
+        "align_rate": snap.get("align_rate", 0.0),
+        "new_states": snap.get("new_states", 0),
+        "new_transitions": snap.get("new_transitions", 0),
+        "crashes": snap.get("crashes", 0),
+        "global_resets": master.resets,
+        "reset_reasons": master.reasons,
+        "phases": {k: {"sec": phase_sec[k], "cnt": phase_cnt.get(k, 0), "share": phase_sec[k] / up}
+                   for k in sorted(phase_sec, key=phase_sec.get, reverse=True)},
+    }
+    print(f"== worker loop: {res['execs']} execs in {up:.1f}s -> {res['execs_per_sec']:.2f} execs/s, "
+          f"{res['episodes']} episodes, align rate {res['align_rate']:.2f}")
+    print(f"   new states {res['new_states']}, new transitions {res['new_transitions']}, "
+          f"crashes {res['crashes']}, global resets {master.resets} {master.reasons}")
+    print(f"   {'phase':>12s} {'sec':>9s} {'calls':>7s} {'ms/call':>9s} {'share':>7s}")
+    for k, p in res["phases"].items():
+        per = p["sec"] / p["cnt"] * 1e3 if p["cnt"] else 0.0
+        print(f"   {k:>12s} {p['sec']:9.2f} {p['cnt']:7d} {per:9.2f} {p['share']:7.1%}")
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--duration", type=float, default=120, help="seconds of fuzzing to measure")
+    ap.add_argument("--workdir", type=str, default="", help="default: a fresh temp dir")
+    ap.add_argument("--keep", action="store_true", help="keep the work dir after the run")
+    ap.add_argument("--mongo-uri", type=str, default="", help="default: MONGO_URI of the repo .env")
+    ap.add_argument("--mongod", action="store_true", help="start a private mongod for the run")
+    ap.add_argument("--db-name", type=str, default="SimBench")
+    ap.add_argument("--fsm", type=str, default=str(REPO / "fsms" / "open5gs.dot-v2.7.5"))
+    ap.add_argument("--fsm-sm", type=str, default=str(REPO / "fsms" / "open5gs_sm.dot-v2.7.5"))
+    ap.add_argument("--latency", type=float, default=0.002, help="mean UE reply latency (s)")
+    ap.add_argument("--nondet", type=float, default=0.02, help="share of off-model replies")
+    ap.add_argument("--novel", type=float, default=0.01, help="share of fuzz messages with a new response")
+    ap.add_argument("--crash", type=float, default=0.001, help="crash probability per fuzz message")
+    ap.add_argument("--gnb-error", type=float, default=0.02, help="error indication probability per fuzz message")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                    help="extra .env override for the worker, e.g. MCTS_BACKEND=array")
+    ap.add_argument("--profile", choices=("sample", "cprofile"), default=None,
+                    help="run the worker with --profile, output under logs/worker_0/profile")
+    ap.add_argument("--json", type=str, default="", help="write the result here")
+    args = ap.parse_args()
+
+    work = Path(args.workdir or tempfile.mkdtemp(prefix="pascofuzz_bench_")).resolve()
+    work.mkdir(parents=True, exist_ok=True)
+    (work / "logs").mkdir(exist_ok=True)
+    for name in ("core.log", "gnb.log"):
+        (work / "logs" / name).write_text("")
+    install_fake_bin(work / "bin")
+
+    mongod = None
+    uri = args.mongo_uri
+    if args.mongod:
+        mongod, uri = start_mongod(work)
+    env = read_env(REPO / ".env")
+    uri = uri or env.get("MONGO_URI", "mongodb://localhost:27017")
+    port_base = free_port() // 100 * 100
+    env.update({
+        "UERANSIM_PATH": str(work), "OPEN5GS_PATH": str(work), "MONGO_URI": uri,
+        "FSM_PATH": args.fsm, "FSM_SM_PATH": args.fsm_sm, "DB_NAME": args.db_name,
+        "PARALLEL": "1", "N_WORKERS": "1", "UE_PORT_BASE": str(port_base),
+        "MCTS_SHARED": "0", "CORPUS_SYNC": "0", "FSM_MERGE": "0",
+        "METRICS_INTERVAL": "10", "METRICS_LIVE_INTERVAL": "2", "LOG_LEVEL": "WARNING",
+    })
+    for kv in args.set:
+        k, v = kv.split("=", 1)
+        env[k] = v
+    write_env(work / ".env", env)
+
+    master = FakeMaster(work)
+    worker = None
+    t0 = time.time()
+    try:
+        drop_worker_collections(uri, args.db_name)
+        proc_env = dict(os.environ, PATH=f"{work / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}",
+                        FAKE_UE_FSM=args.fsm, FAKE_UE_FSM_SM=args.fsm_sm,
+                        FAKE_UE_LATENCY=str(args.latency), FAKE_UE_NONDET=str(args.nondet),
+                        FAKE_UE_NOVEL=str(args.novel), FAKE_UE_CRASH=str(args.crash),
+                        FAKE_UE_GNB_ERROR=str(args.gnb_error),
+                        FAKE_UE_CORE_LOG=str(work / "logs" / "core.log"),
+                        FAKE_UE_GNB_LOG=str(work / "logs" / "gnb.log"))
+        if args.seed is not None:
+            proc_env["FAKE_UE_SEED"] = str(args.seed)
+        with open(work / "worker.out", "w") as out:
+            cmd = [sys.executable, str(REPO / "core_fuzzer.py"), "--wid", str(WID)]
+            if args.profile:
+                cmd += ["--profile", args.profile]
+            worker = subprocess.Popen(cmd, cwd=work, env=proc_env, stdout=out, stderr=subprocess.STDOUT)
+        print(f"[BENCH] worker pid {worker.pid}, work dir {work}, UE ports {port_base}-{port_base + 2}")
+        deadline = time.time() + args.duration
+        while time.time() < deadline and worker.poll() is None:
+            master.poll()
+            time.sleep(0.2)
+        if worker.poll() is not None:
+            print(f"[BENCH] worker exited early ({worker.returncode}), see {work / 'worker.out'}")
+    finally:
+        if worker is not None and worker.poll() is None:
+            worker.send_signal(signal.SIGINT)
+            try:
+                worker.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+                worker.wait()
+        # UEs run in their own session; the worker stops them on a clean exit only
+        for p in (port_base, port_base + 1, port_base + 2):
+            subprocess.run(["pkill", "-f", f"{FAKE_UE} -c .* -p {p}$"], stderr=subprocess.DEVNULL)
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait()
+
+    wall = time.time() - t0
+    snap = last_snapshot(work / "logs" / f"worker_{WID}" / "metrics.jsonl")
+    rc = 1
+    if snap is None:
+        print(f"[BENCH] no metrics snapshot, see {work / 'worker.out'}")
+    else:
+        res = report(snap, master, wall)
+        if args.json:
+            Path(args.json).write_text(json.dumps(res, indent=2))
+        rc = 0 if res["execs"] > 0 else 1
+    if not args.keep and not args.workdir:
+        shutil.rmtree(work, ignore_errors=True)
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
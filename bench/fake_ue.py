@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# Offline stand-in for the PascoFuzz UERANSIM UE command port.
+# Speaks the protocol core_fuzzer.py uses (plain symbols, enableFuzzing,
+# syncDown/syncUp, incomingMessage_N + raw fuzz message, testMessage replays)
+# and answers from the AMF/SMF models in fsms/*.dot. Every new connection
+# starts a fresh UE context in the initial states. Fuzz messages get a
+# response that depends only on the message bytes, so the worker can replay
+# and learn them; a configurable share leads to hidden states that the FSM
+# does not know. Crash and error-indication lines are appended to a fake
+# core.log / gnb.log so the worker's monitors fire as they would on a core;
+# crashes are a function of the message bytes and replay like real ones.
+#
+# Installed as `nr-ue` by bench_worker_loop.py: nr-ue -c <cfg> -i <imsi> -p <port>
+
+import argparse, json, os, random, signal, socket, sys, threading, time, zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fsm_helper import get_states_and_tx
+
+
+def env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+class SimParams:
+    # all knobs come from FAKE_UE_* so the worker's setup_helper can start us unchanged
+    def __init__(self):
+        self.fsm = os.environ.get("FAKE_UE_FSM", "fsms/open5gs.dot-v2.7.5")
+        self.fsm_sm = os.environ.get("FAKE_UE_FSM_SM", "fsms/open5gs_sm.dot-v2.7.5")
+        self.latency = env_float("FAKE_UE_LATENCY", 0.002)        # mean seconds per reply
+        self.jitter = env_float("FAKE_UE_JITTER", 0.5)            # relative jitter of the latency
+        self.nondet = env_float("FAKE_UE_NONDET", 0.02)           # wrong output on a model symbol
+        self.novel = env_float("FAKE_UE_NOVEL", 0.01)             # fuzz message gets an unknown response
+        self.hidden = env_float("FAKE_UE_HIDDEN", 0.5)            # ... that leads to a state outside the model
+        self.no_resp = env_float("FAKE_UE_NO_RESP", 0.3)          # fuzz message gets no response
+        self.decode_err = env_float("FAKE_UE_DECODE_ERR", 0.01)
+        self.byte_mut = env_float("FAKE_UE_BYTE_MUT", 0.2)
+        self.crash = env_float("FAKE_UE_CRASH", 0.001)            # per fuzz message
+        self.gnb_error = env_float("FAKE_UE_GNB_ERROR", 0.02)     # per fuzz message
+        self.core_log = os.environ.get("FAKE_UE_CORE_LOG", "logs/core.log")
+        self.gnb_log = os.environ.get("FAKE_UE_GNB_LOG", "logs/gnb.log")
+        self.seed = os.environ.get("FAKE_UE_SEED")
+
+
+class Model:
+    # one dot FSM as {state: {input: [(output, dst), ...]}}
+    def __init__(self, path: str):
+        states, transitions, init = get_states_and_tx(path)
+        self.init = init
+        self.states = states
+        self.table = {}
+        self.inputs = set()
+        self.outputs = set()
+        for src, inp, out, dst in transitions:
+            self.table.setdefault(src, {}).setdefault(inp, []).append((out, dst))
+            self.inputs.add(inp)
+            self.outputs.add(out)
+
+    def step(self, state: str, inp: str, rng: random.Random, nondet: float):
+        cand = self.table.get(state, {}).get(inp)
+        if not cand:
+            return "null_action", state
+        out, dst = rng.choice(cand)
+        if rng.random() < nondet:
+            out = rng.choice(sorted(self.outputs))
+        return out, dst
+
+
+def h32(*parts) -> int:
+    return zlib.crc32("\x00".join(str(p) for p in parts).encode())
+
+
+class FakeUE:
+    def __init__(self, params: SimParams, port: int, imsi: str):
+        self.p = params
+        self.port = port
+        self.imsi = imsi
+        self.rng = random.Random(params.seed if params.seed is not None else None)
+        self.mm = Model(params.fsm)
+        self.sm = Model(params.fsm_sm)
+        self.alphabet = sorted(self.mm.inputs | self.sm.inputs)
+        self.out_alphabet = sorted(self.mm.outputs | self.sm.outputs)
+        self.log_lock = threading.Lock()
+
+    # -------- message encoding -------- #
+    def encode(self, symbol: str, sht: int, secmod: int, payload_len: int) -> str:
+        # 7E00 | type | sht/secmod | payload; the type byte lets us decode mutated messages
+        t = self.alphabet.index(symbol) if symbol in self.alphabet else 0xFF
+        body = bytes(self.rng.randrange(256) for _ in range(payload_len))
+        return f"7E00{t:02X}{(sht << 4 | secmod) & 0xFF:02X}" + body.hex().upper()
+
+    def decode_type(self, msg: str):
+        try:
+            t = int(msg[4:6], 16)
+        except ValueError:
+            return None
+        return self.alphabet[t] if t < len(self.alphabet) else None
+
+    # -------- behaviour -------- #
+    def delay(self):
+        if self.p.latency > 0:
+            j = self.p.jitter
+            time.sleep(max(0.0, self.p.latency * (1.0 + self.rng.uniform(-j, j))))
+
+    def model_step(self, ctx: dict, symbol: str) -> str:
+        if ctx["hidden"] is not None:
+            # unknown state: fixed answers per (hidden state, symbol), stays there
+            k = ctx["hidden"]
+            return self.out_alphabet[h32("hidden", k, symbol) % len(self.out_alphabet)]
+        if symbol in self.sm.inputs:
+            out, ctx["sm"] = self.sm.step(ctx["sm"], symbol, self.rng, self.p.nondet)
+        else:
+            out, ctx["mm"] = self.mm.step(ctx["mm"], symbol, self.rng, self.p.nondet)
+        return out
+
+    def fuzz_response(self, ctx: dict, msg: str) -> str:
+        # deterministic in the message so testMessage replays give the same answer
+        h = h32("fuzz", msg)
+        if (h % 10007) / 10007.0 < self.p.novel:
+            if (h >> 8) % 1000 / 1000.0 < self.p.hidden:
+                ctx["hidden"] = h % 97
+            else:
+                ctx["mm"] = self.mm.states[h % len(self.mm.states)]
+            return f"fuzzResponse{h % 13}"
+        if ((h >> 4) % 1000) / 1000.0 < self.p.no_resp:
+            return ""
+        symbol = self.decode_type(msg)
+        if symbol is None:
+            return "null_action"
+        return self.model_step(ctx, symbol)
+
+    def mm_status(self, ctx: dict) -> str:
+        return f"X{ctx['hidden']}" if ctx["hidden"] is not None else ctx["mm"]
+
+    def append_line(self, path: str, line: str):
+        with self.log_lock:
+            with open(path, "a") as f:
+                f.write(line + "\n")
+
+    def crash(self, ctx: dict, msg: str):
+        # crashes depend on the message bytes and need a UE past its initial state,
+        # so a crash replays with the same message after a non-empty prefix
+        h = h32("crash", msg)
+        if (h % 10007) / 10007.0 < self.p.crash and ctx["mm"] != self.mm.init:
+            comp = ("amf", "smf")[(h >> 16) & 1]
+            site = (h >> 4) % 8
+            self.append_line(self.p.core_log, f"{time.strftime('%m/%d %H:%M:%S')}.000: [{comp}] FATAL: "
+                                              f"fake_ue_site{site}: Assertion `ctx{site}' failed. "
+                                              f"(../src/{comp}/nas-path.c:{100 + 37 * site})")
+            self.append_line(self.p.core_log, f"{time.strftime('%m/%d %H:%M:%S')}.000: [core] FATAL: "
+                                              f"backtrace() returned 8 addresses (../lib/core/ogs-abort.c:37)")
+            self.append_line(self.p.core_log, "/usr/lib/libogscore.so.2(ogs_abort+0x2b) [0x7f0000001000]")
+            self.append_line(self.p.core_log, f"/usr/bin/open5gs-{comp}d(fake_ue_site{site}+0x{site:x}4) [0x550000002000]")
+
+    def gnb_error(self):
+        if self.rng.random() < self.p.gnb_error:
+            cause = self.rng.choice(("protocol/semantic-error", "protocol/abstract-syntax-error-reject",
+                                     "nas/normal-release"))
+            self.append_line(self.p.gnb_log, f"[ngap] [error] Error indication received. Cause: {cause}")
+
+    def handle(self, data: bytes, ctx: dict) -> str:
+        text = data.decode(errors="ignore").strip()
+        if ctx["expect"] == "fuzz":
+            ctx["expect"] = None
+            if self.rng.random() < self.p.decode_err:
+                return "decode error"
+            # the UE mutates the message before sending it; the core answers the mutated one,
+            # which is also what the worker replays as testMessage when learning
+            try:
+                mutated = bytearray(bytes.fromhex(text))
+            except ValueError:
+                mutated = bytearray(text.encode())
+            for _ in range(self.rng.randint(1, 3)):
+                if len(mutated) > 4:
+                    mutated[self.rng.randrange(4, len(mutated))] = self.rng.randrange(256)
+            new_msg = mutated.hex().upper()
+            self.crash(ctx, new_msg)
+            self.gnb_error()
+            ret_type = self.fuzz_response(ctx, new_msg)
+            return json.dumps({"ret_type": ret_type,
+                               "ret_msg": ret_type.encode().hex().upper() if ret_type else "",
+                               "sht": self.rng.randrange(4), "secmod": self.rng.randrange(2),
+                               "new_msg": new_msg,
+                               "mm_status": self.mm_status(ctx),
+                               "byte_mut": self.rng.random() < self.p.byte_mut})
+        if ctx["expect"] == "test":
+            ctx["expect"] = None
+            # testMessage payload is "<new_msg>:<secmod>:<sht>"
+            msg = text.split(":")[0]
+            self.crash(ctx, msg)
+            return self.fuzz_response(ctx, msg) or "null_action"
+        if text == "enableFuzzing":
+            ctx["fuzzing"] = True
+            return "Start fuzzing"
+        if text in ("syncDown", "syncUp"):
+            return f"{text} done"
+        if text.startswith("incomingMessage_"):
+            ctx["expect"] = "fuzz"
+            return "ready"
+        if text == "testMessage":
+            ctx["expect"] = "test"
+            return "ready"
+        if ctx["fuzzing"]:
+            # seed collection: the UE answers with the encoded message it would send
+            sht, secmod = self.rng.randrange(4), self.rng.randrange(2)
+            return json.dumps({"sht": sht, "secmod": secmod,
+                               "new_msg": self.encode(text, sht, secmod, self.rng.randint(4, 32)),
+                               "mm_status": self.mm_status(ctx)})
+        return self.model_step(ctx, text)
+
+    def serve_conn(self, conn: socket.socket):
+        ctx = {"mm": self.mm.init, "sm": self.sm.init, "hidden": None, "fuzzing": False, "expect": None}
+        with conn:
+            conn.sendall(f"fake UE {self.imsi} ready".encode())
+            while True:
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    return
+                if not data:
+                    return
+                reply = self.handle(data, ctx)
+                self.delay()
+                try:
+                    conn.sendall(reply.encode() if reply else b" ")
+                except OSError:
+                    return
+
+    def serve(self):
+        srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        srv.bind(("127.0.0.1", self.port))
+        srv.listen(8)
+        while True:
+            conn, _ = srv.accept()
+            threading.Thread(target=self.serve_conn, args=(conn,), daemon=True).start()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-c", dest="config", default="")
+    ap.add_argument("-i", dest="imsi", default="imsi-999700000000001")
+    ap.add_argument("-p", dest="port", type=int, required=True)
+    args = ap.parse_args()
+    signal.signal(signal.SIGINT, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    FakeUE(SimParams(), args.port, args.imsi).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Campaign progress for `run_parallel.py --resume`
+# After every round the master copies each worker's checkpoint files (saved
+# FSMs and MCTS trees, after the FSM merge) into logs/worker_N/checkpoint/ once
+# they parse, and rewrites logs/campaign.json with the next hour/slot, the
+# epoch, the checkpoint of every worker, the shared MCTS trees of the round and
+# the export high-water marks. A worker killed mid-round can leave torn save
+# files behind; on resume the last consistent checkpoint is copied back over
+# them before the workers start, so they load it exactly as they load the
+# files of the previous round between two rounds.
+import json, os, pathlib, shutil, time
+from metrics_helper import write_json_atomic, read_json
+
+LOG_ROOT = pathlib.Path("logs")
+CAMPAIGN_FILE = LOG_ROOT / "campaign.json"
+CHECKPOINT_FILES = ("savedFSM.json", "savedFSM_sm.json", "savedMCTS_amf.json", "savedMCTS_smf.json")
+CHECKPOINT_DIR = "checkpoint"
+
+def _parses(path: pathlib.Path) -> bool:
+    try:
+        with open(path, "r") as f:
+            json.load(f)
+        return True
+    except (OSError, ValueError):
+        return False
+
+def save_files_ok(wdir) -> bool:
+    # the worker's save files exist and all of them parse
+    files = [pathlib.Path(wdir) / name for name in CHECKPOINT_FILES if (pathlib.Path(wdir) / name).exists()]
+    return bool(files) and all(_parses(p) for p in files)
+
+def save_worker_checkpoint(wdir) -> str | None:
+    # copy the worker's save files into wdir/checkpoint/ if all of them parse; returns the directory
+    wdir = pathlib.Path(wdir)
+    if not save_files_ok(wdir):
+        return None
+    files = [wdir / name for name in CHECKPOINT_FILES if (wdir / name).exists()]
+    dst = wdir / CHECKPOINT_DIR
+    tmp = wdir / (CHECKPOINT_DIR + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir()
+    for p in files:
+        shutil.copyfile(p, tmp / p.name)
+    old = wdir / (CHECKPOINT_DIR + ".old")
+    if dst.exists():
+        if old.exists():
+            shutil.rmtree(old)
+        dst.rename(old)
+    tmp.rename(dst)
+    if old.exists():
+        shutil.rmtree(old)
+    return str(dst)
+
+def restore_worker_checkpoint(wdir, ckpt_dir) -> int:
+    # put the checkpoint back as the worker's save files, dropping save files it does not have
+    wdir, ckpt_dir = pathlib.Path(wdir), pathlib.Path(ckpt_dir)
+    if not ckpt_dir.is_dir():
+        # interrupted between the two renames of save_worker_checkpoint
+        ckpt_dir = ckpt_dir.with_name(ckpt_dir.name + ".old")
+        if not ckpt_dir.is_dir():
+            return 0
+    n = 0
+    for name in CHECKPOINT_FILES:
+        src = ckpt_dir / name
+        if src.exists():
+            tmp = wdir / (name + ".tmp")
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, wdir / name)
+            n += 1
+        elif (wdir / name).exists():
+            (wdir / name).unlink()
+    return n
+
+def load_campaign() -> dict | None:
+    return read_json(CAMPAIGN_FILE)
+
+def save_campaign(state: dict):
+    state["updated"] = time.time()
+    write_json_atomic(CAMPAIGN_FILE, state)
@@ -0,0 +1,173 @@
+# Round collection off the fuzzing path
+# At a round end the master only takes snapshots that are cheap to make: the
+# .gcda files are copied into a staging tree (the .gcno files are symlinked
+# next to them, gcov finds the sources through the working directory recorded
+# in the .gcno), the checkpoint files are copied and the _id of the newest
+# document of every worker collection is recorded. lcov over the staging tree,
+# the database export and the profile summaries then run in a small process
+# pool while the next round is already fuzzing.
+# The export is incremental: a round writes only the documents inserted after
+# the previous round's high-water mark (_id, ascending), streamed from a pymongo
+# cursor to gzip'd NDJSON, with a manifest of the _id/timestamp range. Later
+# updates of already exported documents (energy, mutate_count) are not
+# re-exported; iter_exports() chains the rounds of a worker back together.
+# The mark only moves when an export succeeds, so a failed round is exported
+# again with the next one.
+import concurrent.futures as cf, gzip, json, multiprocessing, os, pathlib, shutil, signal, subprocess, time
+from bson import ObjectId, json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from pymongo.mongo_client import MongoClient
+from dotenv import dotenv_values
+from metrics_helper import write_json_atomic
+
+config = dotenv_values(".env")
+
+COLLECT_JOBS = max(1, int(config.get('COLLECT_JOBS', 2)))
+EXPORT_BATCH = max(1, int(config.get('EXPORT_BATCH', 1000)))      # documents per cursor batch and write
+EXPORT_FILE = "db.ndjson.gz"
+EXPORT_MANIFEST = "db.manifest.json"
+LCOV_IGNORE = ('branch,callback,child,corrupt,count,deprecated,empty,excessive,fork,format,gcov,graph,internal,'
+               'mismatch,missing,negative,package,parallel,parent,range,source,unsupported,unused,usage,utility,version')
+
+def snapshot_gcda(src_root, stage) -> int:
+    # mirror src_root/**/*.gcda into stage; returns the number of files copied
+    src_root, stage = pathlib.Path(src_root), pathlib.Path(stage)
+    if stage.exists():
+        shutil.rmtree(stage)
+    n = 0
+    for dirpath, _, names in os.walk(src_root):
+        gcda = [x for x in names if x.endswith(".gcda")]
+        if not gcda:
+            continue
+        dst = stage / pathlib.Path(dirpath).relative_to(src_root)
+        dst.mkdir(parents=True, exist_ok=True)
+        for name in gcda:
+            try:
+                shutil.copyfile(os.path.join(dirpath, name), dst / name)
+            except FileNotFoundError:
+                continue
+            n += 1
+            gcno = name[:-5] + ".gcno"
+            if gcno in names:
+                os.symlink(os.path.join(os.path.abspath(dirpath), gcno), dst / gcno)
+    return n
+
+def lcov_snapshot(stage, info_file, log_file):
+    # background: capture the staged counters, then drop the staging tree
+    try:
+        with open(log_file, "w") as f:
+            subprocess.run(['lcov', '--directory', str(stage), '--capture', '--output-file', str(info_file),
+                            '--rc', 'lcov_branch_coverage=1', '--ignore-errors', LCOV_IGNORE],
+                           stdout=f, stderr=subprocess.STDOUT, check=True)
+    finally:
+        shutil.rmtree(stage, ignore_errors=True)
+    return str(info_file)
+
+def export_increment(db, collection, out_dir, after_id=None, upto_id=None, batch: int = EXPORT_BATCH) -> dict:
+    # background: documents with after_id < _id <= upto_id into out_dir/EXPORT_FILE, returns the manifest
+    out_dir = pathlib.Path(out_dir)
+    bounds = {}
+    if after_id is not None:
+        bounds["$gt"] = ObjectId(after_id)
+    if upto_id is not None:
+        bounds["$lte"] = ObjectId(upto_id)
+    out = out_dir / EXPORT_FILE
+    tmp = out_dir / (EXPORT_FILE + ".tmp")
+    count, first_id, last_id, ts_min, ts_max = 0, None, None, None, None
+    # a client of its own: this runs in a forked pool process
+    client = MongoClient(config["MONGO_URI"])
+    try:
+        cursor = client[db][collection].find({"_id": bounds} if bounds else {}, sort=[("_id", 1)], batch_size=batch)
+        with gzip.open(tmp, "wt", compresslevel=6) as f:
+            lines = []
+            for doc in cursor:
+                lines.append(json_util.dumps(doc, json_options=RELAXED_JSON_OPTIONS))
+                last_id = doc["_id"]
+                if first_id is None:
+                    first_id = last_id
+                ts = doc.get("timestamp")
+                if isinstance(ts, (int, float)):
+                    ts_min = ts if ts_min is None else min(ts_min, ts)
+                    ts_max = ts if ts_max is None else max(ts_max, ts)
+                if len(lines) >= batch:
+                    f.write("\n".join(lines) + "\n")
+                    count += len(lines)
+                    lines = []
+            if lines:
+                f.write("\n".join(lines) + "\n")
+                count += len(lines)
+    finally:
+        client.close()
+    os.replace(tmp, out)
+    manifest = {"db": db, "collection": collection, "file": EXPORT_FILE, "format": "ndjson+gzip",
+                "after_id": after_id, "upto_id": upto_id, "count": count,
+                "first_id": str(first_id) if first_id is not None else None,
+                "last_id": str(last_id) if last_id is not None else None,
+                "ts_min": ts_min, "ts_max": ts_max, "bytes": out.stat().st_size, "exported": time.time()}
+    write_json_atomic(out_dir / EXPORT_MANIFEST, manifest)
+    return manifest
+
+def iter_exports(round_dirs):
+    # documents of several round exports of one collection, in _id order, skipping rounds without a manifest
+    manifests = []
+    for d in round_dirs:
+        try:
+            m = json.loads((pathlib.Path(d) / EXPORT_MANIFEST).read_text())
+        except (OSError, ValueError):
+            continue
+        if m.get("count"):
+            manifests.append((m["first_id"], pathlib.Path(d) / m["file"]))
+    last = None
+    for _, path in sorted(manifests):
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    doc = json_util.loads(line)
+                    # a range exported twice (export finished after the campaign checkpoint) is read once
+                    if last is not None and doc["_id"] <= last:
+                        continue
+                    last = doc["_id"]
+                    yield doc
+
+def _ignore_sigint():
+    # Ctrl+C reaches the whole process group; the master decides when the pool stops
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class RoundCollector:
+    # process pool for the slow part of a round collection
+    def __init__(self, jobs: int = COLLECT_JOBS):
+        self.jobs = jobs
+        self.pool = None
+        self.running = {}           # future -> (label, submit time)
+        self.failed = 0
+
+    def submit(self, label: str, fn, *args):
+        if self.pool is None:
+            # forkserver: the master has threads (watchers, exporter, watchdog, pymongo monitors)
+            # by now, and a forked child can block on a lock one of them held
+            self.pool = cf.ProcessPoolExecutor(max_workers=self.jobs, initializer=_ignore_sigint,
+                                               mp_context=multiprocessing.get_context("forkserver"))
+        fut = self.pool.submit(fn, *args)
+        self.running[fut] = (label, time.time())
+        fut.add_done_callback(self._done)
+        return fut
+
+    def _done(self, fut):
+        label, t0 = self.running.pop(fut, (None, 0.0))
+        exc = None if fut.cancelled() else fut.exception()
+        if exc is not None:
+            self.failed += 1
+            print(f"[MASTER] collect {label} failed: {exc}")
+        elif label is not None:
+            print(f"[MASTER] collect {label} done in {time.time() - t0:.1f}s")
+
+    def pending(self) -> int:
+        return len(self.running)
+
+    def close(self, wait: bool = True):
+        if self.pool is None:
+            return
+        if wait and self.running:
+            print(f"[MASTER] waiting for {len(self.running)} collection jobs")
+        self.pool.shutdown(wait=wait, cancel_futures=not wait)
+        self.pool = None
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # Run queries on Core
 
-import os, time, socket, string, json, atexit, threading, argparse, pathlib, shutil, re, subprocess, shutil, datetime
+import os, time, logging, socket, string, json, atexit, threading, argparse, pathlib, shutil, re, subprocess, shutil, datetime
 from collections import defaultdict, deque
 from contextlib import closing
 from db_helper import *
@@ -9,6 +9,16 @@ from fsm_helper import *
 from setup_helper import *
 from lcov_helper import *
 from crash_monitor import *
+from sync_helper import *
+from metrics_helper import *
+from log_helper import *
+from profile_helper import *
+from triage_helper import *
+from watchdog_helper import Heartbeat
+from instance_helper import CoreInstance, worker_instance
+from rtt_helper import RttEstimator
+from gcda_helper import *
+from objects.mcts_shared import read_authkey
 
 from dotenv import dotenv_values
 config = dotenv_values(".env")
@@ -17,6 +27,8 @@ config = dotenv_values(".env")
 parser = argparse.ArgumentParser()
 parser.add_argument('--wid', type=int, default=0,
                     help='Worker ID (0-based)')
+parser.add_argument('--profile', nargs='?', const='sample', default=None, choices=PROFILE_MODES,
+                    help='profile the fuzz loop (sample|cprofile), SIGUSR1 takes tracemalloc snapshots')
 args = parser.parse_args()
 WID = args.wid     
 
@@ -37,16 +49,63 @@ UE_PORT_AMF = UE_PORT_BASE + 1
 UE_PORT_SMF = UE_PORT_BASE + 2
 IMSI_BASE  = int(config['IMSI_BASE']) + WID*100
 GNB_PORT_BASE = int(config['GNB_PORT_BASE'])
+MCTS_SELECT_MODE = config.get('MCTS_SELECT_MODE', 'reward')
+MCTS_BACKEND = config.get('MCTS_BACKEND', 'tree')
+MCTS_TRANSPOSITION = int(config.get('MCTS_TRANSPOSITION', 0))
+MCTS_TT_BUCKET = int(config.get('MCTS_TT_BUCKET', 4))
+MCTS_MAX_NODES = int(config.get('MCTS_MAX_NODES', 0))
+MCTS_SHARED = PARALLEL and int(config.get('MCTS_SHARED', 0))
+MCTS_SHARED_PORT = int(config.get('MCTS_SHARED_PORT', 47000))
+CORPUS_SYNC = PARALLEL and int(config.get('CORPUS_SYNC', 0))
+FSM_MERGE = PARALLEL and int(config.get('FSM_MERGE', 0))
+GCDA_COV = int(config.get('GCDA_COV', 0))
+GCDA_EVERY = max(1, int(config.get('GCDA_EVERY', 10)))
+GCDA_REWARD = float(config.get('GCDA_REWARD', 0.6))
+GCDA_FLUSH = config.get('GCDA_FLUSH', 'signal')                 # signal | gdb | none
 os.makedirs(WID_LOG_DIR, exist_ok=True)
+log = setup_logging(WID, WID_LOG_DIR)
+trace = logging.getLogger("pascofuzz.trace.worker")
+install_excepthook(WID_LOG_DIR)
 CRASH_DIR = LOG_DIR / pathlib.Path("crash")
 CRASH_DIR.mkdir(exist_ok=True, parents=True)
+# +++ the core + gNB instance of this worker, see instance_helper
+INST = CoreInstance(worker_instance(WID))
+triage = CrashTriage(CRASH_DIR, WID, instance=INST.k)
 MCTS_CSV = WORK_DIR / "mcts_stats_reward.csv"
+METRICS_CSV = WORK_DIR / "metrics.csv"
+METRICS_JSONL = WORK_DIR / "metrics.jsonl"
+profiler = None
+gcda_cov = None
+
+# +++ phase timers; seed and learn are outer phases and include their nested connect/db time
+metrics = PhaseMetrics(WID, METRICS_CSV, METRICS_JSONL)
+# +++ liveness for the master's watchdog, see watchdog_helper
+heartbeat = Heartbeat(WID)
+metrics.heartbeat = heartbeat
+store_new_message = metrics.timed("db", gauge="db_write_lag")(store_new_message)
+get_insteresting_msg = metrics.timed("db")(get_insteresting_msg)
+check_new_resopnse = metrics.timed("db")(check_new_resopnse)
+check_new_cause = metrics.timed("db")(check_new_cause)
+check_new_violation = metrics.timed("db")(check_new_violation)
+count_window_fields = metrics.timed("db")(count_window_fields)
+update_msg_reward = metrics.timed("db")(update_msg_reward)
+check_amf_crash = metrics.timed("crash_scan")(check_amf_crash)
+check_smf_crash = metrics.timed("crash_scan")(check_smf_crash)
 
 
 # +++ 
-init_setup_path(UE_PORT_BASE, IMSI_BASE, WID_LOG_DIR)
+init_setup_path(UE_PORT_BASE, IMSI_BASE, WID_LOG_DIR, ue_cfg=INST.ue_cfg, gnb_name=INST.gnb_name)
 init_db_path(WID)
 
+# +++ response deadlines from observed RTTs, see rtt_helper; the legacy fixed waits are the ceilings
+UE_TIMEOUT = 5.0                    # UE socket timeout, also the banner wait of connectUE
+UE_RECV_WAIT = 3 * UE_TIMEOUT       # sendSymbol: three recv attempts of UE_TIMEOUT
+GNB_TIMEOUT = 1.0
+PORT_WAIT = 8.0
+RTT_FILE = WORK_DIR / "rtt.json"
+rtt = RttEstimator()
+rtt.load(RTT_FILE)
+
 reset_count = 0
 local_offset = 0
 
@@ -54,10 +113,11 @@ error_hits = defaultdict(int)
 
 CTRL_DIR = pathlib.Path("ctrl"); 
 CTRL_DIR.mkdir(exist_ok=True)
-EPOCH_FILE = CTRL_DIR / "epoch"
-RESET_REQ_DIR = CTRL_DIR / "reset_requests"; 
-RESET_REQ_DIR.mkdir(exist_ok=True)
-RESET_PENDING_FILE = CTRL_DIR / "reset_pending"
+EPOCH_FILE = INST.epoch_file
+RESET_REQ_DIR = INST.reset_req_dir; 
+RESET_REQ_DIR.mkdir(parents=True, exist_ok=True)
+RESET_PENDING_FILE = INST.reset_pending_file
+CORE_LOG_PATH = str(INST.core_log)
 
 def get_epoch()->int:
     try: return int(EPOCH_FILE.read_text().strip())
@@ -66,6 +126,7 @@ def get_epoch()->int:
 def wait_for_epoch_change(prev_epoch:int, timeout_sec:int=300):
     t0 = time.time()
     while time.time() - t0 < timeout_sec:
+        heartbeat.beat("wait_epoch", metrics.counters["episodes"])
         ep = get_epoch()
         if ep > prev_epoch:
             return ep
@@ -73,23 +134,46 @@ def wait_for_epoch_change(prev_epoch:int, timeout_sec:int=300):
     return get_epoch()
 
 def request_global_reset(reason:str):
-    print("request_global_reset, reason:", reason)
+    log.warning("request_global_reset, reason: %s", reason)
+    metrics.inc("global_resets")
+    metrics.inc_reason(reason)
     fname = RESET_REQ_DIR / f"Worker{WID}_{int(time.time()*1000)}_{reason}.req"
     try: fname.write_text(reason)
     except: pass
 
 def wait_master_reset(prev_epoch:int) -> int:
     while RESET_PENDING_FILE.exists():
+        heartbeat.beat("wait_reset", metrics.counters["episodes"])
         time.sleep(0.2)
     return wait_for_epoch_change(prev_epoch, timeout_sec=600)
 
+def triage_crash(component:str, hits:list, state:str, ins_msg:dict, resp_json:dict):
+    # bucket the crash; artifacts and a ring dump are kept for new signatures only
+    trigger = {"state": state, "send_type": ins_msg.get("send_type"), "size": ins_msg.get("size"),
+               "base_msg": ins_msg.get("new_msg"), "new_msg": resp_json.get("new_msg"),
+               "ret_type": resp_json.get("ret_type"), "sht": resp_json.get("sht"),
+               "secmod": resp_json.get("secmod"), "mm_status": resp_json.get("mm_status")}
+    try:
+        results = triage.triage(component, hits, CORE_LOG_PATH, get_epoch(), trigger)
+    except OSError as e:
+        log.error("[%s] crash triage failed: %s", component.upper(), e)
+        return
+    for r in results:
+        sig = r["signature"]
+        if r["status"] == "new":
+            metrics.inc("crash_buckets")
+            log.warning("[%s] new crash bucket %s: %s %s", component.upper(), r["bucket"], sig["reason"], sig["location"])
+            dump_ring(r["dir"] / f"ring_worker{WID}.log", f"{component} crash, state {state}")
+        else:
+            metrics.inc("crash_dups")
+            log.warning("[%s] known crash bucket %s", component.upper(), r["bucket"])
+
 def warm_expand_root(schedule, fsm):
     root = schedule.root
     s0 = root.state_path[-1]
     succ = sorted({t[3] for t in fsm.transitions if t[0] == s0 and t[3] != s0})
     for dst in succ:
-        if not root.has_child(dst):
-            root.add_child(dst)
+        schedule.child_of(root, dst)
 
 def mcts_nodes_from_state_seq(schedule, state_seq):
     node = schedule.root
@@ -102,36 +186,30 @@ def mcts_nodes_from_state_seq(schedule, state_seq):
         else:
             start = 0
     for j in range(start, len(state_seq) - 1):
-        nxt = state_seq[j + 1]
-        if not node.has_child(nxt):
-            node = node.add_child(nxt)
-        else:
-            node = node.children[nxt]
+        node = schedule.child_of(node, state_seq[j + 1], len(nodes))
         nodes.append(node)
     return nodes
 
-def _iter_mcts_nodes(node, depth=0):
-    yield node, depth
-    for child in getattr(node, "children", {}).values():
-        yield from _iter_mcts_nodes(child, depth+1)
-
 def print_mcts_snapshot(schedule, title="MCTS"):
-    print(f"[{title}] MCTS snapshot")
-    for node, d in _iter_mcts_nodes(schedule.root, 0):
+    print(f"[{title}] MCTS snapshot: nodes={schedule.n_nodes} max_nodes={schedule.max_nodes} "
+          f"prunes={schedule.prune_count} pruned_nodes={schedule.pruned_nodes}")
+    for node, d in schedule.iter_nodes():
         state_name = (node.state_path[-1] if getattr(node, "state_path", None) else "<?>")
         nel = int(getattr(node, "n_sel", 0))
         det = int(getattr(node, "n_det", 0))
         reward = float(getattr(node, "reward", 0.0))
+        c_mean, c_std, c_min, c_max = node.cost_stats()
         indent = "  " * d
-        print(f"{indent}- {state_name:>12s} | depth={d:<2d} | nsel={nel:<5d} | ndet={det:<5d} | reward={reward:>8.3f}")
+        print(f"{indent}- {state_name:>12s} | depth={d:<2d} | nsel={nel:<5d} | ndet={det:<5d} | reward={reward:>8.3f}"
+              f" | cost={c_mean:>6.2f}s sd={c_std:>5.2f} [{c_min:.2f},{c_max:.2f}] n={node.n_cost}")
 
 def rebuild_state_visits_from_tree(schedule):
     schedule.state_visits.clear()
-    for node, _ in _iter_mcts_nodes(schedule.root):
+    for node, _ in schedule.iter_nodes():
         s = node.state_path[-1]
         schedule.state_visits[s] += int(getattr(node, "n_sel", 0))
 
-GNB_LOG_PATH = os.path.join(LOG_DIR, "gnb.log")
+GNB_LOG_PATH = str(INST.gnb_log)
 gnb_fp, gnb_pos = None, 0
 
 ERR_RE_ERROR_INDICATION = re.compile(r'Error(?:\s+|_)indication(?P<tail>.*)$', re.I)
@@ -158,6 +236,7 @@ def normalize_cause(s: str) -> str:
     s = re.sub(r'\s*/\s*', '/', s)
     return s
 
+@metrics.timed("drain")
 def drain_gnb_error_since_last():
     global gnb_fp, gnb_pos
     try:
@@ -200,6 +279,9 @@ def drain_gnb_error_since_last():
 
 # handle exit
 def exit_handler(fsm: FSM, fsm_sm: FSM):
+    metrics.flush()
+    if profiler is not None:
+        profiler.stop()
     # clean up
     if not PARALLEL:
         killCore()
@@ -211,17 +293,23 @@ def exit_handler(fsm: FSM, fsm_sm: FSM):
     fsm_sm_file = open(WORK_DIR / './savedFSM_sm.json', 'w')
     fsm_sm_file.write(fsm_sm.to_json())
     fsm_sm_file.close()
+    rtt.save(RTT_FILE)
+    if MCTS_SHARED:
+        # the master owns and saves the shared trees
+        return
     mcts_amf_file = open(WORK_DIR / 'savedMCTS_amf.json', 'w')
-    json.dump(schedule_amf.root.to_dict(), mcts_amf_file)
+    json.dump(schedule_amf.to_dict(), mcts_amf_file)
     mcts_smf_file = open(WORK_DIR / 'savedMCTS_smf.json', 'w')
-    json.dump(schedule_smf.root.to_dict(), mcts_smf_file)
+    json.dump(schedule_smf.to_dict(), mcts_smf_file)
 
-def wait_port_listen(port: int, timeout: float = 8.0) -> bool:
-    end = time.time() + timeout
-    while time.time() < end:
+def wait_port_listen(port: int, timeout: float = PORT_WAIT) -> bool:
+    t0 = time.monotonic()
+    end = t0 + rtt.timeout(("listen",), timeout)
+    while time.monotonic() < end:
         try:
             s = socket.create_connection(("127.0.0.1", port), timeout=0.5)
             s.close()
+            rtt.observe(("listen",), time.monotonic() - t0)
             return True
         except Exception:
             time.sleep(0.1)
@@ -232,14 +320,17 @@ def check_ue_ports():
     cmd = f"ss -ltnp | egrep ':(%d|%d|%d)\\s'" % (UE_PORT_BASE, UE_PORT_AMF, UE_PORT_SMF)
     try:
         result = subprocess.check_output(cmd, shell=True, text=True)
-        print("[Port Check] Listening sockets found:\n", result)
+        log.debug("[Port Check] Listening sockets found:\n%s", result)
     except subprocess.CalledProcessError:
-        print("[Port Check] No matching ports found.")
+        log.debug("[Port Check] No matching ports found.")
 
 # restart Core or release UE context
+@metrics.timed("reset")
 def reset(full: bool):   
     global local_offset
     if PARALLEL:
+        metrics.inc("resets")
+        metrics.inc_reason("ue_reset")
         killUE()
         time.sleep(0.2)
         startUE()
@@ -249,8 +340,9 @@ def reset(full: bool):
         startUE3()
         time.sleep(0.1)
         for p in (UE_PORT_BASE, UE_PORT_AMF, UE_PORT_SMF):
-            if not wait_port_listen(p, timeout=8.0):
-                print(f"[Worker{WID}] UE cmd-port {p} not ready in time")
+            if not wait_port_listen(p):
+                log.warning("UE cmd-port %d not ready in time", p)
+        rtt.after_reset()
         check_ue_ports()
         local_offset = (local_offset + 1) % 100000
         setOffset(getOffset() + 1)
@@ -260,48 +352,59 @@ def reset(full: bool):
     else:
         return
 
+# +++ the UE may or may not greet a new connection; only greetings give samples
+def recv_banner(name: str):
+    t0 = time.monotonic()
+    wait = rtt.timeout(("banner",), UE_TIMEOUT)
+    UEsocket.settimeout(wait)
+    try:
+        log.debug("%s: %s", name, UEsocket.recv(1024))
+        rtt.observe(("banner",), time.monotonic() - t0)
+    except socket.timeout:
+        pass
+    UEsocket.settimeout(UE_TIMEOUT)
+
+def note_rtt():
+    for k, v in rtt.summary().items():
+        metrics.set(k, v)
+
 # connect to UE
+@metrics.timed("connect")
 def connectUE():
     global UEsocket
     UEsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     # UEsocket = socket.create_connection(("127.0.0.1", UE_PORT_BASE), timeout=5.0)
-    UEsocket.settimeout(5)
+    UEsocket.settimeout(UE_TIMEOUT)
     UEsocket.connect(("localhost", UE_PORT_BASE))
     # print("UEsocket.recv:", UEsocket.recv(1024))
-    try:
-        print("UEsocket.recv:", UEsocket.recv(1024))
-    except socket.timeout:
-        pass
+    recv_banner("UEsocket.recv")
 
 def connectUE2():
     global UEsocket
     UEsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     # UEsocket = socket.create_connection(("127.0.0.1", UE_PORT_AMF), timeout=5.0)
-    UEsocket.settimeout(5)
+    UEsocket.settimeout(UE_TIMEOUT)
     UEsocket.connect(("localhost", UE_PORT_AMF))
-    try:
-        print("UE2socket.recv:", UEsocket.recv(1024))
-    except socket.timeout:
-        pass
+    recv_banner("UE2socket.recv")
 
 def connectUE3():
     global UEsocket
     UEsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     # UEsocket = socket.create_connection(("127.0.0.1", UE_PORT_SMF), timeout=5.0)
-    UEsocket.settimeout(5)
+    UEsocket.settimeout(UE_TIMEOUT)
     UEsocket.connect(("localhost", UE_PORT_SMF))
-    try:
-        print("UE3socket.recv:", UEsocket.recv(1024))
-    except socket.timeout:
-        pass
+    recv_banner("UE3socket.recv")
 
 # connect to gNB
+@metrics.timed("connect")
 def connectGNB():
     global gNBsocket
     gNBsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    gNBsocket.settimeout(1)
+    t0 = time.monotonic()
+    gNBsocket.settimeout(rtt.timeout(("gnb",), GNB_TIMEOUT))
     gNBsocket.connect(("localhost", GNB_PORT_BASE))
-    print(gNBsocket.recv(1024))
+    log.debug("gNBsocket.recv: %s", gNBsocket.recv(1024))
+    rtt.observe(("gnb",), time.monotonic() - t0)
 
 # +++ 
 def canonical_ret(raw: str) -> str:
@@ -326,31 +429,67 @@ def canonical_ret(raw: str) -> str:
     return s
 
 def sendSymbol(symbol: string):
-    print("symbol:", symbol)
+    log.debug("symbol: %s", symbol)
     if "serviceRequest" in symbol:
         sendRRCRelease()
         time.sleep(0.1)
     if ":" in symbol:
-        print("send Symbol-fuzzing")
+        log.debug("send Symbol-fuzzing")
         i = symbol.find(":")
         sendSymbol("testMessage")
         testMsg = symbol[i+1:]
         return sendFuzzingMessage(testMsg.encode())
-    print("send normal nas")
+    log.debug("send normal nas")
+    # +++ one deadline for the request from the RTTs seen for this symbol in this state class
+    key = (symbol.split("_")[0], rtt.state)
+    wait = rtt.timeout(key, UE_RECV_WAIT)
+    drain_late_reply()
     UEsocket.send(symbol.encode())
+    t0 = time.monotonic()
     msg_out = ""
     for i in range(3):
+        left = t0 + wait - time.monotonic()
+        if left <= 0:
+            break
+        UEsocket.settimeout(left)
         try:
             msg_out = UEsocket.recv(1024).decode().strip()
             if msg_out: 
                 break
         except socket.timeout:
             # msg_out = "null_action"
-            pass
+            break
         time.sleep(0.05)
-    print("msg_out:", msg_out)
+    UEsocket.settimeout(UE_TIMEOUT)
+    rtt.done(key, time.monotonic() - t0, bool(msg_out), UE_RECV_WAIT, t0)
+    rtt.state = canonical_ret(msg_out)
+    if not msg_out:
+        note_rtt()
+    # +++ response timeouts, per round in logs/placement.jsonl
+    metrics.inc("recvs")
+    if not msg_out:
+        metrics.inc("recv_timeouts")
+    log.debug("msg_out: %s", msg_out)
     return msg_out
 
+def drain_late_reply():
+    # a reply to the previous request after its deadline would be read as the reply to this one
+    if rtt.pending is None:
+        return
+    UEsocket.settimeout(0)
+    try:
+        late = UEsocket.recv(1024)
+    except (BlockingIOError, socket.timeout):
+        late = b""
+    finally:
+        UEsocket.settimeout(UE_TIMEOUT)
+    if late:
+        log.debug("late reply dropped: %s", late)
+        rtt.late_reply(time.monotonic())
+        note_rtt()
+    else:
+        rtt.pending = None
+
 symbols_enabled = [
                    "registrationRequest", 
                    "registrationComplete",
@@ -397,16 +536,23 @@ symbols_sm = ["PDUSessionEstablishmentRequest",
               "gsmStatus"]
 
 # send a message to UERANSIM
+@metrics.timed("send")
 def sendFuzzingMessage(msg):
     UEsocket.send(msg)
-    print("send fuzzing msg context:", msg)
-    return UEsocket.recv(1024).decode().strip()
+    log.debug("send fuzzing msg context: %s", msg)
+    metrics.inc("recvs")
+    try:
+        return UEsocket.recv(1024).decode().strip()
+    except socket.timeout:
+        metrics.inc("recv_timeouts")
+        raise
 
 # get a message from UERANSIM
 def getFuzzingMessage(msg_len: int):
     return UEsocket.recv(msg_len + 1)
 
 # +++
+@metrics.timed("align")
 def exec_sequence_align(fsm: FSM, start_state: str, path: Path):
     if path is None:
         return True, [start_state], []
@@ -416,7 +562,7 @@ def exec_sequence_align(fsm: FSM, start_state: str, path: Path):
     for i, act in enumerate(path.input_symbols):
         out = sendSymbol(act)
         out_canonical = canonical_ret(out)
-        print("msg_out_canonical:", out_canonical)
+        log.debug("msg_out_canonical: %s", out_canonical)
         ret_seq.append(out_canonical)
         cand = [t for t in fsm.transitions if t[0] == s and t[1] == act and t[2] == out_canonical]
         if cand:
@@ -424,31 +570,41 @@ def exec_sequence_align(fsm: FSM, start_state: str, path: Path):
         if not cand:
             cand = [t for t in fsm.transitions if t[0] == s and t[1] == act]
             if not cand:
-                print(f"[ALIGN] no edge for {s} --{act}/{out_canonical}--> ?")
-                print("exec_sequence_align false, state_seq:", state_seq, "ret_seq:", ret_seq)
+                log.debug("[ALIGN] no edge for %s --%s/%s--> ?", s, act, out_canonical)
+                log.debug("exec_sequence_align false, state_seq: %s ret_seq: %s", state_seq, ret_seq)
                 return False, state_seq, ret_seq
             t = random.choice(cand)
         s = t[3]
         state_seq.append(s)
-    print("exec_sequence_align true, state_seq:", state_seq, "ret_seq:", ret_seq)
+    log.debug("exec_sequence_align true, state_seq: %s ret_seq: %s", state_seq, ret_seq)
     return True, state_seq, ret_seq
 
 # +++
 def send_symbol_on(sock: socket.socket, symbol: str, timeout=3.0) -> str:
-    sock.settimeout(timeout)
+    key = (symbol.split("_")[0], "on")
+    sock.settimeout(rtt.timeout(key, timeout))
     sock.send(symbol.encode())
+    t0 = time.monotonic()
+    metrics.inc("recvs")
     try:
-        return sock.recv(1024).decode().strip()
+        out = sock.recv(1024).decode().strip()
+        rtt.done(key, time.monotonic() - t0, True, timeout)
+        return out
     except socket.timeout:
+        metrics.inc("recv_timeouts")
+        rtt.done(key, time.monotonic() - t0, False, timeout)
+        # the late reply would land on another socket than UEsocket
+        rtt.pending = None
+        note_rtt()
         return "null_action"
 
 def check_amf():
-    print("check amf is crash or not")
+    log.debug("check amf is crash or not")
 
     out = sendSymbol("registrationRequest")
     time.sleep(0.5)
     if out != "authenticationRequest":
-        print("AMF Crashed")
+        log.warning("AMF Crashed")
         return True
     return False
 
@@ -471,16 +627,13 @@ def check_smf():
         out_list.append(out)
         time.sleep(0.5)
         if out != path.output_symbols[i]:
-            print("SMF Crashed")
-            print(path.input_symbols)
-            print(path.output_symbols)
-            print(out_list)
+            log.warning("SMF Crashed: inputs=%s expected=%s got=%s", path.input_symbols, path.output_symbols, out_list)
             return True
     return False
 
 if __name__ == '__main__':
     now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S") 
-    print(f"start time: {now}")
+    log.info("start time: %s", now)
     setOffset(0)
     # load FSM
     if os.path.exists(WORK_DIR / "./savedFSM.json") and os.path.exists(WORK_DIR / "./savedFSM_sm.json"):
@@ -503,31 +656,79 @@ if __name__ == '__main__':
     atexit.register(exit_handler, fsm, fsm_sm)
 
     # +++ 
-    schedule_amf = MCTSSchedule(init_state=fsm.init_state)
-    schedule_smf = MCTSSchedule(init_state=fsm_sm.init_state)
+    schedule_cls = ArrayMCTSSchedule if MCTS_BACKEND == "array" else MCTSSchedule
+    if MCTS_SHARED:
+        mcts_key = read_authkey(CTRL_DIR / "mcts_authkey")
+        schedule_amf = SharedMCTSSchedule("amf", fsm.init_state, ("127.0.0.1", MCTS_SHARED_PORT), mcts_key)
+        schedule_smf = SharedMCTSSchedule("smf", fsm_sm.init_state, ("127.0.0.1", MCTS_SHARED_PORT), mcts_key)
+    else:
+        schedule_amf = schedule_cls(init_state=fsm.init_state, select_mode=MCTS_SELECT_MODE,
+                                    transposition=bool(MCTS_TRANSPOSITION), tt_bucket=MCTS_TT_BUCKET,
+                                    max_nodes=MCTS_MAX_NODES)
+        schedule_smf = schedule_cls(init_state=fsm_sm.init_state, select_mode=MCTS_SELECT_MODE,
+                                    transposition=bool(MCTS_TRANSPOSITION), tt_bucket=MCTS_TT_BUCKET,
+                                    max_nodes=MCTS_MAX_NODES)
     mcts_amf_file = WORK_DIR / "savedMCTS_amf.json"
     mcts_smf_file = WORK_DIR / "savedMCTS_smf.json"
-    if os.path.exists(mcts_amf_file):
+    if os.path.exists(mcts_amf_file) and not MCTS_SHARED:
         with open(mcts_amf_file, "r") as fpa:
-            schedule_amf.root = MCTSNode.from_dict(json.load(fpa))
+            schedule_amf.load_tree(json.load(fpa))
             rebuild_state_visits_from_tree(schedule_amf)
 
-    if os.path.exists(mcts_smf_file):
+    if os.path.exists(mcts_smf_file) and not MCTS_SHARED:
         with open(mcts_smf_file, "r") as fps:
-            schedule_smf.root = MCTSNode.from_dict(json.load(fps))
+            schedule_smf.load_tree(json.load(fps))
             rebuild_state_visits_from_tree(schedule_smf)
     warm_expand_root(schedule_amf, fsm)
     warm_expand_root(schedule_smf, fsm_sm)
+    if GCDA_COV:
+        # +++ arc coverage of the AMF/SMF objects as an MCTS reward term, read every GCDA_EVERY episodes
+        nf_pids = lambda: pgrep_all("open5gs-amfd") + pgrep_all("open5gs-smfd")
+        flush = {"signal": lambda: gcov_flush_by_signal(nf_pids(), gcda_cov.files),
+                 "gdb": lambda: gcov_flush_by_gdb(nf_pids())}.get(GCDA_FLUSH)
+        gcda_cov = GcdaCoverage(config['OPEN5GS_PATH'], flush=flush)
+        gcda_cov.poll()
+        # the counters belong to the core instance: with other workers on it their arcs
+        # would be credited to this worker's path, so the reward term needs it alone
+        sharers = sum(1 for w in range(int(config.get('N_WORKERS', 1))) if worker_instance(w) == INST.k) if PARALLEL else 1
+        if sharers > 1:
+            log.warning("gcda reward off: %d workers share the counters of core instance %d", sharers, INST.k)
+        elif not MCTS_SHARED:
+            schedule_amf.cov_reward = schedule_smf.cov_reward = GCDA_REWARD
+        log.info("gcda coverage: %d files, %d arcs covered", len(gcda_cov.files), gcda_cov.total)
+    metrics.set("mcts_nodes_amf", schedule_amf.n_nodes)
+    metrics.set("mcts_nodes_smf", schedule_smf.n_nodes)
+    metrics.start_live(WORK_DIR / "metrics_live.json")
+    if args.profile:
+        profiler = WorkerProfiler(WID, WORK_DIR / "profile", args.profile, gauges=lambda: {
+            "fsm_states": len(fsm.states) + len(fsm_sm.states),
+            "fsm_paths": sum(len(s.paths) for s in fsm.states) + sum(len(s.paths) for s in fsm_sm.states),
+            "fsm_transitions": len(fsm.transitions) + len(fsm_sm.transitions),
+            "edge_hits": len(fsm.edge_hits) + len(fsm_sm.edge_hits),
+            "mcts_nodes_amf": schedule_amf.n_nodes,
+            "mcts_nodes_smf": schedule_smf.n_nodes,
+        })
+        profiler.start()
+        log.info("profiling (%s) to %s", args.profile, profiler.out_dir)
     
     is_fresh_start = False
 
+    corpus_sync = None
+    if CORPUS_SYNC:
+        # with the FSM merge every state of the loaded FSM has the same name on all workers
+        canonical = set(fsm.get_state_names()) | set(fsm_sm.get_state_names()) if FSM_MERGE else None
+        corpus_sync = CorpusSync(WID, canonical=canonical)
+        corpus_sync.start()
+
     if PARALLEL:
-        print(f"[Worker{WID}] waiting for master epoch...")
+        log.info("waiting for master epoch...")
         while get_epoch() < 1:
+            heartbeat.beat("wait_epoch")
             time.sleep(0.2)
         reset(False)
         is_fresh_start = True
         prev_epoch = get_epoch()
+        metrics.set("epoch", prev_epoch)
     else:
         reset(True)
         full_reset = False
@@ -535,9 +736,13 @@ if __name__ == '__main__':
     stuck_root = 0
 
     while True:
+        heartbeat.beat("loop", metrics.counters["episodes"])
+        metrics.maybe_flush()
+        if profiler is not None:
+            profiler.maybe_rotate()
         # +++ 
         if PARALLEL and RESET_PENDING_FILE.exists():
-            print(f"[Worker{WID}] master reset pending, pausing...")
+            log.info("master reset pending, pausing...")
             try: UEsocket.close()
             except: pass
             t_ep = get_epoch()
@@ -548,34 +753,37 @@ if __name__ == '__main__':
 
         try:
             now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S") 
-            print(f"{now}: [Worker{WID}] loop start")
+            log.debug("%s: loop start", now)
+            # +++ episode cost: resets, alignment, fuzzing and probing of this iteration
+            t_episode = time.monotonic()
             # +++ 
             if PARALLEL:
                 curr_ep = get_epoch()
-                print("epoch:", curr_ep)
+                log.debug("epoch: %d", curr_ep)
                 if curr_ep > prev_epoch:
-                    print(f"[Worker{WID}] epoch {prev_epoch}->{curr_ep}, reset UEs")
+                    log.info("epoch %d->%d, reset UEs", prev_epoch, curr_ep)
                     reset(False)
                     prev_epoch = curr_ep
+                    metrics.set("epoch", curr_ep)
             else:
                 reset(full_reset)
-                print("IMSI_OFFSET:", getOffset())
+                log.debug("IMSI_OFFSET: %s", getOffset())
                 full_reset = False
             try:
                 # +++ 
                 if PARALLEL and RESET_PENDING_FILE.exists():
-                    print(f"[Worker{WID}] reset pending before connect, pausing...")
+                    log.info("reset pending before connect, pausing...")
                     t_ep = get_epoch()
                     new_ep = wait_master_reset(t_ep)
                     reset(False)
                     prev_epoch = new_ep
                     continue             
 
-                print(f"[Worker{WID}] connectUE start - 1")
+                log.debug("connectUE start - 1")
                 connectUE()
-                print(f"[Worker{WID}] connectUE done - 1")
+                log.debug("connectUE done - 1")
             except (socket.timeout, ConnectionRefusedError, ConnectionResetError):
-                print("UE Connection failed(timeout/refused/reset), retrying...")
+                log.warning("UE Connection failed(timeout/refused/reset), retrying...")
                 reset_count += 1
                 # +++ 
                 if PARALLEL:
@@ -591,12 +799,16 @@ if __name__ == '__main__':
                         reset_count = 0
                 continue
             # +++ 
-            leaf_amf, mcts_path_amf = schedule_amf.choose_state(fsm, lambda name: fsm.get_state(name))
-
-            print("[MCTS] picked leaf path:", leaf_amf.state_path)
-            print("[MCTS] root children:", list(schedule_amf.root.children.keys()))
-            print("[MCTS] root fully_expanded?:", 
-                len(schedule_amf.root.children) >= len({t[3] for t in fsm.transitions if t[0]==fsm.init_state and t[3]!=fsm.init_state}))
+            with metrics.phase("select"):
+                leaf_amf, mcts_path_amf = schedule_amf.choose_state(fsm, lambda name: fsm.get_state(name))
+
+            if trace.isEnabledFor(logging.DEBUG):
+                trace.debug("[MCTS] picked leaf path: %s", leaf_amf.state_path)
+                trace.debug("[MCTS] tree nodes amf=%d smf=%d prunes amf=%d smf=%d", schedule_amf.n_nodes,
+                            schedule_smf.n_nodes, schedule_amf.prune_count, schedule_smf.prune_count)
+                trace.debug("[MCTS] root children: %s", list(schedule_amf.root.children.keys()))
+                trace.debug("[MCTS] root fully_expanded?: %s",
+                    len(schedule_amf.root.children) >= len({t[3] for t in fsm.transitions if t[0]==fsm.init_state and t[3]!=fsm.init_state}))
             
             curr_state = fsm.get_state(leaf_amf.state_path[-1])
 
@@ -611,41 +823,48 @@ if __name__ == '__main__':
                     leaf_amf = random.choice(list(schedule_amf.root.children.values()))
                     mcts_path_amf = [schedule_amf.root, leaf_amf]
                     curr_state = fsm.get_state(leaf_amf.state_path[-1])
-                    print("[ANTI-STICKY] force pick child:", curr_state.name)
+                    log.info("[ANTI-STICKY] force pick child: %s", curr_state.name)
                 stuck_root = 0
 
-            print("init_state:", repr(fsm.init_state))
-            print("state_names:", [repr(s.name) for s in fsm.states])
-            print("Transitions out of init state:", {t[3] for t in fsm.transitions if t[0] == fsm.init_state})
+            if trace.isEnabledFor(logging.DEBUG):
+                trace.debug("init_state: %r", fsm.init_state)
+                trace.debug("state_names: %s", [repr(s.name) for s in fsm.states])
+                trace.debug("Transitions out of init state: %s", {t[3] for t in fsm.transitions if t[0] == fsm.init_state})
             curr_state_sm = None
             used_smf = False
             if curr_state.oracle.state == "R":
                 used_smf = True
-                leaf_smf, mcts_path_smf = schedule_smf.choose_state(
-                    fsm_sm, lambda n: fsm_sm.get_state(n)
-                )
+                with metrics.phase("select"):
+                    leaf_smf, mcts_path_smf = schedule_smf.choose_state(
+                        fsm_sm, lambda n: fsm_sm.get_state(n)
+                    )
                 curr_state_sm = fsm_sm.get_state(leaf_smf.state_path[-1])
             if curr_state_sm == None:
                 state = curr_state.name
             else:
                 state = curr_state.name + ":" + curr_state_sm.name
-            print(f"[Worker{WID}] select state {state}")
+            log.info("select state %s", state)
+            if corpus_sync:
+                corpus_sync.want(state)
             path = curr_state.select_path()
-            print("path for", curr_state.name, ":", None if path is None else path.path_states)
+            log.debug("path for %s: %s", curr_state.name, None if path is None else path.path_states)
             path_exec_amf, state_seq_amf, ret_seq_amf = exec_sequence_align(fsm, fsm.init_state, path)
             reached = state_seq_amf[-1]
             target  = leaf_amf.state_path[-1]
             if reached != target:
                 schedule_amf.sink_hits[reached] += 2
                 schedule_amf.state_visits[target] += 3
-            print(f"[ALIGN] amf target={leaf_amf.state_path[-1]} reached={state_seq_amf[-1]}")
+            log.debug("[ALIGN] amf target=%s reached=%s", leaf_amf.state_path[-1], state_seq_amf[-1])
             mcts_path_exec_amf = mcts_nodes_from_state_seq(schedule_amf, state_seq_amf) if state_seq_amf else [schedule_amf.root]
-            print("mcts_path_exec_amf:", mcts_path_exec_amf)
+            log.debug("mcts_path_exec_amf: %s", mcts_path_exec_amf)
             if path_exec_amf != True:
+                metrics.inc("align_fail")
+                schedule_amf.charge_cost(mcts_path_exec_amf, time.monotonic() - t_episode)
                 curr_state.count -= 1
                 reset_count += 1
                 continue
             else:
+                metrics.inc("align_ok")
                 is_fresh_start = False
                 # +++ 
                 curr_state.set_visited()
@@ -665,14 +884,17 @@ if __name__ == '__main__':
                 if reached_sm != target_sm:
                     schedule_smf.sink_hits[reached_sm] += 2
                     schedule_smf.state_visits[target_sm] += 3
-                print(f"[ALIGN] smf target={leaf_smf.state_path[-1]} reached={state_seq_smf[-1]}")
+                log.debug("[ALIGN] smf target=%s reached=%s", leaf_smf.state_path[-1], state_seq_smf[-1])
                 mcts_path_exec_smf = mcts_nodes_from_state_seq(schedule_smf, state_seq_smf) if state_seq_smf else [schedule_smf.root]
-                print("mcts_path_exec_smf:", mcts_path_exec_smf) 
+                log.debug("mcts_path_exec_smf: %s", mcts_path_exec_smf)
                 if path_exec_smf != True:
+                    metrics.inc("align_fail")
+                    schedule_smf.charge_cost(mcts_path_exec_smf, time.monotonic() - t_episode)
                     curr_state_sm.count -= 1
                     reset_count += 1
                     continue
                 else:
+                    metrics.inc("align_ok")
                     curr_state_sm.set_visited()
                     ins_seq_smf = (path_sm.input_symbols if path_sm else [])
                     fsm_sm.mark_edges_from_seq(state_seq_smf, ins_seq_smf, ret_seq_smf)
@@ -681,15 +903,16 @@ if __name__ == '__main__':
                     if path_sm != None:
                         path_sm.add_succ()
 
+            t_seed = time.monotonic()
             out = sendSymbol("enableFuzzing")
-            print(out)
+            log.debug("enableFuzzing: %s", out)
             if out == "Start fuzzing":
-                print("Fuzzing enabled")
+                log.debug("Fuzzing enabled")
                 if not curr_state.is_init:
                     for symbol in symbols_enabled:
                         send_msg = sendSymbol(symbol)
                         resp_json = json.loads(send_msg)
-                        print("resp_json:", resp_json)
+                        log.debug("resp_json: %s", resp_json)
                         store_new_message(worker_id=WID,
                                         if_fuzz=False,
                                         state=state,
@@ -708,11 +931,17 @@ if __name__ == '__main__':
                                         violation=False,
                                         mm_status=resp_json.get("mm_status"),
                                         byte_mut=False)
-                if check_seed_msg(state):
-                    print("msg ount enough")
+                seeded = check_seed_msg(state)
+                metrics.add("seed", time.monotonic() - t_seed)
+                if seeded:
+                    log.debug("msg count enough")
                     curr_state.is_init = True
                 else:
                     curr_state.is_init = False
+                    seed_cost = time.monotonic() - t_episode
+                    schedule_amf.charge_cost(mcts_path_exec_amf, seed_cost)
+                    if used_smf:
+                        schedule_smf.charge_cost(mcts_path_exec_smf, seed_cost)
                     continue
                 
                 fuzzing = True
@@ -726,16 +955,16 @@ if __name__ == '__main__':
                 while fuzzing:
                     if not PARALLEL:
                         try:
-                            print("start connect gNB")
+                            log.debug("start connect gNB")
                             connectGNB()
-                            print("connected gNB")
+                            log.debug("connected gNB")
                         except socket.timeout:
-                            print("gNB Connection timeout, retrying...")
+                            log.warning("gNB Connection timeout, retrying...")
                             break
 
                     # +++ 
                     sendSymbol("syncDown")
-                    print("syncDown done")
+                    log.debug("syncDown done")
 
                     ins_msg = get_insteresting_msg(state)
                     if_crash=False
@@ -743,20 +972,23 @@ if __name__ == '__main__':
                     is_interesting=False
                     if_error=False
                     error_cause=""
-                    print(sendSymbol("incomingMessage_"+str(ins_msg.get("size"))))
+                    out = sendSymbol("incomingMessage_"+str(ins_msg.get("size")))
+                    log.debug("incomingMessage: %s", out)
                     if ins_msg.get("send_type") == "serviceRequest":
                         sendRRCRelease()
                     try:
                         base_ts, base_id = begin_field_window()
-                        print("start send fuzzing msg")
+                        log.debug("start send fuzzing msg")
                         send_msg = sendFuzzingMessage(ins_msg.get("new_msg").encode())
                     except socket.timeout:
-                        print("UE may crashed")
+                        log.warning("UE may crashed")
                         break
                     if send_msg == "":
-                        print("UE may crashed")
+                        log.warning("UE may crashed")
                         break
-                    print("send msg:", send_msg)
+                    metrics.inc("execs")
+                    metrics.set("last_exec", time.time())
+                    log.debug("send msg: %s", send_msg)
                     if send_msg == "decode error":
                         reset_insteresting(ins_msg)
                         break
@@ -773,7 +1005,7 @@ if __name__ == '__main__':
                     if err_resp:
                         if_error = True
                         error_cause = err_resp
-                        print("feedback from gNB log", err_resp)
+                        log.info("feedback from gNB log %s", err_resp)
                         if not byte_mut:
                             is_interesting = check_new_cause(state, ins_msg.get("send_type"), error_cause)
                         if is_interesting:
@@ -781,41 +1013,34 @@ if __name__ == '__main__':
                             msg_add_energy(ins_msg, 0.5)
 
                     # probe AMF
-                    print("send probe to AMF")
+                    log.debug("send probe to AMF")
                     pending_global_reset = False
                     # if_crash = check_amf()
-                    if_crash, amf_crash_list = check_amf_crash(core_log_path="logs/core.log")
+                    if_crash, amf_crash_list = check_amf_crash(core_log_path=CORE_LOG_PATH)
                     if if_crash:
-                        print("amf crashed")
                         fuzzing = False
                         pending_global_reset = True
-                        print(f"[AMF] Detect {len(amf_crash_list)} crash:")
+                        log.warning("[AMF] Detect %d crash:", len(amf_crash_list))
                         for it in amf_crash_list[:3]:
-                            print(f"L{it['line_no']} {it['keyword']}: {it['text']}")
-                        now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                        crash_log = f"logs/crash/crash_amf_worker{WID}_{now}.log"
-                        shutil.copy("logs/core.log", crash_log)
-                        print(f"{now}: [AMF] Crash log saved to {crash_log}")
+                            log.warning("L%s %s: %s", it['line_no'], it['keyword'], it['text'])
+                        triage_crash("amf", amf_crash_list, state, ins_msg, resp_json)
 
                     if resp_json.get("ret_type") != "":
                         fuzzing = False
                     violation = curr_state.oracle.query_message(ins_msg.get("send_type"), resp_json.get("ret_type"), resp_json.get("sht"), resp_json.get("secmod"))
-                    print("violation: ", violation)
+                    log.debug("violation: %s", violation)
                     if violation:
                         violation = check_new_violation(state, ins_msg.get("send_type"), resp_json.get("ret_type"), resp_json.get("sht"), resp_json.get("secmod"))
                     # send probe to SMF
                     if ins_msg.get("send_type") in symbols_sm:
-                        print("send probe to SMF")
+                        log.debug("send probe to SMF")
                         # if_crash_sm = check_smf()
-                        if_crash_sm, smf_crash_list = check_smf_crash(core_log_path="logs/core.log")
+                        if_crash_sm, smf_crash_list = check_smf_crash(core_log_path=CORE_LOG_PATH)
                         if if_crash_sm:
-                            print(f"[SMF] Detect {len(smf_crash_list)} crash:")
+                            log.warning("[SMF] Detect %d crash:", len(smf_crash_list))
                             for it in smf_crash_list[:3]:
-                                print(f"L{it['line_no']} {it['keyword']}: {it['text']}") 
-                            now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                            crash_smf_log = f"logs/crash/crash_smf_worker{WID}_{now}.log"
-                            shutil.copy("logs/core.log", crash_smf_log)
-                            print(f"{now}: [SMF] Crash log saved to {crash_smf_log}")
+                                log.warning("L%s %s: %s", it['line_no'], it['keyword'], it['text'])
+                            triage_crash("smf", smf_crash_list, state, ins_msg, resp_json)
                     store_new_message(worker_id=WID,
                                       if_fuzz=True,
                                       state=state,
@@ -835,7 +1060,8 @@ if __name__ == '__main__':
                                       mm_status=resp_json.get("mm_status"),
                                       byte_mut=byte_mut)
                     if resp_json.get("ret_type") != "" and not fsm.search_new_transition(state, ins_msg.get("send_type"), resp_json.get("ret_type")) and not byte_mut:
-                        print("get a different return msg")
+                        log.info("get a different return msg")
+                        t_learn = time.monotonic()
                         message_str = ins_msg.get("send_type")+":"+resp_json.get("new_msg")+":"+str(resp_json.get("secmod"))+":"+str(resp_json.get("sht"))
                         responses = []
                         new_state_error = False
@@ -849,28 +1075,29 @@ if __name__ == '__main__':
                                 try:
                                     if not PARALLEL:
                                         connectGNB()
-                                    print(f"[Worker{WID}] connectUE start - 2")
+                                    log.debug("connectUE start - 2")
                                     connectUE()
-                                    print(f"[Worker{WID}] connectUE done - 2")
+                                    log.debug("connectUE done - 2")
                                 except socket.timeout:
-                                    print("UE Connection timeout2, retrying...")
+                                    log.warning("UE Connection timeout2, retrying...")
                                     continue
                                 if sendSymbol(message_str) != resp_json.get("ret_type"):
-                                    print("response to new symbol not match, retrying...")
+                                    log.warning("response to new symbol not match, retrying...")
                                     continue
                                 res = sendSymbol(symbol)
                                 if res == "":
-                                    print("UE may crashed, retrying...")
+                                    log.warning("UE may crashed, retrying...")
                                     continue
                                 responses.append(res)
                                 break
                             if i == 10:
-                                print("error in learning new state, giving up...")
+                                log.warning("error in learning new state, giving up...")
                                 new_state_error = True
                                 break
                         if new_state_error:
+                            metrics.add("learn", time.monotonic() - t_learn)
                             break
-                        print(responses)
+                        log.debug("responses: %s", responses)
                         # check if new state
                         map_state = ""
                         for s in fsm.states:
@@ -888,8 +1115,7 @@ if __name__ == '__main__':
                             fsm.transitions.append(new_transition)
                             for s in fsm.states:
                                 get_all_paths(fsm, s)
-                            print("new transition added")
-                            print(new_transition)
+                            log.info("new transition added %s", new_transition)
                         else:
                             is_new_state = True
                             is_new_transition = True
@@ -903,7 +1129,10 @@ if __name__ == '__main__':
                             for s in fsm.states:
                                 get_all_paths(fsm, s)
                             new_state.oracle.decide_state(new_state)
-                            print("new state added")
+                            log.info("new state added %s", new_state.name)
+                            metrics.inc("new_states")
+                        metrics.inc("new_transitions")
+                        metrics.add("learn", time.monotonic() - t_learn)
                     
                     if pending_global_reset:
                         if PARALLEL:
@@ -914,12 +1143,12 @@ if __name__ == '__main__':
 
                 # +++ 
                 sendSymbol("syncUp")
-                print("syncUp done")
+                log.debug("syncUp done")
 
                 if not PARALLEL:
                     gNBsocket.close()
                 UEsocket.close()
-                print("socket closed")
+                log.debug("socket closed")
 
                 is_interesting_state = violation or if_crash or if_crash_sm \
                                 or (resp_json.get("ret_type") not in ("", None)
@@ -928,27 +1157,48 @@ if __name__ == '__main__':
                                                                         resp_json.get("ret_type")))
                 error_bonus = 0.0
                 error_flag = violation or if_crash or if_crash_sm     
+                metrics.inc("crashes", int(bool(if_crash)) + int(bool(if_crash_sm)))
+                metrics.inc("violations", int(bool(violation)))
                 if error_flag:
                     error_hits[state] += 1
                     error_bonus = 1.0 / (error_hits[state] ** 0.5)
 
                 new_trans_path = is_new_transition
                 new_fields = count_window_fields(int(WID), base_ts, base_id)
-                print("new_fields: ", new_fields)
+                log.debug("new_fields: %d", new_fields)
+                new_cov = 0
+                cov_credit = 0.0
+                if gcda_cov is not None and metrics.counters["episodes"] % GCDA_EVERY == 0:
+                    with metrics.phase("coverage"):
+                        new_cov = gcda_cov.poll()
+                    metrics.set("cov_arcs", gcda_cov.total)
+                    log.debug("gcda: %d new arcs, %d total", new_cov, gcda_cov.total)
+                    # arcs of the last GCDA_EVERY episodes, the polling episode's path gets their mean
+                    cov_credit = new_cov / GCDA_EVERY
                 # +++ 
-                mcts_reward = schedule_amf.backpropagate(path=mcts_path_exec_amf, new_state=is_new_state, new_transition=new_trans_path, error_reward=error_bonus, new_fields_cnt=new_fields)
+                episode_cost = time.monotonic() - t_episode
+                mcts_reward = schedule_amf.backpropagate(path=mcts_path_exec_amf, new_state=is_new_state, new_transition=new_trans_path, error_reward=error_bonus, new_fields_cnt=new_fields, cost=episode_cost, new_cov_edges=cov_credit)
                 if used_smf:
-                    schedule_smf.backpropagate(path=mcts_path_exec_smf, new_state=is_new_state, new_transition=new_trans_path, error_reward=error_bonus, new_fields_cnt=new_fields)
+                    schedule_smf.backpropagate(path=mcts_path_exec_smf, new_state=is_new_state, new_transition=new_trans_path, error_reward=error_bonus, new_fields_cnt=new_fields, cost=episode_cost, new_cov_edges=cov_credit)
                 update_msg_reward(ins_msg, mcts_reward)
-
-                fsm_file = open(WORK_DIR / './savedFSM.json', 'w')
-                fsm_file.write(fsm.to_json())
-                fsm_file.close()
+                metrics.inc("episodes")
+                metrics.set("mcts_nodes_amf", schedule_amf.n_nodes)
+                metrics.set("mcts_nodes_smf", schedule_smf.n_nodes)
+                append_csv_row(MCTS_CSV, {"ts": time.time(), "state": state, "reward": mcts_reward,
+                                          "cost": round(episode_cost, 4), "new_state": is_new_state,
+                                          "new_transition": new_trans_path, "new_fields": new_fields, "new_cov": new_cov,
+                                          "nodes_amf": schedule_amf.n_nodes, "nodes_smf": schedule_smf.n_nodes})
+
+                with metrics.phase("checkpoint"):
+                    fsm_file = open(WORK_DIR / './savedFSM.json', 'w')
+                    fsm_file.write(fsm.to_json())
+                    fsm_file.close()
 
             else:
-                print("start fuzzing error, resetting...")
+                log.warning("start fuzzing error, resetting...")
         except Exception as e:
-            print(e)
+            log.exception("loop error: %s", e)
+            dump_ring(WID_LOG_DIR / f"ring_error_{time.strftime('%Y%m%d_%H%M%S')}.log", repr(e))
             error_file = open('./logs/error.log', 'a')
             error_file.write(time.strftime("%Y-%m-%d %H:%M:%S ", time.localtime()))
             error_file.write(str(e)+"\n")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# Coverage over time from the per-round lcov captures.
+# Every logs/gcov/app_<round>.info is parsed once, line by line, into integer
+# keys per source file: line numbers for DA, the FN line for functions and
+# line << 32 | block << 16 | branch for BRDA. Parsed rounds are cached by the
+# xxh64 of the .info file, so only new rounds are parsed (in parallel) on the
+# next run. The rounds are then merged in order into the union of everything
+# hit so far, per NF directory (src/amf, lib/core, ...) and in total:
+#   series.csv  cumulative lines / branches / functions hit and found per round
+#   deltas.csv  what each round covered for the first time
+import argparse, csv, gzip, json, os, pathlib, re, sys, time, xxhash
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+GCOV_DIR = pathlib.Path("logs") / "gcov"
+INFO_RE = re.compile(r"app_(\d+)_(\d+)\.info$")
+GROUP_RE = re.compile(r"/(src|lib)/([^/]+)/")
+KINDS = ("lines", "branches", "functions")
+PARSE_VERSION = 2           # part of the cache name, bump when parse_info changes
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--gcov-dir', type=pathlib.Path, default=GCOV_DIR, help='directory with app_<round>.info')
+parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='parallel parsers')
+parser.add_argument('--no-cache', action='store_true', help='parse every round again')
+
+def file_hash(path) -> str:
+    h = xxhash.xxh64()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def nf_group(source: str) -> str:
+    m = GROUP_RE.search(source)
+    return f"{m.group(1)}/{m.group(2)}" if m else "other"
+
+def parse_info(path) -> dict:
+    # {source: [lines found, lines hit, branches found, branches hit, functions found, functions hit]}
+    out = {}
+    rec = None
+    fn_line = {}            # FN name -> start line
+    fnl_line = {}           # FNL index -> start line (lcov >= 2.2)
+    with open(path, "r", errors="replace") as f:
+        for raw in f:
+            tag, _, val = raw.rstrip("\n").partition(":")
+            if tag == "SF":
+                rec = out.setdefault(val, [set() for _ in range(6)])
+                fn_line, fnl_line = {}, {}
+            elif rec is None:
+                continue
+            elif tag == "DA":
+                parts = val.split(",")
+                line = int(parts[0])
+                rec[0].add(line)
+                if int(parts[1]):
+                    rec[1].add(line)
+            elif tag == "BRDA":
+                line, block, branch, taken = val.split(",")[:4]
+                key = int(line) << 32 | (int(block) & 0xffff) << 16 | (int(branch) & 0xffff)
+                rec[2].add(key)
+                if taken not in ("-", "0"):
+                    rec[3].add(key)
+            elif tag == "FN":
+                # FN:<line>,<name> (lcov 1.x) or FN:<start>,<end>,<name> (2.x)
+                parts = val.split(",")
+                line, name = int(parts[0]), parts[-1]
+                fn_line[name] = line
+                rec[4].add(line)
+            elif tag == "FNDA":
+                count, name = val.split(",", 1)
+                if int(count) and name in fn_line:
+                    rec[5].add(fn_line[name])
+            elif tag == "FNL":
+                # FNL:<index>,<start>[,<end>]
+                parts = val.split(",")
+                fnl_line[parts[0]] = int(parts[1])
+                rec[4].add(int(parts[1]))
+            elif tag == "FNA":
+                # FNA:<index>,<count>,<name>, one per alias of the function
+                index, count, _ = val.split(",", 2)
+                if int(count) and index in fnl_line:
+                    rec[5].add(fnl_line[index])
+            elif tag == "end_of_record":
+                rec = None
+    return {src: [array("Q", sorted(s)) for s in sets] for src, sets in out.items()}
+
+def load_round(path, cache_dir):
+    # parsed round, from the cache when the .info content is unchanged
+    digest = file_hash(path)
+    cached = cache_dir / f"{digest}.v{PARSE_VERSION}.json.gz" if cache_dir else None
+    if cached and cached.exists():
+        try:
+            with gzip.open(cached, "rt") as f:
+                return {src: [array("Q", v) for v in vals] for src, vals in json.load(f).items()}
+        except (OSError, ValueError):
+            pass
+    parsed = parse_info(path)
+    if cached:
+        tmp = cached.with_suffix(".tmp")
+        with gzip.open(tmp, "wt") as f:
+            json.dump({src: [v.tolist() for v in vals] for src, vals in parsed.items()}, f)
+        os.replace(tmp, cached)
+    return parsed
+
+def round_files(gcov_dir) -> list:
+    rounds = []
+    for p in pathlib.Path(gcov_dir).glob("app_*.info"):
+        m = INFO_RE.search(p.name)
+        if m:
+            rounds.append(((int(m.group(1)), int(m.group(2))), p))
+    return [p for _, p in sorted(rounds)]
+
+def build_series(paths, cache_dir=None, jobs: int = 1):
+    # (cumulative rows, delta rows), one row per round and NF group plus "total"
+    seen = {}               # source -> 6 sets, union over the rounds so far
+    series, deltas = [], []
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+        parsed_rounds = pool.map(load_round, paths, [cache_dir] * len(paths))
+        for path, parsed in zip(paths, parsed_rounds):
+            tag = path.stem[len("app_"):]
+            ts = round(path.stat().st_mtime, 3)
+            new = {}
+            for src, vals in parsed.items():
+                acc = seen.setdefault(src, [set() for _ in range(6)])
+                g = new.setdefault(nf_group(src), [0, 0, 0])
+                for i, v in enumerate(vals):
+                    before = len(acc[i])
+                    acc[i].update(v)
+                    if i % 2:
+                        g[i // 2] += len(acc[i]) - before
+            totals = {}
+            for src, acc in seen.items():
+                for key in (nf_group(src), "total"):
+                    t = totals.setdefault(key, [0] * 6)
+                    for i in range(6):
+                        t[i] += len(acc[i])
+            new["total"] = [sum(g[k] for grp, g in new.items() if grp != "total") for k in range(3)]
+            for grp in sorted(totals):
+                t = totals[grp]
+                row = {"round": tag, "ts": ts, "group": grp}
+                for k, kind in enumerate(KINDS):
+                    row[f"{kind}_hit"], row[f"{kind}_found"] = t[2 * k + 1], t[2 * k]
+                series.append(row)
+                d = new.get(grp, [0, 0, 0])
+                deltas.append({"round": tag, "ts": ts, "group": grp,
+                               **{f"new_{kind}": d[k] for k, kind in enumerate(KINDS)}})
+    return series, deltas
+
+def write_csv(path, rows):
+    if not rows:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+    os.replace(tmp, path)
+
+def main() -> int:
+    args = parser.parse_args()
+    paths = round_files(args.gcov_dir)
+    if not paths:
+        print(f"[COVERAGE] no app_<round>.info under {args.gcov_dir}")
+        return 1
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.gcov_dir / "series_cache"
+        cache_dir.mkdir(exist_ok=True)
+    t0 = time.time()
+    series, deltas = build_series(paths, cache_dir, args.jobs)
+    write_csv(args.gcov_dir / "series.csv", series)
+    write_csv(args.gcov_dir / "deltas.csv", deltas)
+    last = next(r for r in reversed(series) if r["group"] == "total")
+    print(f"[COVERAGE] {len(paths)} rounds in {time.time() - t0:.1f}s, round {last['round']}: "
+          f"lines {last['lines_hit']}/{last['lines_found']} branches {last['branches_hit']}/{last['branches_found']} "
+          f"functions {last['functions_hit']}/{last['functions_found']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
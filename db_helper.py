@@ -2,9 +2,11 @@ from pymongo.mongo_client import MongoClient
 from dotenv import dotenv_values
 from objects import Seed, PowerSchedule
 from bson import ObjectId
-import os, time, random, datetime
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import os, time, random, datetime, xxhash, logging
 
 config = dotenv_values(".env")
+log = logging.getLogger("pascofuzz.db")
 
 # Replace the placeholder with your Atlas connection string
 uri = config["MONGO_URI"]
@@ -14,6 +16,8 @@ client = MongoClient(uri)
 PARALLEL = int(config["PARALLEL"])
 col = client["CoreFuzzer"][config["DB_NAME"]]
 col_fields = client["CoreFuzzer"]["fields"]
+# +++ global seed pool shared by all workers, _id = xxh64(state, new_msg, sht, secmod)
+col_pool = client["CoreFuzzer"][f"{config['DB_NAME']}_pool"]
 last_ts = 0 
 
 COUNT_REWARD = 1
@@ -36,6 +40,146 @@ def clear_db_col(worker_id: int):
     col_wid = client["CoreFuzzer"][f"{config['DB_NAME']}_w{worker_id}"]
     col_wid.delete_many({})
 
+# +++ _id of the newest document of a worker collection, the export bound of a round
+def last_doc_id(worker_id: int):
+    col_wid = client["CoreFuzzer"][f"{config['DB_NAME']}_w{worker_id}"]
+    doc = col_wid.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return str(doc["_id"]) if doc is not None else None
+
+# +++ 
+def clear_pool_col():
+    col_pool.delete_many({})
+    col_pool.create_index([("state", 1), ("ts", 1)])
+
+def seed_hash(state: str, new_msg: str, sht, secmod) -> str:
+    h = xxhash.xxh64()
+    for part in (state, new_msg, sht, secmod):
+        h.update(str(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+def promote_seeds(worker_id: int, since_ts: float, limit: int, max_bytes: int, keep=None):
+    # copy own interesting seeds newer than since_ts into the pool; returns (new, dup, last_ts, bytes)
+    # keep(state) -> False leaves the seed out, e.g. states only this worker knows by that name
+    docs = list(col.find({"is_interesting": True, "timestamp": {"$gt": since_ts}},
+                         {"_id": 0, "state": 1, "send_type": 1, "new_msg": 1, "sht": 1, "secmod": 1,
+                          "mm_status": 1, "ret_type": 1, "timestamp": 1})
+                .sort([("timestamp", 1)]).limit(limit))
+    batch, used, last_ts = [], 0, since_ts
+    for d in docs:
+        if keep is not None and not keep(d["state"]):
+            last_ts = d["timestamp"]
+            continue
+        size = len(d.get("new_msg") or "")
+        if batch and used + size > max_bytes:
+            break
+        used += size
+        last_ts = d["timestamp"]
+        batch.append({"_id": seed_hash(d["state"], d.get("new_msg"), d.get("sht"), d.get("secmod")),
+                      "state": d["state"], "send_type": d.get("send_type"), "new_msg": d.get("new_msg"),
+                      "sht": d.get("sht"), "secmod": d.get("secmod"), "mm_status": d.get("mm_status"),
+                      "ret_type": d.get("ret_type"), "size": size, "wid": worker_id, "ts": time.time()})
+    if not batch:
+        return 0, 0, last_ts, 0
+    try:
+        col_pool.insert_many(batch, ordered=False)
+        dup = 0
+    except BulkWriteError as e:
+        dup = sum(1 for err in e.details.get("writeErrors", []) if err.get("code") == 11000)
+    return len(batch) - dup, dup, last_ts, used
+
+def import_seeds(worker_id: int, state: str, since_ts: float, limit: int, max_bytes: int):
+    # copy pool seeds of other workers for state into the worker collection; returns (new, dup, last_ts, bytes)
+    docs = list(col_pool.find({"state": state, "wid": {"$ne": worker_id}, "ts": {"$gt": since_ts}})
+                .sort([("ts", 1)]).limit(limit))
+    batch, used, last_ts = [], 0, since_ts
+    for d in docs:
+        if batch and used + d.get("size", 0) > max_bytes:
+            break
+        used += d.get("size", 0)
+        last_ts = d["ts"]
+        batch.append({
+            "timestamp": time.time(),
+            "worker_id": worker_id,
+            "origin_wid": d["wid"],
+            "if_fuzz": False,
+            "state": state,
+            "send_type": d.get("send_type"),
+            "ret_type": d.get("ret_type") or "",
+            "if_crash": False,
+            "if_crash_sm": False,
+            "if_error": False,
+            "error_cause": "",
+            "is_interesting": True,
+            "sht": d.get("sht"),
+            "secmod": d.get("secmod"),
+            "size": d.get("size", 0),
+            "base_msg": "",
+            "new_msg": d.get("new_msg"),
+            "ret_msg": "",
+            "energy": 1.0,
+            "mutate_count": 0,
+            "violation": False,
+            "mm_status": d.get("mm_status"),
+            "byte_mut": False,
+            "imported": True})
+    if not batch:
+        return 0, 0, last_ts, 0
+    try:
+        col.insert_many(batch, ordered=False)
+        dup = 0
+    except BulkWriteError as e:
+        dup = sum(1 for err in e.details.get("writeErrors", []) if err.get("code") == 11000)
+    return len(batch) - dup, dup, last_ts, used
+
+# +++ rename states after a learned-FSM merge; rename(old) -> new
+def rename_states(worker_id: int, rename):
+    col_wid = client["CoreFuzzer"][f"{config['DB_NAME']}_w{worker_id}"] if PARALLEL else col
+    moves = {}
+    for old in col_wid.distinct("state"):
+        new = rename(old)
+        if new != old:
+            moves[old] = new
+    # two phases so swapped names (H0<->H1) do not collide on the unique index
+    for old, new in moves.items():
+        col_wid.update_many({"state": old}, {"$set": {"state": f"\x00{old}"}})
+    dropped = 0
+    for old, new in moves.items():
+        try:
+            col_wid.update_many({"state": f"\x00{old}"}, {"$set": {"state": new}})
+        except DuplicateKeyError:
+            # the same seed is already stored under the merged state
+            for d in col_wid.find({"state": f"\x00{old}"}, {"_id": 1}):
+                try:
+                    col_wid.update_one({"_id": d["_id"]}, {"$set": {"state": new}})
+                except DuplicateKeyError:
+                    col_wid.delete_one({"_id": d["_id"]})
+                    dropped += 1
+    print(f"[MERGE] worker{worker_id} renamed {len(moves)} states, dropped {dropped} duplicate seeds")
+    return moves
+
+# +++ the same rename for the seeds a worker promoted into the pool; _id hashes the state, so they are reinserted
+def rename_pool_states(worker_id: int, rename):
+    moved = 0
+    for old in col_pool.distinct("state", {"wid": worker_id}):
+        new = rename(old)
+        if new == old:
+            continue
+        docs = list(col_pool.find({"wid": worker_id, "state": old}))
+        col_pool.delete_many({"wid": worker_id, "state": old})
+        now = time.time()
+        for d in docs:
+            d.update(_id=seed_hash(new, d.get("new_msg"), d.get("sht"), d.get("secmod")), state=new, ts=now)
+        try:
+            col_pool.insert_many(docs, ordered=False)
+            moved += len(docs)
+        except BulkWriteError as e:
+            # another worker already pooled the seed under the merged state
+            moved += e.details.get("nInserted", 0)
+    if moved:
+        print(f"[MERGE] worker{worker_id} moved {moved} pool seeds to merged states")
+    return moved
+
 def begin_field_window():
     base_ts = datetime.datetime.fromtimestamp(0, tz=datetime.timezone.utc)
     base_id = ObjectId("000000000000000000000000")
@@ -60,10 +204,10 @@ def read_new_fields():
     q = {"ts": {"$gt": last_ts}}
     docs = list(col_fields.find(q, {"_id": 0, "ts": 1}))
     if not docs:
-        print("new fields is null")
+        log.debug("new fields is null")
         return 0
     last_ts = max(d["ts"] for d in docs)
-    print("new fields: ", len(docs))
+    log.debug("new fields: %d", len(docs))
     return len(docs)   
 
 def store_new_message(worker_id: int, if_fuzz: bool, state: str, send_type: str, ret_type: str, if_crash: bool, if_crash_sm: bool, is_interesting: bool, if_error: bool, error_cause: str, sht: int, secmod: int, base_msg: str, new_msg: str, ret_msg: str, violation: bool, mm_status: str, byte_mut: bool):
@@ -94,7 +238,7 @@ def store_new_message(worker_id: int, if_fuzz: bool, state: str, send_type: str,
             })
     except Exception as e:
         # print(e)
-        print("Duplicated message!")
+        log.debug("Duplicated message!")
 
 def check_seed_msg(state: str):
     msg_count = col.count_documents(filter={"state": state, "is_interesting": True})
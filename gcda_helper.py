@@ -0,0 +1,136 @@
+# In-process reader for gcc coverage data (.gcda)
+# Parses the arc counters of every function straight from the .gcda files of
+# the selected sources, so a worker can tell which instrumented arcs became
+# non-zero since its last look without running lcov over the whole build tree.
+# Only files whose mtime or size changed are re-read. An arc is identified by
+# (file, function ident, counter index), which is enough for novelty; mapping
+# arcs to source lines would need the .gcno graph and is left to lcov.
+# Handles the gcc < 12 layout (record lengths in words) and gcc >= 12 (header
+# checksum, lengths in bytes, negative length for all-zero counters).
+import fnmatch, os, pathlib, struct, time
+from array import array
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+GCDA_SOURCES = config.get('GCDA_SOURCES', '*/src/amf/*,*/src/smf/*')
+GCDA_RESCAN = int(config.get('GCDA_RESCAN', 50))          # polls between walks of the build tree
+
+GCOV_DATA_MAGIC = 0x67636461                              # "gcda"
+GCOV_TAG_FUNCTION = 0x01000000
+GCOV_TAG_ARCS_COUNTERS = 0x01a10000
+
+class GcdaError(ValueError):
+    pass
+
+def gcc_major(version: int) -> int:
+    # "B22*" is gcc 12.2, "A94*" gcc 9.4
+    c0, c1 = (version >> 24) & 0xff, (version >> 16) & 0xff
+    return (c0 - ord('A')) * 10 + (c1 - ord('0'))
+
+def read_gcda(path) -> dict:
+    # {function ident: (cfg_checksum, bitmask of arcs with a non-zero counter)}
+    data = pathlib.Path(path).read_bytes()
+    if len(data) < 12 or len(data) % 4:
+        raise GcdaError(f"{path}: truncated")
+    words = array('I', data)
+    if words[0] != GCOV_DATA_MAGIC:
+        words.byteswap()
+        if words[0] != GCOV_DATA_MAGIC:
+            raise GcdaError(f"{path}: not a gcda file")
+    major = gcc_major(words[1])
+    in_bytes = major >= 12
+    i = 4 if in_bytes else 3
+    funcs = {}
+    ident, cfg = None, 0
+    n = len(words)
+    while i + 2 <= n:
+        tag, length = words[i], words[i + 1]
+        i += 2
+        if in_bytes:
+            if length & 0x80000000:             # all counters zero, length is -bytes
+                nwords = 0
+                if tag == GCOV_TAG_ARCS_COUNTERS and ident is not None:
+                    funcs[ident] = (cfg, 0)
+                continue
+            nwords = length // 4
+        else:
+            nwords = length
+        if i + nwords > n:
+            raise GcdaError(f"{path}: record 0x{tag:08x} past end of file")
+        if tag == GCOV_TAG_FUNCTION:
+            # an empty function record marks a function that was not emitted
+            ident = words[i] if nwords >= 1 else None
+            cfg = words[i + 2] if nwords >= 3 else 0
+        elif tag == GCOV_TAG_ARCS_COUNTERS and ident is not None:
+            mask = 0
+            for k in range(nwords // 2):
+                if words[i + 2 * k] or words[i + 2 * k + 1]:
+                    mask |= 1 << k
+            funcs[ident] = (cfg, mask)
+        i += nwords
+    return funcs
+
+def find_gcda(root, patterns) -> list:
+    files = []
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(".gcda"):
+                p = os.path.join(dirpath, name)
+                if any(fnmatch.fnmatch(p, pat) for pat in patterns):
+                    files.append(p)
+    return sorted(files)
+
+class GcdaCoverage:
+    # incremental arc coverage over the .gcda files under root that match the patterns
+    def __init__(self, root, patterns=GCDA_SOURCES, flush=None, rescan: int = GCDA_RESCAN):
+        self.root = str(root)
+        self.patterns = [p.strip() for p in patterns.split(",") if p.strip()] if isinstance(patterns, str) else list(patterns)
+        self.flush = flush
+        self.rescan = rescan
+        self.files = []
+        self.stat = {}              # path -> (mtime_ns, size) at the last read
+        self.covered = {}           # (path, ident) -> (cfg_checksum, mask)
+        self.total = 0
+        self.polls = 0
+        self.errors = 0
+        self.last_poll_sec = 0.0
+
+    def poll(self) -> int:
+        # number of arcs covered for the first time since the previous poll
+        t0 = time.monotonic()
+        if self.flush is not None:
+            self.flush()
+        if not self.files or self.polls % max(1, self.rescan) == 0:
+            self.files = find_gcda(self.root, self.patterns)
+        self.polls += 1
+        new = 0
+        for path in self.files:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            key = (st.st_mtime_ns, st.st_size)
+            if self.stat.get(path) == key:
+                continue
+            try:
+                funcs = read_gcda(path)
+            except (OSError, GcdaError):
+                # caught mid-write by the NF, retry on the next poll
+                self.errors += 1
+                continue
+            self.stat[path] = key
+            for ident, (cfg, mask) in funcs.items():
+                old_cfg, old = self.covered.get((path, ident), (cfg, 0))
+                if old_cfg != cfg:
+                    # rebuilt object, the counters mean something else now
+                    self.total -= old.bit_count()
+                    old = 0
+                gained = mask & ~old
+                if gained or old_cfg != cfg:
+                    self.covered[(path, ident)] = (cfg, old | mask)
+                    n = gained.bit_count()
+                    new += n
+                    self.total += n
+        self.last_poll_sec = time.monotonic() - t0
+        return new
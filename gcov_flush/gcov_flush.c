@@ -0,0 +1,99 @@
+/*
+ * LD_PRELOAD shim: dump the gcov counters of a running process on SIGUSR2.
+ *
+ * The shim links its own copy of libgcov. Every coverage object of a process
+ * (the NF binary and the libogs* libraries) registers with the exported
+ * __gcov_master, and the dump/reset entry points of any copy built by the same
+ * gcc walk that list, so calling ours writes the .gcda files of the whole NF.
+ * gcc < 11 has __gcov_flush (dump + reset), newer ones only __gcov_dump and
+ * __gcov_reset. SIGUSR2 just wakes a thread named "gcov-flush" through a
+ * pipe; the dump runs there, outside signal context. Open5GS NFs block all
+ * signals and sigwait() in the main thread, so the signal has to be sent to
+ * the thread id of "gcov-flush" (kill(tid) prefers that thread), see
+ * lcov_helper.gcov_flush_by_signal.
+ *
+ * Build: make -C gcov_flush   (lcov_helper.build_gcov_shim does the same)
+ */
+#define _GNU_SOURCE
+#include <errno.h>
+#include <fcntl.h>
+#include <pthread.h>
+#include <signal.h>
+#include <string.h>
+#include <unistd.h>
+
+#if __GNUC__ >= 11
+extern void __gcov_dump(void);
+extern void __gcov_reset(void);
+#else
+extern void __gcov_flush(void);
+#endif
+
+static int wake_pipe[2] = {-1, -1};
+
+static void on_sigusr2(int signum)
+{
+    int saved = errno;
+    char c = 1;
+    (void)signum;
+    if (write(wake_pipe[1], &c, 1) < 0) {
+        /* pipe full: a dump is pending anyway */
+    }
+    errno = saved;
+}
+
+static void dump_counters(void)
+{
+#if __GNUC__ >= 11
+    /* merges into the .gcda files; the reset keeps the next dump from adding the same counts twice */
+    __gcov_dump();
+    __gcov_reset();
+#else
+    __gcov_flush();
+#endif
+}
+
+static void *flush_thread(void *arg)
+{
+    char buf[64];
+    (void)arg;
+    for (;;) {
+        ssize_t n = read(wake_pipe[0], buf, sizeof(buf));
+        if (n > 0)
+            dump_counters();
+        else if (n < 0 && errno != EINTR)
+            return NULL;
+    }
+}
+
+__attribute__((constructor))
+static void gcov_flush_init(void)
+{
+    pthread_t tid;
+    pthread_attr_t attr;
+    sigset_t all, old;
+    struct sigaction sa;
+
+    if (pipe2(wake_pipe, O_CLOEXEC | O_NONBLOCK) < 0)
+        return;
+    /* only the writer in the handler must never block */
+    fcntl(wake_pipe[0], F_SETFL, fcntl(wake_pipe[0], F_GETFL) & ~O_NONBLOCK);
+
+    memset(&sa, 0, sizeof(sa));
+    sa.sa_handler = on_sigusr2;
+    sa.sa_flags = SA_RESTART;
+    sigemptyset(&sa.sa_mask);
+    if (sigaction(SIGUSR2, &sa, NULL) < 0)
+        return;
+
+    /* everything but SIGUSR2 stays blocked in the flush thread */
+    sigfillset(&all);
+    sigdelset(&all, SIGUSR2);
+    pthread_sigmask(SIG_SETMASK, &all, &old);
+    pthread_attr_init(&attr);
+    pthread_attr_setdetachstate(&attr, PTHREAD_CREATE_DETACHED);
+    if (pthread_create(&tid, &attr, flush_thread, NULL) == 0)
+        pthread_setname_np(tid, "gcov-flush");
+    pthread_attr_destroy(&attr);
+    pthread_sigmask(SIG_SETMASK, &old, NULL);
+}
@@ -0,0 +1,180 @@
+# Independent Open5GS + gNB instances (INSTANCES > 1)
+# With one instance every worker shares the 5gc and nr-gnb started from the
+# stock configs, and a crash found by any worker restarts them for all. With
+# INSTANCES=K the master runs K of each; worker w uses instance w % K, and a
+# full reset only stalls the workers of that instance. Instance 0 keeps the
+# stock configs, logs/core.log, logs/gnb.log, the "open5gs" DB and ctrl/.
+# Instance k > 0 gets generated configs under logs/instances/i<k>/: every
+# 127.0.0.x address moves to 127.0.k.x (all of 127/8 is loopback), the NF DB
+# becomes open5gs_i<k> with a copy of the subscribers, the UPF gets its own
+# TUN device and UE subnet, the gNB its own cell id (and so its own nr-cli
+# node name), and the UEs search for that gNB only. Its control files (epoch,
+# reset requests) live in ctrl/inst<k>/.
+# Processes of an instance are found by the config path on their command line
+# and stopped by process group: 5gc and nr-gnb are started in their own
+# session and the NFs spawned by 5gc inherit it.
+import os, pathlib, re, signal, subprocess, time, yaml
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+INSTANCES = max(1, int(config.get('INSTANCES', 1)))
+INST_ROOT = pathlib.Path("logs") / "instances"
+CTRL_ROOT = pathlib.Path("ctrl")
+BASE_CORE_CFG = os.path.join(config["OPEN5GS_PATH"], "build", "configs", "sample.yaml")
+BASE_GNB_CFG = os.path.join(config["UERANSIM_PATH"], "config", "open5gs-gnb.yaml")
+BASE_UE_CFG = os.path.join(config["UERANSIM_PATH"], "config", "open5gs-ue.yaml")
+LOOPBACK_RE = re.compile(r"\b127\.0\.0\.(\d+)\b")
+UE_SUBNET_RE = re.compile(r"^10\.45\.")
+
+class CoreInstance:
+    def __init__(self, k: int):
+        self.k = k
+        if k == 0:
+            self.dir = pathlib.Path("logs")
+            self.core_cfg, self.gnb_cfg, self.ue_cfg = BASE_CORE_CFG, BASE_GNB_CFG, BASE_UE_CFG
+            self.ctrl_dir = CTRL_ROOT
+        else:
+            self.dir = INST_ROOT / f"i{k}"
+            self.core_cfg = str((self.dir / "5gc.yaml").resolve())
+            self.gnb_cfg = str((self.dir / "gnb.yaml").resolve())
+            self.ue_cfg = str((self.dir / "ue.yaml").resolve())
+            self.ctrl_dir = CTRL_ROOT / f"inst{k}"
+        self.core_log = self.dir / "core.log"
+        self.gnb_log = self.dir / "gnb.log"
+        self.epoch_file = self.ctrl_dir / "epoch"
+        self.reset_req_dir = self.ctrl_dir / "reset_requests"
+        self.reset_pending_file = self.ctrl_dir / "reset_pending"
+        self.db_name = "open5gs" if k == 0 else f"open5gs_i{k}"
+        self.gnb_name = f"UERANSIM-gnb-999-70-{k + 1}"
+
+    def __repr__(self):
+        return f"CoreInstance({self.k})"
+
+def worker_instance(wid: int) -> int:
+    return wid % INSTANCES
+
+def _relocate(obj, k: int):
+    # every 127.0.0.x in the config tree to 127.0.k.x
+    if isinstance(obj, dict):
+        return {key: _relocate(v, k) for key, v in obj.items()}
+    if isinstance(obj, list):
+        return [_relocate(v, k) for v in obj]
+    if isinstance(obj, str):
+        return LOOPBACK_RE.sub(lambda m: f"127.0.{k}.{m.group(1)}", obj)
+    return obj
+
+def _load_yaml(path) -> dict:
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+def _write_yaml(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+    os.replace(tmp, path)
+
+def write_instance_configs(inst: CoreInstance):
+    # instance 0 runs on the stock configs
+    if inst.k == 0:
+        return
+    k = inst.k
+    inst.dir.mkdir(parents=True, exist_ok=True)
+    inst.reset_req_dir.mkdir(parents=True, exist_ok=True)
+
+    core = _relocate(_load_yaml(BASE_CORE_CFG), k)
+    core["db_uri"] = re.sub(r"/[^/]*$", f"/{inst.db_name}", core["db_uri"])
+    for nf in ("smf", "upf"):
+        for sess in core.get(nf, {}).get("session", []):
+            for key in ("subnet", "gateway"):
+                if key in sess:
+                    sess[key] = UE_SUBNET_RE.sub(f"10.{45 + k}.", sess[key])
+            if nf == "upf":
+                sess["dev"] = f"ogstun{k}"
+    if "amf" in core:
+        core["amf"]["amf_name"] = f"open5gs-amf{k}"
+    _write_yaml(inst.core_cfg, core)
+
+    gnb = _relocate(_load_yaml(BASE_GNB_CFG), k)
+    id_len = int(gnb.get("idLength", 32))
+    gnb_id = (int(str(gnb["nci"]), 16) >> (36 - id_len)) + k
+    gnb["nci"] = f"0x{gnb_id << (36 - id_len):09x}"
+    _write_yaml(inst.gnb_cfg, gnb)
+
+    _write_yaml(inst.ue_cfg, _relocate(_load_yaml(BASE_UE_CFG), k))
+
+def provision_subscribers(inst: CoreInstance, client) -> int:
+    # copy the subscribers of the stock DB (scripts/init_db.py) into the instance DB
+    if inst.k == 0:
+        return 0
+    src = client["open5gs"]["subscribers"]
+    dst = client[inst.db_name]["subscribers"]
+    n = src.count_documents({})
+    if n and dst.count_documents({}) != n:
+        dst.delete_many({})
+        dst.insert_many(src.find({}, {"_id": 0}))
+    return n
+
+def _group_ids(pattern: str) -> set:
+    try:
+        out = subprocess.check_output(["pgrep", "-f", pattern], text=True)
+    except subprocess.CalledProcessError:
+        return set()
+    pgids = set()
+    for pid in out.split():
+        try:
+            pgids.add(os.getpgid(int(pid)))
+        except ProcessLookupError:
+            continue
+    return pgids
+
+def _group_alive(pgid: int) -> bool:
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+
+def stop_groups(pattern: str, timeout: float = 5.0) -> int:
+    # SIGINT to the process groups of the matching commands, SIGKILL after timeout
+    pgids = _group_ids(pattern)
+    for pgid in pgids:
+        try: os.killpg(pgid, signal.SIGINT)
+        except ProcessLookupError: pass
+    deadline = time.monotonic() + timeout
+    while any(_group_alive(g) for g in pgids) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    for pgid in pgids:
+        try: os.killpg(pgid, signal.SIGKILL)
+        except ProcessLookupError: pass
+    return len(pgids)
+
+def core_pattern(inst: CoreInstance) -> str:
+    return f"5gc -c {re.escape(inst.core_cfg)}"
+
+def gnb_pattern(inst: CoreInstance) -> str:
+    return f"nr-gnb -c {re.escape(inst.gnb_cfg)}"
+
+def ue_pattern(inst: CoreInstance) -> str:
+    return f"nr-ue -c {re.escape(inst.ue_cfg)}"
+
+def worker_ue_pattern(port_base: int) -> str:
+    # the UEs of one worker, by the command ports it gives them (port_base + 0/1/2)
+    return f"nr-ue -c .* -p ({port_base}|{port_base + 1}|{port_base + 2})$"
+
+def group_pids(pattern: str) -> list:
+    # (pid, command name) of every process in the groups of the matching commands
+    pgids = _group_ids(pattern)
+    if not pgids:
+        return []
+    out = subprocess.check_output(["ps", "-eo", "pid=,pgid=,comm="], text=True)
+    procs = []
+    for line in out.splitlines():
+        parts = line.split(None, 2)
+        if len(parts) == 3 and int(parts[1]) in pgids:
+            procs.append((int(parts[0]), parts[2].strip()))
+    return procs
+
+def group_commands(pattern: str) -> list:
+    # command names of every process in the groups of the matching commands
+    return [comm for _, comm in group_pids(pattern)]
@@ -1,10 +1,13 @@
-import os, time, subprocess, shlex, pathlib, json
+import os, time, subprocess, shlex, pathlib, json, signal
 from typing import List, Optional, Tuple, Set
 from dotenv import dotenv_values
 config = dotenv_values(".env")
 
 OPEN5GS_PATH = config['OPEN5GS_PATH']
 LOG_DIR = pathlib.Path("./logs"); LOG_DIR.mkdir(exist_ok=True)
+# +++ LD_PRELOAD shim that dumps the gcov counters on SIGUSR2 (gcov_flush/gcov_flush.c)
+GCOV_SHIM = pathlib.Path(config.get('GCOV_SHIM', 'gcov_flush/libgcovflush.so')).resolve()
+GCOV_SHIM_THREAD = "gcov-flush"
 
 def run(cmd):
     return subprocess.run(shlex.split(cmd), check=True)
@@ -23,6 +26,69 @@ def gcov_flush_by_gdb(pids):
         except Exception as e:
             print(f"[flush] gdb flush pid={pid} failed: {e}")
 
+# +++
+def build_gcov_shim() -> Optional[pathlib.Path]:
+    # (re)build the shim next to its source; None if there is no compiler
+    src = GCOV_SHIM.parent / "gcov_flush.c"
+    if GCOV_SHIM.is_file() and (not src.is_file() or GCOV_SHIM.stat().st_mtime >= src.stat().st_mtime):
+        return GCOV_SHIM
+    try:
+        run(f"make -C {GCOV_SHIM.parent} {GCOV_SHIM.name}")
+    except Exception as e:
+        print(f"[flush] building {GCOV_SHIM} failed: {e}")
+        return None
+    return GCOV_SHIM if GCOV_SHIM.is_file() else None
+
+def shim_tids(pids) -> List[int]:
+    # flush thread of every pid that runs with the shim loaded
+    tids = []
+    for pid in pids:
+        for comm in pathlib.Path(f"/proc/{pid}/task").glob("*/comm"):
+            try:
+                if comm.read_text().strip() == GCOV_SHIM_THREAD:
+                    tids.append(int(comm.parent.name))
+                    break
+            except OSError:
+                continue
+    return tids
+
+def gcov_flush_by_signal(pids, watch_files=(), timeout: float = 2.0, settle: float = 0.02) -> bool:
+    # Open5GS NFs sigwait() on a fully blocked main thread, so SIGUSR2 goes to the
+    # shim's thread id rather than the pid; kill(tid) is delivered to that thread.
+    # Returns once a watched .gcda changed and the files were quiet for `settle`
+    # seconds, False on timeout or when no pid has the shim.
+    def snapshot():
+        st = {}
+        for f in watch_files:
+            try:
+                s = os.stat(f); st[f] = (s.st_mtime_ns, s.st_size)
+            except FileNotFoundError:
+                st[f] = None
+        return st
+    tids = shim_tids(pids)
+    if not tids:
+        return False
+    before = snapshot()
+    for tid in tids:
+        try:
+            os.kill(tid, signal.SIGUSR2)
+        except ProcessLookupError:
+            pass
+    if not watch_files:
+        time.sleep(settle)
+        return True
+    deadline = time.monotonic() + timeout
+    last = before
+    changed_at = None
+    while time.monotonic() < deadline:
+        time.sleep(settle)
+        now = snapshot()
+        if now != last:
+            changed_at, last = time.monotonic(), now
+        elif changed_at is not None:
+            return True
+    return changed_at is not None
+
 def lcov_capture(tag, extract_globs=None):
     out = LOG_DIR / f"{tag}.info"
     run(f"lcov --capture --directory {OPEN5GS_PATH} --output-file {out} --rc lcov_branch_coverage=1")
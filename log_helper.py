@@ -0,0 +1,111 @@
+# Leveled logging for workers
+# Everything goes through the stdlib logging tree under "pascofuzz", so the
+# objects package only needs logging.getLogger(). Records at LOG_LEVEL and above
+# are written to stdout (worker.log); records at LOG_RING_LEVEL and above are
+# kept unformatted in an in-memory ring buffer that is written out when a crash
+# or an exception is handled. LOG_JSON adds a JSON-lines file next to worker.log.
+# The ring keeps DEBUG records by default, so a crash dump has the detail that
+# worker.log leaves out; such a record costs a LogRecord and a deque append.
+# The expensive dumps of the hot path (per-child UCT scores, FSM listings) log
+# to loggers under "pascofuzz.trace", which follow LOG_LEVEL only, so they run
+# when stdout shows DEBUG and never just for the ring.
+import json, logging, os, sys, time
+from collections import deque
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+LOG_LEVEL = config.get('LOG_LEVEL', 'INFO').upper()
+LOG_RING_LEVEL = config.get('LOG_RING_LEVEL', 'DEBUG').upper()
+LOG_RING = int(config.get('LOG_RING', 2000))
+LOG_JSON = int(config.get('LOG_JSON', 0))
+LOG_FORMAT = "%(asctime)s %(levelname).1s %(name)s: %(message)s"
+
+class RingBufferHandler(logging.Handler):
+    # keeps the last `capacity` records; formatting happens only on dump
+    def __init__(self, capacity: int = LOG_RING, level=logging.DEBUG):
+        super().__init__(level)
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        # args are formatted later, keep the containers as they were at log time
+        if isinstance(record.args, tuple):
+            record.args = tuple(a.copy() if isinstance(a, (list, dict, set)) else a for a in record.args)
+        self.records.append(record)
+
+    def dump(self, path, reason: str = "") -> int:
+        fmt = self.formatter or logging.Formatter(LOG_FORMAT)
+        records = list(self.records)
+        with open(path, "w") as f:
+            if reason:
+                f.write(f"# ring buffer dump: {reason} ({len(records)} records)\n")
+            for rec in records:
+                try:
+                    f.write(fmt.format(rec) + "\n")
+                except Exception as e:
+                    f.write(f"<unformattable record {rec.name}:{rec.lineno}: {e}>\n")
+        return len(records)
+
+class JsonLinesFormatter(logging.Formatter):
+    def __init__(self, static: dict | None = None):
+        super().__init__()
+        self.static = static or {}
+
+    def format(self, record):
+        d = {"ts": record.created, "level": record.levelname, "logger": record.name,
+             "msg": record.getMessage(), **self.static}
+        if record.exc_info:
+            d["exc"] = self.formatException(record.exc_info)
+        return json.dumps(d, default=str)
+
+_RING = None
+
+def setup_logging(wid: int, log_dir=None) -> logging.Logger:
+    global _RING
+    root = logging.getLogger("pascofuzz")
+    level = getattr(logging, LOG_LEVEL, logging.INFO)
+    ring_level = getattr(logging, LOG_RING_LEVEL, level)
+    root.setLevel(min(level, ring_level) if LOG_RING > 0 else level)
+    root.propagate = False
+    root.handlers.clear()
+    logging.getLogger("pascofuzz.trace").setLevel(level)
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(level)
+    console.setFormatter(logging.Formatter(f"%(asctime)s %(levelname).1s [W{wid}] %(name)s: %(message)s"))
+    root.addHandler(console)
+
+    if LOG_RING > 0:
+        _RING = RingBufferHandler(LOG_RING, ring_level)
+        _RING.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(_RING)
+
+    if LOG_JSON and log_dir is not None:
+        jh = logging.FileHandler(os.path.join(str(log_dir), "worker.jsonl"))
+        jh.setLevel(level)
+        jh.setFormatter(JsonLinesFormatter({"wid": wid}))
+        root.addHandler(jh)
+    return root.getChild("worker")
+
+def dump_ring(path, reason: str = "") -> int:
+    # write the recent history to path; returns the number of records written
+    if _RING is None:
+        return 0
+    try:
+        n = _RING.dump(path, reason)
+    except OSError as e:
+        logging.getLogger("pascofuzz").error("ring buffer dump to %s failed: %s", path, e)
+        return 0
+    logging.getLogger("pascofuzz").info("ring buffer (%d records) dumped to %s", n, path)
+    return n
+
+def install_excepthook(dump_dir):
+    # uncaught exceptions leave the recent history next to the worker log
+    prev = sys.excepthook
+    def hook(exc_type, exc, tb):
+        if not issubclass(exc_type, KeyboardInterrupt):
+            logging.getLogger("pascofuzz").critical("uncaught exception", exc_info=(exc_type, exc, tb))
+            dump_ring(os.path.join(str(dump_dir), f"ring_uncaught_{time.strftime('%Y%m%d_%H%M%S')}.log"),
+                      f"uncaught {exc_type.__name__}")
+        prev(exc_type, exc, tb)
+    sys.excepthook = hook
@@ -0,0 +1,240 @@
+# Learned-FSM merge between workers
+# Every worker learns H-states on its own and numbers them from its own
+# new_state_count, so "H3" is not the same state on two workers. At each round
+# boundary the master folds all worker FSMs into one merged FSM: learned states
+# are matched by their response signature (the probe self-loops added when the
+# state was learned), transitions are unioned and counters are summed as deltas
+# over the previous merged FSM. The merged FSM is then copied back to every
+# worker together with a per-worker name-remapping table, which is also applied
+# to the saved MCTS trees, the `state` field of the worker DB collection and
+# the seeds the worker promoted into the global pool.
+import json, pathlib
+from fsm_helper import *
+from db_helper import rename_states, rename_pool_states
+
+LOG_ROOT = pathlib.Path("logs")
+MERGE_DIR = LOG_ROOT / "fsm_merged"
+REMAP_FILE = "fsm_remap.json"
+
+def is_learned(name: str) -> bool:
+    return name.startswith("H")
+
+def response_signature(fsm: FSM, name: str) -> frozenset:
+    # (input, output) pairs of the probe self-loops recorded for a learned state
+    return frozenset((t[1], t[2]) for t in fsm.transitions
+                     if t[0] == name and t[3] == name and ":" not in t[1])
+
+def _copy_fsm(fsm: FSM) -> FSM:
+    return FSM.from_json(fsm.to_json())
+
+def _empty_base(fsm: FSM) -> FSM:
+    # first merge: the model states of a worker FSM with all counters cleared
+    base = _copy_fsm(fsm)
+    base.states = [s for s in base.states if not is_learned(s.name)]
+    known = set(base.get_state_names())
+    base.transitions = [t for t in base.transitions if t[0] in known and t[3] in known]
+    base.new_state_count = 0
+    base.edge_hits = {}
+    for s in base.states:
+        s.count = 0
+        s.visited = False
+        s.paths = [p for p in s.paths if all(n in known for n in p.path_states)]
+        for p in s.paths:
+            p.count = 0
+            p.succ = 0
+    return base
+
+def _match_state(merged: FSM, sig: frozenset, out_pairs: dict) -> str:
+    # same check the worker does before learning a state: every probe response is known
+    if not sig:
+        return ""
+    for s in merged.states:
+        if sig <= out_pairs.get(s.name, set()):
+            return s.name
+    return ""
+
+def _out_pairs(fsm: FSM) -> dict:
+    pairs = {}
+    for t in fsm.transitions:
+        pairs.setdefault(t[0], set()).add((t[1], t[2]))
+    return pairs
+
+def merge_fsms(base: FSM | None, fsms: list):
+    # returns the merged FSM and one {worker name: merged name} table per input FSM
+    merged = _copy_fsm(base) if base is not None else _empty_base(fsms[0])
+    base_names = set(merged.get_state_names())
+    base_count = {s.name: s.count for s in merged.states}
+    base_paths = {(s.name, tuple(p.path_states)): (p.count, p.succ) for s in merged.states for p in s.paths}
+    base_hits = dict(merged.edge_hits)
+    trans_seen = {tuple(t) for t in merged.transitions}
+    remaps = []
+
+    for fsm in fsms:
+        out_pairs = _out_pairs(merged)
+        remap = {}
+        # 1) map states: shared names stay, learned states are matched or added
+        for s in fsm.states:
+            if s.name in base_names:
+                remap[s.name] = s.name
+                continue
+            target = _match_state(merged, response_signature(fsm, s.name), out_pairs)
+            if target == "":
+                new_state = merged.add_new_state()
+                new_state.oracle.state = s.oracle.state
+                target = new_state.name
+                out_pairs[target] = set(response_signature(fsm, s.name))
+            remap[s.name] = target
+        # 2) transitions
+        for t in fsm.transitions:
+            rt = (remap.get(t[0], t[0]), t[1], t[2], remap.get(t[3], t[3]))
+            if rt not in trans_seen:
+                trans_seen.add(rt)
+                merged.transitions.append(list(rt))
+        # 3) counters, as deltas over the previous merge
+        for (src, inp, out, dst), cnt in fsm.edge_hits.items():
+            key = (remap.get(src, src), inp, out, remap.get(dst, dst) if dst is not None else None)
+            delta = max(0, cnt - base_hits.get((src, inp, out, dst), 0))
+            if delta:
+                merged.edge_hits[key] = merged.edge_hits.get(key, 0) + delta
+        for s in fsm.states:
+            m = merged.get_state(remap[s.name])
+            m.count += max(0, s.count - base_count.get(s.name, 0)) if s.name in base_names else s.count
+            m.energy = max(m.energy, s.energy)
+            m.adjusted_energy = max(m.adjusted_energy, s.adjusted_energy)
+            m.visited = m.visited or s.visited
+        remaps.append(remap)
+
+    # 4) paths over the merged graph, then path counters
+    for s in merged.states:
+        get_all_paths(merged, s)
+    for fsm, remap in zip(fsms, remaps):
+        for s in fsm.states:
+            m = merged.get_state(remap[s.name])
+            for p in s.paths:
+                if p.count == 0 and p.succ == 0:
+                    continue
+                states = [remap.get(n, n) for n in p.path_states]
+                b_cnt, b_succ = base_paths.get((s.name, tuple(p.path_states)), (0, 0))
+                for mp in m.paths:
+                    if mp.path_states == states:
+                        mp.count += max(0, p.count - b_cnt)
+                        mp.succ += max(0, p.succ - b_succ)
+                        break
+    return merged, remaps
+
+def remap_state_str(state: str, remap_amf: dict, remap_smf: dict) -> str:
+    # DB states are "amf" or "amf:smf"
+    parts = state.split(":")
+    parts[0] = remap_amf.get(parts[0], parts[0])
+    if len(parts) > 1:
+        parts[1] = remap_smf.get(parts[1], parts[1])
+    return ":".join(parts)
+
+def _merge_stats_dict(a: dict, b: dict):
+    # dict form of MCTSNode.merge_stats
+    if b.get("n_cost"):
+        a["cost_min"] = b["cost_min"] if not a.get("n_cost") else min(a["cost_min"], b["cost_min"])
+        a["cost_max"] = max(a.get("cost_max", 0.0), b["cost_max"])
+    for k in ("n_sel", "n_det", "reward", "cost", "cost_sq", "n_cost"):
+        a[k] = a.get(k, 0) + b.get(k, 0)
+    a["last_sel"] = max(a.get("last_sel", 0), b.get("last_sel", 0))
+
+def _remap_node(d: dict, remap: dict) -> dict:
+    d["state_path"] = [remap.get(n, n) for n in d["state_path"]]
+    pruned = {}
+    for k, v in d.get("pruned", {}).items():
+        v["state_path"] = [remap.get(n, n) for n in v["state_path"]]
+        nk = remap.get(k, k)
+        if nk in pruned:
+            _merge_stats_dict(pruned[nk], v)
+        else:
+            pruned[nk] = v
+    if pruned:
+        d["pruned"] = pruned
+    children = {}
+    for k, v in d.get("children", {}).items():
+        nk = remap.get(k, k)
+        v = _remap_node(v, remap)
+        if nk in children:
+            _merge_node_dicts(children[nk], v)
+        else:
+            children[nk] = v
+    d["children"] = children
+    return d
+
+def _merge_node_dicts(a: dict, b: dict):
+    _merge_stats_dict(a, b)
+    for k, v in b.get("pruned", {}).items():
+        if k in a.setdefault("pruned", {}):
+            _merge_stats_dict(a["pruned"][k], v)
+        else:
+            a["pruned"][k] = v
+    for k, v in b["children"].items():
+        if k in a["children"]:
+            _merge_node_dicts(a["children"][k], v)
+        else:
+            a["children"][k] = v
+
+def remap_mcts_dict(d: dict, remap: dict) -> dict:
+    # rename the states of a saved MCTS tree; siblings that collapse onto one name are merged
+    if not d.get("transposition"):
+        return _remap_node(d, remap)
+    # transposition DAG: rename in place, a collapsed edge keeps the more visited node
+    nodes = d["nodes"]
+    for nd in nodes:
+        nd["state_path"] = [remap.get(n, n) for n in nd["state_path"]]
+        nd.pop("pruned", None)
+        children, edge_sel = {}, {}
+        for k, idx in nd["children"].items():
+            nk = remap.get(k, k)
+            if nk not in children or nodes[idx]["n_sel"] > nodes[children[nk]]["n_sel"]:
+                children[nk] = idx
+            edge_sel[nk] = edge_sel.get(nk, 0) + nd.get("edge_sel", {}).get(k, 0)
+        nd["children"] = children
+        nd["edge_sel"] = edge_sel
+    return d
+
+def _load_fsm_file(path: pathlib.Path):
+    if not path.exists():
+        return None
+    text = path.read_text()
+    return FSM.from_json(text) if text != "" else None
+
+def merge_worker_fsms(wids: list, round_tag: str = ""):
+    # master side, workers stopped: merge, redistribute and remap; returns the remap tables
+    MERGE_DIR.mkdir(parents=True, exist_ok=True)
+    loaded = []
+    for wid in wids:
+        wdir = LOG_ROOT / f"worker_{wid}"
+        loaded.append((wid, wdir, _load_fsm_file(wdir / "savedFSM.json"), _load_fsm_file(wdir / "savedFSM_sm.json")))
+    loaded = [x for x in loaded if x[2] is not None and x[3] is not None]
+    if not loaded:
+        print("[MERGE] no worker FSM to merge")
+        return {}
+    merged_amf, remaps_amf = merge_fsms(_load_fsm_file(MERGE_DIR / "savedFSM.json"), [x[2] for x in loaded])
+    merged_smf, remaps_smf = merge_fsms(_load_fsm_file(MERGE_DIR / "savedFSM_sm.json"), [x[3] for x in loaded])
+    amf_json, smf_json = merged_amf.to_json(), merged_smf.to_json()
+    (MERGE_DIR / "savedFSM.json").write_text(amf_json)
+    (MERGE_DIR / "savedFSM_sm.json").write_text(smf_json)
+
+    tables = {}
+    for (wid, wdir, _, _), r_amf, r_smf in zip(loaded, remaps_amf, remaps_smf):
+        r_amf = {k: v for k, v in r_amf.items() if k != v}
+        r_smf = {k: v for k, v in r_smf.items() if k != v}
+        tables[wdir.name] = {"amf": r_amf, "smf": r_smf}
+        (wdir / "savedFSM.json").write_text(amf_json)
+        (wdir / "savedFSM_sm.json").write_text(smf_json)
+        (wdir / REMAP_FILE).write_text(json.dumps({"round": round_tag, "amf": r_amf, "smf": r_smf}, indent=4))
+        for name, remap in (("savedMCTS_amf.json", r_amf), ("savedMCTS_smf.json", r_smf)):
+            p = wdir / name
+            if remap and p.exists():
+                p.write_text(json.dumps(remap_mcts_dict(json.loads(p.read_text()), remap)))
+        if r_amf or r_smf:
+            rename_states(wid, lambda s, a=r_amf, m=r_smf: remap_state_str(s, a, m))
+            rename_pool_states(wid, lambda s, a=r_amf, m=r_smf: remap_state_str(s, a, m))
+    if round_tag:
+        (MERGE_DIR / f"remap_{round_tag}.json").write_text(json.dumps(tables, indent=4))
+    n_learned = sum(1 for s in merged_amf.states if is_learned(s.name))
+    print(f"[MERGE] {len(loaded)} workers -> {len(merged_amf.states)} states ({n_learned} learned), "
+          f"{len(merged_amf.transitions)} transitions, renamed {sum(len(t['amf']) for t in tables.values())}")
+    return tables
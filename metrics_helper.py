@@ -0,0 +1,328 @@
+# Per-worker hot-path instrumentation
+# Monotonic timers per fuzzing phase plus throughput counters. Each worker
+# appends a snapshot every METRICS_INTERVAL seconds (and on exit) to
+# metrics.csv / metrics.jsonl in its work dir; the master aggregates the last
+# snapshot of every worker at the end of each round.
+# For live monitoring a worker thread also rewrites metrics_live.json every few
+# seconds; the master renders those files in Prometheus text format on a local
+# HTTP port and into a textfile.
+import csv, functools, json, os, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+METRICS_INTERVAL = float(config.get('METRICS_INTERVAL', 60))
+METRICS_LIVE_INTERVAL = float(config.get('METRICS_LIVE_INTERVAL', 5))
+# upper bounds in seconds of the phase latency histograms
+HIST_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PHASES = ("reset", "connect", "select", "align", "seed", "send", "drain",
+          "crash_scan", "db", "learn", "coverage", "checkpoint")
+COUNTERS = ("execs", "episodes", "align_ok", "align_fail", "resets", "global_resets",
+            "new_states", "new_transitions", "crashes", "crash_buckets", "crash_dups", "violations",
+            "recvs", "recv_timeouts")
+
+class PhaseMetrics:
+    def __init__(self, wid: int, csv_path, jsonl_path, interval: float = METRICS_INTERVAL):
+        self.wid = wid
+        self.csv_path = csv_path
+        self.jsonl_path = jsonl_path
+        self.interval = interval
+        self.t_start = time.monotonic()
+        self.t_flush = self.t_start
+        self.wall_start = time.time()
+        self.phase_sec = dict.fromkeys(PHASES, 0.0)
+        self.phase_cnt = dict.fromkeys(PHASES, 0)
+        self.phase_max = dict.fromkeys(PHASES, 0.0)
+        self.phase_hist = {p: [0] * (len(HIST_BUCKETS) + 1) for p in PHASES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.reset_reasons = {}
+        self.extra = {}
+        self.live_thread = None
+        self.heartbeat = None       # watchdog_helper.Heartbeat, beaten on every phase entry
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.heartbeat is not None:
+            self.heartbeat.beat(name, self.counters["episodes"])
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - t0)
+
+    def timed(self, name: str, gauge: str | None = None):
+        # decorator form of phase() for functions that are a phase on their own;
+        # gauge also keeps the latency of the last call
+        def deco(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if self.heartbeat is not None:
+                    self.heartbeat.beat(name, self.counters["episodes"])
+                t0 = time.monotonic()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    dt = time.monotonic() - t0
+                    self.add(name, dt)
+                    if gauge:
+                        self.extra[gauge] = dt
+            return wrapper
+        return deco
+
+    def add(self, name: str, dt: float):
+        self.phase_sec[name] += dt
+        self.phase_cnt[name] += 1
+        self.phase_hist[name][bisect_left(HIST_BUCKETS, dt)] += 1
+        if dt > self.phase_max[name]:
+            self.phase_max[name] = dt
+
+    def inc(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def inc_reason(self, reason: str):
+        self.reset_reasons[reason] = self.reset_reasons.get(reason, 0) + 1
+
+    def set(self, name: str, value):
+        # free-form gauges, e.g. MCTS tree size
+        self.extra[name] = value
+
+    def snapshot(self) -> dict:
+        up = time.monotonic() - self.t_start
+        c = self.counters
+        aligned = c["align_ok"] + c["align_fail"]
+        return {
+            "ts": time.time(),
+            "wid": self.wid,
+            "started": self.wall_start,
+            "uptime": up,
+            **c,
+            "execs_per_sec": c["execs"] / up if up > 0 else 0.0,
+            "align_rate": c["align_ok"] / aligned if aligned else 0.0,
+            "timeout_rate": c["recv_timeouts"] / c["recvs"] if c["recvs"] else 0.0,
+            "resets_per_hour": c["resets"] * 3600.0 / up if up > 0 else 0.0,
+            "phase_sec": dict(self.phase_sec),
+            "phase_cnt": dict(self.phase_cnt),
+            "phase_max": dict(self.phase_max),
+            "phase_hist": {k: list(v) for k, v in self.phase_hist.items()},
+            "reset_reasons": dict(self.reset_reasons),
+            **self.extra,
+        }
+
+    def start_live(self, path, interval: float = METRICS_LIVE_INTERVAL):
+        # daemon thread rewriting a live snapshot; keeps going while the fuzz loop is blocked
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_json_atomic(path, self.snapshot())
+                except Exception as e:
+                    print(f"[METRICS] live snapshot failed: {e}")
+        self.live_thread = threading.Thread(target=loop, name=f"metrics-live-w{self.wid}", daemon=True)
+        self.live_thread.start()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.t_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.t_flush = time.monotonic()
+        snap = self.snapshot()
+        row = {k: v for k, v in snap.items() if not isinstance(v, dict)}
+        row.update({f"t_{k}": round(v, 4) for k, v in self.phase_sec.items()})
+        append_csv_row(self.csv_path, row)
+        with open(self.jsonl_path, "a") as f:
+            f.write(json.dumps(snap) + "\n")
+        return snap
+
+_CSV_HEADERS = {}       # path -> header of the series, read once per process
+
+def append_csv_row(path, row: dict):
+    key = os.fspath(path)
+    new_file = not os.path.exists(key)
+    fields = list(row.keys()) if new_file else _CSV_HEADERS.get(key)
+    if fields is None:
+        # keep the header of the existing series
+        with open(key, "r", newline="") as f:
+            fields = next(csv.reader(f), list(row.keys()))
+    _CSV_HEADERS[key] = fields
+    with open(key, "a", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore", restval="")
+        if new_file:
+            w.writeheader()
+        w.writerow(row)
+
+def append_jsonl(path, rec: dict):
+    with open(path, "a") as f:
+        f.write(json.dumps(rec) + "\n")
+
+def last_snapshot(jsonl_path, since: float = 0.0):
+    # last record of a worker's series written after `since` (wall clock)
+    if not os.path.exists(jsonl_path):
+        return None
+    last = None
+    with open(jsonl_path, "r") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("ts", 0) >= since:
+                last = rec
+    return last
+
+def aggregate_snapshots(snaps: list) -> dict:
+    # cluster totals of one round; rates are summed over workers, align rate is pooled
+    agg = {"workers": len(snaps)}
+    for k in COUNTERS:
+        agg[k] = sum(s.get(k, 0) for s in snaps)
+    agg["execs_per_sec"] = sum(s.get("execs_per_sec", 0.0) for s in snaps)
+    agg["resets_per_hour"] = sum(s.get("resets_per_hour", 0.0) for s in snaps)
+    aligned = agg["align_ok"] + agg["align_fail"]
+    agg["align_rate"] = agg["align_ok"] / aligned if aligned else 0.0
+    agg["timeout_rate"] = agg["recv_timeouts"] / agg["recvs"] if agg["recvs"] else 0.0
+    # rtt_helper: waits on requests without a reply and the time saved against the fixed waits
+    for k in ("null_waits", "null_wait_sec", "null_saved_sec"):
+        agg[k] = round(sum(s.get(k, 0) for s in snaps), 3)
+    for p in PHASES:
+        agg[f"t_{p}"] = round(sum(s.get("phase_sec", {}).get(p, 0.0) for s in snaps), 4)
+    return agg
+
+def write_json_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def read_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# -------- Prometheus text exposition -------- #
+_HELP = {
+    "execs": "Fuzzing messages executed",
+    "episodes": "MCTS episodes backpropagated",
+    "align_ok": "Successful path alignments",
+    "align_fail": "Failed path alignments",
+    "resets": "UE resets",
+    "global_resets": "Global resets requested",
+    "new_states": "Learned FSM states",
+    "new_transitions": "Learned FSM transitions",
+    "crashes": "AMF/SMF crashes detected",
+    "crash_buckets": "Crashes with a new signature",
+    "crash_dups": "Crashes with a known signature",
+    "violations": "Oracle violations",
+    "recvs": "Responses waited for from the UE",
+    "recv_timeouts": "Waits for a UE response that timed out",
+}
+
+def _labels(**kw) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in kw.items()) + "}"
+
+def render_prometheus(snaps: dict, master: dict, alive: dict, now: float | None = None) -> str:
+    # snaps: wid -> live snapshot (or None); master: gauges of the master process; alive: wid -> bool
+    now = time.time() if now is None else now
+    out = []
+    def metric(name, mtype, help_text, samples):
+        out.append(f"# HELP pascofuzz_{name} {help_text}")
+        out.append(f"# TYPE pascofuzz_{name} {mtype}")
+        for labels, value in samples:
+            out.append(f"pascofuzz_{name}{labels} {value}")
+
+    live = {w: s for w, s in snaps.items() if s}
+    for k, v in master.items():
+        metric(f"master_{k}", "gauge", f"Master {k.replace('_', ' ')}", [("", v)])
+    metric("worker_up", "gauge", "Worker process alive", [(_labels(wid=w), int(a)) for w, a in alive.items()])
+    for k in COUNTERS:
+        metric(f"{k}_total", "counter", _HELP[k], [(_labels(wid=w), s.get(k, 0)) for w, s in live.items()])
+    metric("execs_per_second", "gauge", "Executions per second since worker start",
+           [(_labels(wid=w), round(s.get("execs_per_sec", 0.0), 4)) for w, s in live.items()])
+    metric("align_rate", "gauge", "Alignment success rate",
+           [(_labels(wid=w), round(s.get("align_rate", 0.0), 4)) for w, s in live.items()])
+    metric("resets_by_reason_total", "counter", "Resets by reason",
+           [(_labels(wid=w, reason=r), n) for w, s in live.items() for r, n in s.get("reset_reasons", {}).items()])
+    metric("epoch", "gauge", "Reset epoch seen by the worker",
+           [(_labels(wid=w), s.get("epoch", 0)) for w, s in live.items()])
+    metric("snapshot_age_seconds", "gauge", "Seconds since the worker last wrote its live snapshot",
+           [(_labels(wid=w), round(now - s.get("ts", now), 3)) for w, s in live.items()])
+    metric("last_exec_age_seconds", "gauge", "Seconds since the worker last executed a fuzzing message",
+           [(_labels(wid=w), round(now - s.get("last_exec", s.get("started", now)), 3)) for w, s in live.items()])
+    metric("db_write_lag_seconds", "gauge", "Latency of the last DB write",
+           [(_labels(wid=w), round(s.get("db_write_lag", 0.0), 4)) for w, s in live.items()])
+    metric("mcts_nodes", "gauge", "MCTS tree size",
+           [(_labels(wid=w, fsm=f), s[f"mcts_nodes_{f}"]) for w, s in live.items() for f in ("amf", "smf")
+            if f"mcts_nodes_{f}" in s])
+    metric("cov_arcs", "gauge", "AMF/SMF arcs covered, from the gcda files",
+           [(_labels(wid=w), s["cov_arcs"]) for w, s in live.items() if "cov_arcs" in s])
+
+    hist = []
+    for w, s in live.items():
+        for p in PHASES:
+            buckets = s.get("phase_hist", {}).get(p)
+            if not buckets:
+                continue
+            acc = 0
+            for le, n in zip(HIST_BUCKETS + ("+Inf",), buckets):
+                acc += n
+                hist.append((_labels(wid=w, phase=p, le=le), acc, "_bucket"))
+            hist.append((_labels(wid=w, phase=p), round(s["phase_sec"].get(p, 0.0), 6), "_sum"))
+            hist.append((_labels(wid=w, phase=p), s["phase_cnt"].get(p, 0), "_count"))
+    out.append("# HELP pascofuzz_phase_seconds Latency of fuzzing phases")
+    out.append("# TYPE pascofuzz_phase_seconds histogram")
+    for labels, value, suffix in hist:
+        out.append(f"pascofuzz_phase_seconds{suffix}{labels} {value}")
+    return "\n".join(out) + "\n"
+
+class MetricsExporter(threading.Thread):
+    # master side: serves /metrics on a local port and rewrites a textfile every interval
+    def __init__(self, collect, port: int = 0, textfile=None, interval: float = METRICS_LIVE_INTERVAL):
+        super().__init__(name="metrics-exporter", daemon=True)
+        self.collect = collect
+        self.textfile = textfile
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.httpd = None
+        if port:
+            exporter = self
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = exporter.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                def log_message(self, *args):
+                    pass
+            self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+            self.httpd.daemon_threads = True
+            threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True).start()
+
+    def render(self) -> str:
+        snaps, master, alive = self.collect()
+        return render_prometheus(snaps, master, alive)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            if self.textfile:
+                try:
+                    tmp = f"{self.textfile}.tmp"
+                    with open(tmp, "w") as f:
+                        f.write(self.render())
+                    os.replace(tmp, self.textfile)
+                except Exception as e:
+                    print(f"[METRICS] textfile export failed: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
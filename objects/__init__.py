@@ -1,8 +1,10 @@
 # __init__.py
-__all__ = ['Path', 'State', 'FSM', 'Graph', 'MCTSSchedule', 'MCTSNode', 'Oracle']
+__all__ = ['Path', 'State', 'FSM', 'Graph', 'MCTSSchedule', 'MCTSNode', 'ArrayMCTSSchedule', 'ArrayMCTSTree', 'SharedMCTSSchedule', 'Oracle']
 
 from objects.fsm import Path, State, FSM
 from objects.graph import Graph
 from objects.oracle import Oracle
 from objects.mcts_schedule import MCTSSchedule
-from objects.mcts_node import MCTSNode
\ No newline at end of file
+from objects.mcts_node import MCTSNode
+from objects.mcts_array import ArrayMCTSSchedule, ArrayMCTSTree
+from objects.mcts_shared import SharedMCTSSchedule
\ No newline at end of file
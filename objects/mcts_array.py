@@ -0,0 +1,409 @@
+# Array-backed MCTS tree
+# Nodes live in parallel numpy arrays indexed by node id; children of a node are a
+# contiguous block of the `kids` buffer (CSR style: child_start/child_count/child_cap).
+# ArrayNode is a thin view exposing the MCTSNode API, so MCTSSchedule logic and
+# core_fuzzer helpers work unchanged on top of it.
+import math, random
+import numpy as np
+from collections import defaultdict
+from math import sqrt, log
+from typing import Dict, List, Optional
+from .mcts_schedule import MCTSSchedule, ALPHA_SINK, EPSILON_ROOT
+
+INIT_NODES = 1024
+INIT_STATES = 64
+MIN_CHILD_CAP = 4
+
+
+class ArrayMCTSTree:
+    def __init__(self, init_state: str, capacity: int = INIT_NODES):
+        self.state_names: List[str] = []
+        self.state_ids: Dict[str, int] = {}
+        self.n_nodes = 0
+        self.kids_used = 0
+        cap = max(1, capacity)
+        self.parent      = np.full(cap, -1, dtype=np.int32)
+        self.state       = np.zeros(cap, dtype=np.int32)
+        self.depth       = np.zeros(cap, dtype=np.int32)
+        self.n_sel       = np.zeros(cap, dtype=np.int64)
+        self.n_det       = np.zeros(cap, dtype=np.int64)
+        self.reward      = np.zeros(cap, dtype=np.float64)
+        self.cost        = np.zeros(cap, dtype=np.float64)
+        self.cost_sq     = np.zeros(cap, dtype=np.float64)
+        self.cost_min    = np.zeros(cap, dtype=np.float64)
+        self.cost_max    = np.zeros(cap, dtype=np.float64)
+        self.n_cost      = np.zeros(cap, dtype=np.int64)
+        self.last_sel    = np.zeros(cap, dtype=np.int64)
+        self.child_start = np.zeros(cap, dtype=np.int64)
+        self.child_count = np.zeros(cap, dtype=np.int32)
+        self.child_cap   = np.zeros(cap, dtype=np.int32)
+        self.kids        = np.full(cap * MIN_CHILD_CAP, -1, dtype=np.int32)
+        # per-state counters mirrored from MCTSSchedule.state_visits / sink_hits
+        self.state_visits = np.zeros(INIT_STATES, dtype=np.float64)
+        self.sink_pen     = np.zeros(INIT_STATES, dtype=np.float64)
+        # node id -> {state: stats of a pruned child}
+        self.pruned: Dict[int, dict] = {}
+        self._new_node(init_state, -1)
+
+    # -------- storage -------- #
+    def state_id(self, name: str) -> int:
+        sid = self.state_ids.get(name)
+        if sid is None:
+            sid = len(self.state_names)
+            self.state_ids[name] = sid
+            self.state_names.append(name)
+            if sid >= len(self.state_visits):
+                self.state_visits = _grow(self.state_visits, sid + 1)
+                self.sink_pen = _grow(self.sink_pen, sid + 1)
+        return sid
+
+    def _node_arrays(self):
+        return ("parent", "state", "depth", "n_sel", "n_det", "reward", "cost", "cost_sq",
+                "cost_min", "cost_max", "n_cost", "last_sel", "child_start", "child_count", "child_cap")
+
+    def _ensure_nodes(self, need: int):
+        if need <= len(self.parent):
+            return
+        for name in self._node_arrays():
+            fill = -1 if name == "parent" else 0
+            setattr(self, name, _grow(getattr(self, name), need, fill))
+
+    def _ensure_kids(self, need: int):
+        if need > len(self.kids):
+            self.kids = _grow(self.kids, need, -1)
+
+    def _new_node(self, state_name: str, parent: int) -> int:
+        idx = self.n_nodes
+        self._ensure_nodes(idx + 1)
+        self.n_nodes += 1
+        self.parent[idx] = parent
+        self.state[idx] = self.state_id(state_name)
+        self.depth[idx] = 0 if parent < 0 else self.depth[parent] + 1
+        return idx
+
+    def add_child(self, idx: int, state_name: str, cap_hint: int = 0) -> int:
+        cnt = int(self.child_count[idx])
+        cap = int(self.child_cap[idx])
+        if cnt >= cap:
+            # move the block to the tail with a larger capacity; old slots are left unused
+            new_cap = max(MIN_CHILD_CAP, cap_hint, cap * 2)
+            start = self.kids_used
+            self._ensure_kids(start + new_cap)
+            old = int(self.child_start[idx])
+            self.kids[start:start + cnt] = self.kids[old:old + cnt]
+            self.child_start[idx] = start
+            self.child_cap[idx] = new_cap
+            self.kids_used += new_cap
+        child = self._new_node(state_name, idx)
+        self.kids[self.child_start[idx] + cnt] = child
+        self.child_count[idx] = cnt + 1
+        return child
+
+    def remove_child(self, idx: int, child: int):
+        # close the gap so sibling order is kept; the child's slots become garbage
+        ks = self.children_of(idx)
+        pos = int(np.flatnonzero(ks == child)[0])
+        ks[pos:-1] = ks[pos + 1:].copy()
+        self.child_count[idx] -= 1
+
+    def children_of(self, idx: int) -> np.ndarray:
+        s = int(self.child_start[idx])
+        return self.kids[s:s + int(self.child_count[idx])]
+
+    def find_child(self, idx: int, state_name: str) -> int:
+        sid = self.state_ids.get(state_name)
+        if sid is None:
+            return -1
+        ks = self.children_of(idx)
+        hit = np.flatnonzero(self.state[ks] == sid)
+        return int(ks[hit[0]]) if len(hit) else -1
+
+    def state_path(self, idx: int) -> List[str]:
+        path = []
+        while idx >= 0:
+            path.append(self.state_names[self.state[idx]])
+            idx = int(self.parent[idx])
+        path.reverse()
+        return path
+
+    def node(self, idx: int) -> "ArrayNode":
+        return ArrayNode(self, idx)
+
+    # -------- vectorized scoring -------- #
+    def child_scores(self, idx: int, rho: float, cov_bias: float, cost_ref: float = 0.0) -> np.ndarray:
+        # same operation order as MCTSSchedule._child_score so both backends agree bit for bit
+        ks = self.children_of(idx)
+        n = self.n_sel[ks].astype(np.float64)
+        sid = self.state[ks]
+        bias = cov_bias / np.sqrt(self.state_visits[sid] + 1)
+        pn = int(self.n_sel[idx])
+        two_log = 2 * log(pn) if pn > 0 else -math.inf
+        with np.errstate(divide="ignore", invalid="ignore"):
+            exploit = self.reward[ks] / n
+            if cost_ref > 0.0:
+                c = self.cost[ks]
+                exploit = np.where(c > 0.0, self.reward[ks] / c * cost_ref, exploit)
+            u = exploit + bias + rho * np.sqrt(two_log / n)
+        u = np.where(n == 0, math.inf, u)
+        return u - ALPHA_SINK * self.sink_pen[sid]
+
+    # -------- (de)serialization -------- #
+    def to_dict(self, idx: int = 0):
+        return self._to_dict(idx, self.state_path(idx))
+
+    def _to_dict(self, idx: int, state_path: List[str]):
+        d = self._stats_dict(idx, state_path)
+        if self.pruned.get(idx):
+            d["pruned"] = self.pruned[idx]
+        d["children"] = {self.state_names[self.state[k]]: self._to_dict(int(k), state_path + [self.state_names[self.state[k]]])
+                         for k in self.children_of(idx)}
+        return d
+
+    def _stats_dict(self, idx: int, state_path: List[str]):
+        return {
+            "state_path": state_path,
+            "n_sel": int(self.n_sel[idx]),
+            "n_det": int(self.n_det[idx]),
+            "reward": float(self.reward[idx]),
+            "cost": float(self.cost[idx]),
+            "cost_sq": float(self.cost_sq[idx]),
+            "cost_min": float(self.cost_min[idx]),
+            "cost_max": float(self.cost_max[idx]),
+            "n_cost": int(self.n_cost[idx]),
+            "last_sel": int(self.last_sel[idx]),
+        }
+
+    def _load_stats(self, idx: int, d):
+        self.n_sel[idx] = d["n_sel"]
+        self.n_det[idx] = d["n_det"]
+        self.reward[idx] = d["reward"]
+        self.cost[idx] = d.get("cost", 0.0)
+        self.cost_sq[idx] = d.get("cost_sq", 0.0)
+        self.cost_min[idx] = d.get("cost_min", 0.0)
+        self.cost_max[idx] = d.get("cost_max", 0.0)
+        self.n_cost[idx] = d.get("n_cost", 0)
+        self.last_sel[idx] = d.get("last_sel", 0)
+
+    @classmethod
+    def from_dict(cls, d) -> "ArrayMCTSTree":
+        tree = cls(d["state_path"][-1])
+        stack = [(0, d)]
+        while stack:
+            idx, nd = stack.pop()
+            tree._load_stats(idx, nd)
+            if nd.get("pruned"):
+                tree.pruned[idx] = dict(nd["pruned"])
+            kids = nd["children"]
+            for k, v in kids.items():
+                stack.append((tree.add_child(idx, k, cap_hint=len(kids)), v))
+        return tree
+
+
+def _grow(arr: np.ndarray, need: int, fill=0) -> np.ndarray:
+    new_len = max(need, 2 * len(arr))
+    out = np.full(new_len, fill, dtype=arr.dtype)
+    out[:len(arr)] = arr
+    return out
+
+
+class ArrayNode:
+    # MCTSNode-compatible view of one node of an ArrayMCTSTree
+    __slots__ = ("tree", "idx")
+
+    def __init__(self, tree: ArrayMCTSTree, idx: int):
+        self.tree = tree
+        self.idx = idx
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayNode) and other.tree is self.tree and other.idx == self.idx
+
+    def __hash__(self):
+        return hash((id(self.tree), self.idx))
+
+    def __repr__(self):
+        return f"<ArrayNode {self.idx} {self.state_name}>"
+
+    @property
+    def state_name(self) -> str:
+        return self.tree.state_names[self.tree.state[self.idx]]
+
+    @property
+    def state_path(self) -> List[str]:
+        return self.tree.state_path(self.idx)
+
+    @property
+    def parent(self) -> Optional["ArrayNode"]:
+        p = int(self.tree.parent[self.idx])
+        return None if p < 0 else ArrayNode(self.tree, p)
+
+    @property
+    def children(self) -> Dict[str, "ArrayNode"]:
+        t = self.tree
+        return {t.state_names[t.state[k]]: ArrayNode(t, int(k)) for k in t.children_of(self.idx)}
+
+    def _field(name):
+        def get(self):
+            return getattr(self.tree, name)[self.idx].item()
+        def set(self, v):
+            getattr(self.tree, name)[self.idx] = v
+        return property(get, set)
+
+    n_sel = _field("n_sel")
+    n_det = _field("n_det")
+    reward = _field("reward")
+    cost = _field("cost")
+    cost_sq = _field("cost_sq")
+    cost_min = _field("cost_min")
+    cost_max = _field("cost_max")
+    n_cost = _field("n_cost")
+    last_sel = _field("last_sel")
+    del _field
+
+    # ----------  API --------- #
+    def exploit(self, cost_ref: float = 0.0) -> float:
+        if cost_ref > 0.0 and self.cost > 0.0:
+            return self.reward / self.cost * cost_ref
+        return self.reward / self.n_sel
+
+    def uct(self, rho: float, bias: float = 0.0, cost_ref: float = 0.0) -> float:
+        if self.n_sel == 0:
+            return float("inf")
+        return self.exploit(cost_ref) + bias + rho * sqrt(2 * log(self.parent.n_sel) / self.n_sel)
+
+    def has_child(self, state_name: str) -> bool:
+        return self.tree.find_child(self.idx, state_name) >= 0
+
+    def add_child(self, state_name: str, cap_hint: int = 0) -> "ArrayNode":
+        return ArrayNode(self.tree, self.tree.add_child(self.idx, state_name, cap_hint))
+
+    def remove_child(self, state_name: str) -> "ArrayNode":
+        t = self.tree
+        child = t.find_child(self.idx, state_name)
+        t.pruned.setdefault(self.idx, {})[state_name] = t._stats_dict(child, [])
+        t.remove_child(self.idx, child)
+        return ArrayNode(t, child)
+
+    def take_pruned(self, state_name: str) -> Optional[dict]:
+        rec = self.tree.pruned.get(self.idx)
+        if not rec:
+            return None
+        out = rec.pop(state_name, None)
+        if not rec:
+            del self.tree.pruned[self.idx]
+        return out
+
+    def stats_dict(self):
+        return self.tree._stats_dict(self.idx, self.state_path)
+
+    def load_stats(self, d):
+        self.tree._load_stats(self.idx, d)
+
+    def fully_expanded(self) -> bool:
+        return bool(np.all(self.tree.n_sel[self.tree.children_of(self.idx)] > 0))
+
+    def add_reward(self, r: float):
+        self.tree.reward[self.idx] += r
+        self.tree.n_sel[self.idx] += 1
+
+    def add_cost(self, sec: float):
+        t, i = self.tree, self.idx
+        t.cost_min[i] = sec if t.n_cost[i] == 0 else min(t.cost_min[i], sec)
+        t.cost_max[i] = max(t.cost_max[i], sec)
+        t.cost[i] += sec
+        t.cost_sq[i] += sec * sec
+        t.n_cost[i] += 1
+
+    def cost_stats(self):
+        if self.n_cost == 0:
+            return 0.0, 0.0, 0.0, 0.0
+        mean = self.cost / self.n_cost
+        var = max(0.0, self.cost_sq / self.n_cost - mean * mean)
+        return mean, sqrt(var), self.cost_min, self.cost_max
+
+    def to_dict(self):
+        return self.tree.to_dict(self.idx)
+
+
+class _StateCounter(defaultdict):
+    # defaultdict(int) that mirrors every write into a per-state numpy column
+    def __init__(self, tree: ArrayMCTSTree, column: str):
+        super().__init__(int)
+        self.tree = tree
+        self.column = column
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        getattr(self.tree, self.column)[self.tree.state_id(key)] = value
+
+    def clear(self):
+        super().clear()
+        getattr(self.tree, self.column)[:] = 0
+
+    def rebind(self, tree: ArrayMCTSTree):
+        self.tree = tree
+        col = getattr(tree, self.column)
+        col[:] = 0
+        for k, v in self.items():
+            getattr(tree, self.column)[tree.state_id(k)] = v
+
+
+class ArrayMCTSSchedule(MCTSSchedule):
+    def __init__(self, init_state: str, select_mode: str = "reward", transposition: bool = False, tt_bucket: int = 0, max_nodes: int = 0):
+        if transposition:
+            raise ValueError("MCTS transposition mode needs the tree backend (MCTS_BACKEND=tree)")
+        super().__init__(init_state, select_mode=select_mode, max_nodes=max_nodes)
+        self.tree = ArrayMCTSTree(init_state)
+        self.root = self.tree.node(0)
+        self.state_visits = _StateCounter(self.tree, "state_visits")
+        self.sink_hits = _StateCounter(self.tree, "sink_pen")
+        self._succ_cache = {}
+        self._compact_due = False
+
+    def load_tree(self, d):
+        if d.get("transposition"):
+            raise ValueError("Saved MCTS is a transposition DAG, load it with the tree backend")
+        self.tree = ArrayMCTSTree.from_dict(d)
+        self.root = self.tree.node(0)
+        self.state_visits.rebind(self.tree)
+        self.sink_hits.rebind(self.tree)
+        self._recount()
+        self._compact_due = False
+
+    def prune(self, protect=()) -> int:
+        removed = super().prune(protect)
+        if removed and self.tree.n_nodes > 2 * self.n_nodes:
+            # the caller may still hold ArrayNode handles of this episode, compact before the next one
+            self._compact_due = True
+        return removed
+
+    def choose_state(self, fsm, state_obj_map):
+        if self._compact_due:
+            # rebuild the arrays from the live nodes only
+            self.load_tree(self.to_dict())
+        return super().choose_state(fsm, state_obj_map)
+
+    def _fully_expanded(self, node, fsm):
+        s = node.state_name
+        key = (s, len(fsm.transitions))
+        n_succ = self._succ_cache.get(key)
+        if n_succ is None:
+            n_succ = len(self._succ(fsm, s))
+            self._succ_cache[key] = n_succ
+        return int(self.tree.child_count[node.idx]) >= n_succ
+
+    # -------- Selection -------- #
+    def _select(self, fsm) -> List[ArrayNode]:
+        t = self.tree
+        idx = 0
+        path = [0]
+        at_root = True
+        cost_ref = self._cost_ref()
+        while t.child_count[idx] > 0 and self._fully_expanded(ArrayNode(t, idx), fsm):
+            ks = t.children_of(idx)
+            if at_root and random.random() < EPSILON_ROOT:
+                idx = int(ks[np.argmin(t.n_sel[ks])])
+            else:
+                idx = int(ks[np.argmax(t.child_scores(idx, self.rho, self.cov_bias, cost_ref))])
+            at_root = False
+            path.append(idx)
+        return [ArrayNode(t, i) for i in path]
@@ -12,13 +12,30 @@ class MCTSNode:
         self.n_det: int = 0                           
         self.reward: float = 0.0                      
         self.best_seed: Optional[list] = None       
+        # episode cost (wall seconds) of every episode that went through this node
+        self.cost: float = 0.0
+        self.cost_sq: float = 0.0
+        self.cost_min: float = 0.0
+        self.cost_max: float = 0.0
+        self.n_cost: int = 0
+        # transposition mode only: selections along each outgoing edge
+        self.edge_sel: Dict[str, int] = {}
+        # last episode that touched this node, and stats of pruned children by state
+        self.last_sel: int = 0
+        self.pruned: Dict[str, dict] = {}
 
     # ----------  API --------- #
-    def uct(self, rho: float, bias: float = 0.0) -> float:
+    def uct(self, rho: float, bias: float = 0.0, cost_ref: float = 0.0) -> float:
         if self.n_sel == 0:
             return float("inf")
         # return self.n_det / self.n_sel + rho * sqrt(2 * log(self.parent.n_sel) / self.n_sel)
-        return self.reward / self.n_sel + bias + rho * sqrt(2 * log(self.parent.n_sel) / self.n_sel)
+        return self.exploit(cost_ref) + bias + rho * sqrt(2 * log(self.parent.n_sel) / self.n_sel)
+
+    def exploit(self, cost_ref: float = 0.0) -> float:
+        # cost_ref > 0: reward per second, scaled back to one episode of cost_ref seconds
+        if cost_ref > 0.0 and self.cost > 0.0:
+            return self.reward / self.cost * cost_ref
+        return self.reward / self.n_sel
 
     def has_child(self, state_name: str) -> bool:
         return state_name in self.children
@@ -28,6 +45,15 @@ class MCTSNode:
         self.children[state_name] = child
         return child
 
+    def remove_child(self, state_name: str) -> "MCTSNode":
+        # drop the child subtree, keep its statistics for a later re-expansion
+        child = self.children.pop(state_name)
+        self.pruned[state_name] = child.stats_dict()
+        return child
+
+    def take_pruned(self, state_name: str) -> Optional[dict]:
+        return self.pruned.pop(state_name, None)
+
     def fully_expanded(self) -> bool:
         return all(c.n_sel > 0 for c in self.children.values())
 
@@ -35,21 +61,71 @@ class MCTSNode:
         self.reward += r
         self.n_sel  += 1
 
-    def to_dict(self):
+    def add_cost(self, sec: float):
+        self.cost_min = sec if self.n_cost == 0 else min(self.cost_min, sec)
+        self.cost_max = max(self.cost_max, sec)
+        self.cost    += sec
+        self.cost_sq += sec * sec
+        self.n_cost  += 1
+
+    def cost_stats(self):
+        # (mean, std, min, max) of the episode cost in seconds
+        if self.n_cost == 0:
+            return 0.0, 0.0, 0.0, 0.0
+        mean = self.cost / self.n_cost
+        var = max(0.0, self.cost_sq / self.n_cost - mean * mean)
+        return mean, sqrt(var), self.cost_min, self.cost_max
+
+    def stats_dict(self):
         return {
             "state_path": self.state_path,
             "n_sel": self.n_sel,
             "n_det": self.n_det,
             "reward": self.reward,
-            "children": {k: v.to_dict() for k, v in self.children.items()}
+            "cost": self.cost,
+            "cost_sq": self.cost_sq,
+            "cost_min": self.cost_min,
+            "cost_max": self.cost_max,
+            "n_cost": self.n_cost,
+            "last_sel": self.last_sel,
         }
 
+    def to_dict(self):
+        d = self.stats_dict()
+        if self.pruned:
+            d["pruned"] = self.pruned
+        d["children"] = {k: v.to_dict() for k, v in self.children.items()}
+        return d
+
+    def load_stats(self, d):
+        self.n_sel = d["n_sel"]
+        self.n_det = d["n_det"]
+        self.reward = d["reward"]
+        self.cost = d.get("cost", 0.0)
+        self.cost_sq = d.get("cost_sq", 0.0)
+        self.cost_min = d.get("cost_min", 0.0)
+        self.cost_max = d.get("cost_max", 0.0)
+        self.n_cost = d.get("n_cost", 0)
+        self.last_sel = d.get("last_sel", 0)
+
+    def merge_stats(self, other: "MCTSNode"):
+        # fold the statistics of another node into this one
+        if other.n_cost:
+            self.cost_min = other.cost_min if self.n_cost == 0 else min(self.cost_min, other.cost_min)
+            self.cost_max = max(self.cost_max, other.cost_max)
+        self.n_sel   += other.n_sel
+        self.n_det   += other.n_det
+        self.reward  += other.reward
+        self.cost    += other.cost
+        self.cost_sq += other.cost_sq
+        self.n_cost  += other.n_cost
+        self.last_sel = max(self.last_sel, other.last_sel)
+
     @classmethod
     def from_dict(cls, d, parent=None):
         node = cls(d["state_path"], parent)
-        node.n_sel = d["n_sel"]
-        node.n_det = d["n_det"]
-        node.reward = d["reward"]
+        node.load_stats(d)
+        node.pruned = dict(d.get("pruned", {}))
         for k, v in d["children"].items():
             node.children[k] = cls.from_dict(v, node)
         return node
@@ -1,30 +1,59 @@
 # MCTS schedule
-import random, math
+import logging, random, math
 from math import sqrt
 from collections import defaultdict, deque
 from typing import List, Optional, Tuple
 from .mcts_node import MCTSNode
 
+log = logging.getLogger("pascofuzz.mcts")
+trace = logging.getLogger("pascofuzz.trace.mcts")
+
 MCTS_RHO = 1.4
 STATE_REWARD = 1
 TRANSITION_REWARD = 0.8
 ERROR_REWARD = 0.4
 FIELD_REWARD = 0.2
+COV_REWARD = 0.0           # gcda arc coverage, off unless the worker polls coverage
+COV_GAIN_K = 10.0
 COV_BIAS = 1.2
 DEPTH_GAMMA = 1.1
 ALPHA_SINK = 0.15
 EPSILON_ROOT = 0.10 
 MAX_CONSECUTIVE_SELECTIONS = 10 
+# "reward": mean reward per episode, "rate": reward per second of episode cost
+SELECT_MODES = ("reward", "rate")
+# transposition mode: nodes are shared per (state, depth // TT_DEPTH_BUCKET)
+TT_DEPTH_BUCKET = 4
+# node budget: once over max_nodes, prune subtrees down to PRUNE_LOW_WATER * max_nodes
+PRUNE_LOW_WATER = 0.8
+PRUNE_MIN_DEPTH = 2        # root children are never pruned
+STALE_EPISODES = 500       # value halves after this many episodes without a visit
+SINK_PRUNE_HITS = 3        # states with this many sink hits are pruned first
 
 
 class MCTSSchedule:
-    def __init__(self, init_state: str):
+    def __init__(self, init_state: str, select_mode: str = "reward", transposition: bool = False, tt_bucket: int = TT_DEPTH_BUCKET, max_nodes: int = 0):
+        if select_mode not in SELECT_MODES:
+            raise ValueError(f"Unknown MCTS select mode '{select_mode}', expected one of {SELECT_MODES}")
         self.root = MCTSNode([init_state])
+        self.select_mode = select_mode
+        self.transposition = transposition
+        self.tt_bucket = max(1, int(tt_bucket))
+        self.table = {}
+        if transposition:
+            self.table[self._tt_key(init_state, 0)] = self.root
+        self.max_nodes = max(0, int(max_nodes))
+        self.n_nodes = 1
+        self.episode = 0
+        self.prune_count = 0
+        self.pruned_nodes = 0
+        self.prune_events = deque(maxlen=64)
         self.rho = MCTS_RHO
         self.state_reward = STATE_REWARD
         self.transition_reward = TRANSITION_REWARD
         self.error_reward = ERROR_REWARD
         self.field_reward = FIELD_REWARD
+        self.cov_reward = COV_REWARD
         self.state_visits = defaultdict(int)
         self.cov_bias = COV_BIAS
         self.depth_gamma = DEPTH_GAMMA
@@ -33,6 +62,163 @@ class MCTSSchedule:
         self.last_terminals = deque(maxlen=64)
         self.selection_counter = defaultdict(int) 
 
+    def load_tree(self, d):
+        if d.get("transposition"):
+            self._load_dag(d)
+            return
+        self.root = MCTSNode.from_dict(d)
+        if self.transposition:
+            self._tree_to_dag()
+        self._recount()
+
+    def _recount(self):
+        self.n_nodes = sum(1 for _ in self.iter_nodes())
+        self.episode = max(n.last_sel for n, _ in self.iter_nodes())
+
+    def to_dict(self):
+        if not self.transposition:
+            return self.root.to_dict()
+        ids = {n: i for i, (n, _) in enumerate(self.iter_nodes())}
+        keys = {n: k for k, n in self.table.items()}
+        nodes = []
+        for n, _ in self.iter_nodes():
+            d = n.stats_dict()
+            d["children"] = {k: ids[c] for k, c in n.children.items()}
+            d["edge_sel"] = dict(n.edge_sel)
+            if n in keys:
+                d["tt_key"] = list(keys[n])
+            nodes.append(d)
+        return {"transposition": True, "tt_bucket": self.tt_bucket, "nodes": nodes}
+
+    def iter_nodes(self, start: Optional[MCTSNode] = None):
+        # every node once, with its depth; safe on transposition DAGs with cycles
+        seen = set()
+        stack = [self.root if start is None else start]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            yield node, len(node.state_path) - 1
+            stack.extend(reversed(list(node.children.values())))
+
+    # -------- Transposition table -------- #
+    def _tt_key(self, state_name: str, depth: int):
+        return (state_name, depth // self.tt_bucket)
+
+    def child_of(self, node: MCTSNode, state_name: str, depth: Optional[int] = None) -> MCTSNode:
+        # get or create the child of node for state_name; in transposition mode shared per
+        # (state, depth bucket), depth being the child's depth on the current walk (a shared
+        # node's state_path is the path it was created on, not the one it was reached by)
+        if not self.transposition:
+            if node.has_child(state_name):
+                return node.children[state_name]
+            return self._new_child(node, state_name)
+        if depth is None:
+            depth = len(node.state_path)
+        key = self._tt_key(state_name, depth)
+        child = self.table.get(key)
+        if child is None:
+            if node.has_child(state_name):
+                # a node has one child per state; its edge already leads to another bucket's node
+                return node.children[state_name]
+            child = self._new_child(node, state_name)
+            self.table[key] = child
+        elif not node.has_child(state_name):
+            node.children[state_name] = child
+        return child
+
+    def _new_child(self, node: MCTSNode, state_name: str) -> MCTSNode:
+        child = node.add_child(state_name)
+        self.n_nodes += 1
+        rec = node.take_pruned(state_name)
+        if rec is not None:
+            child.load_stats(rec)
+        child.last_sel = self.episode
+        return child
+
+    # -------- Pruning -------- #
+    def _prune_score(self, node: MCTSNode) -> float:
+        # lower is pruned first: sinks, then low value discounted by staleness
+        st = node.state_path[-1]
+        age = max(0, self.episode - node.last_sel)
+        if self.sink_hits.get(st, 0) >= SINK_PRUNE_HITS or st in self.sink_states:
+            return -1.0 - age / STALE_EPISODES
+        value = node.reward / node.n_sel if node.n_sel else 0.0
+        return value / (1.0 + age / STALE_EPISODES)
+
+    def prune(self, protect=()) -> int:
+        # remove subtrees until the tree fits the low-water mark; returns removed node count
+        if self.transposition or self.max_nodes <= 0 or self.n_nodes <= self.max_nodes:
+            return 0
+        target = int(self.max_nodes * PRUNE_LOW_WATER)
+        keep = set(protect)
+        cands = []
+        for node, depth in self.iter_nodes():
+            if depth + 1 >= PRUNE_MIN_DEPTH:
+                for k, c in node.children.items():
+                    if c not in keep:
+                        cands.append((self._prune_score(c), k, node, c))
+        cands.sort(key=lambda x: x[0])
+        gone = set()
+        removed = subtrees = sinks = stale = 0
+        for score, k, parent, child in cands:
+            if self.n_nodes - removed <= target:
+                break
+            if parent in gone or child in gone:
+                continue
+            # a lower scored descendant may already be gone, count what is left
+            for n, _ in self.iter_nodes(child):
+                gone.add(n)
+                removed += 1
+            parent.remove_child(k)
+            subtrees += 1
+            if score < 0:
+                sinks += 1
+            elif self.episode - child.last_sel >= STALE_EPISODES:
+                stale += 1
+        self.n_nodes -= removed
+        self.prune_count += 1
+        self.pruned_nodes += removed
+        self.prune_events.append({"episode": self.episode, "removed": removed, "subtrees": subtrees,
+                                  "sink": sinks, "stale": stale, "size": self.n_nodes})
+        log.info("[PRUNE] episode=%d removed=%d subtrees=%d sink=%d stale=%d size=%d/%d",
+                 self.episode, removed, subtrees, sinks, stale, self.n_nodes, self.max_nodes)
+        return removed
+
+    def _load_dag(self, d):
+        self.transposition = True
+        self.tt_bucket = max(1, int(d.get("tt_bucket", self.tt_bucket)))
+        nodes = [MCTSNode(nd["state_path"]) for nd in d["nodes"]]
+        for node, nd in zip(nodes, d["nodes"]):
+            node.load_stats(nd)
+            node.edge_sel = dict(nd.get("edge_sel", {}))
+            for k, cid in nd["children"].items():
+                child = nodes[cid]
+                node.children[k] = child
+                if child.parent is None and child is not nodes[0]:
+                    child.parent = node
+        self.root = nodes[0]
+        # older dumps have no tt_key, their nodes go under the depth they were created at
+        self.table = {tuple(nd["tt_key"]) if "tt_key" in nd else self._tt_key(n.state_path[-1], len(n.state_path) - 1): n
+                      for n, nd in zip(nodes, d["nodes"])}
+        self._recount()
+
+    def _tree_to_dag(self):
+        # fold a path-keyed tree into the transposition table, summing shared statistics
+        old_root = self.root
+        self.root = MCTSNode(list(old_root.state_path))
+        self.root.merge_stats(old_root)
+        self.table = {self._tt_key(self.root.state_path[-1], 0): self.root}
+        stack = [(old_root, self.root)]
+        while stack:
+            old, new = stack.pop()
+            for k, oc in old.children.items():
+                nc = self.child_of(new, k, len(oc.state_path) - 1)
+                nc.merge_stats(oc)
+                new.edge_sel[k] = new.edge_sel.get(k, 0) + oc.n_sel
+                stack.append((oc, nc))
+
     def _succ(self, fsm, s: str):
         return sorted({t[3] for t in fsm.transitions if t[0] == s and t[3] != s})
 
@@ -45,9 +231,23 @@ class MCTSSchedule:
         visit_cnt = self.state_visits.get(state_name, 0)
         return self.cov_bias / sqrt(visit_cnt + 1)
 
-    def _child_score(self, child: MCTSNode) -> float:
+    def _cost_ref(self) -> float:
+        # mean episode cost over the whole tree, 0 disables the per-second rate
+        if self.select_mode != "rate" or self.root.n_cost == 0:
+            return 0.0
+        return self.root.cost / self.root.n_cost
+
+    def _child_score(self, child: MCTSNode, cost_ref: float = 0.0, parent: Optional[MCTSNode] = None) -> float:
         b = self._novelty_bias(child.state_path[-1])
-        u = child.uct(self.rho, b)
+        if self.transposition and parent is not None:
+            # shared value, exploration over the edge actually taken from this parent
+            n_edge = parent.edge_sel.get(child.state_path[-1], 0)
+            if n_edge == 0 or child.n_sel == 0:
+                u = float("inf")
+            else:
+                u = child.exploit(cost_ref) + b + self.rho * sqrt(2 * math.log(max(1, parent.n_sel)) / n_edge)
+        else:
+            u = child.uct(self.rho, b, cost_ref)
         pen = ALPHA_SINK * self.sink_hits.get(child.state_path[-1], 0)
         return u - pen
 
@@ -59,33 +259,43 @@ class MCTSSchedule:
         path = [self.root]
         node = self.root
         at_root = True
+        cost_ref = self._cost_ref()
         # while node.fully_expanded() and node.children:
         while self._fully_expanded(node, fsm) and node.children:
             kids = list(node.children.values())
+            if self.transposition:
+                # a shared node can be its own ancestor, never walk a cycle
+                kids = [k for k in kids if k not in path]
+                if not kids:
+                    break
             if at_root and random.random() < EPSILON_ROOT:
                 node = min(kids, key=lambda n: n.n_sel)
             else:
-                node = max(kids, key=self._child_score)
+                parent = node
+                node = max(kids, key=lambda n: self._child_score(n, cost_ref, parent))
             at_root = False
             # node = max(node.children.values(), key=lambda n: n.uct(self.rho, self._novelty_bias(n.state_path[-1])))
             path.append(node)
 
-        for c in node.children.values():
-            st = c.state_path[-1]
-            b  = self._novelty_bias(st)
-            print(f"[UCT] parent={node.state_path[-1]} -> {st}  n_sel={c.n_sel} visit={self.state_visits.get(st,0)} bias={b:.3f} uct={c.uct(self.rho, b):.3f}")
+        if trace.isEnabledFor(logging.DEBUG):
+            for c in node.children.values():
+                st = c.state_path[-1]
+                trace.debug("[UCT] parent=%s -> %s  n_sel=%d visit=%d bias=%.3f score=%.3f cost=%.2fs",
+                          node.state_path[-1], st, c.n_sel, self.state_visits.get(st, 0), self._novelty_bias(st),
+                          self._child_score(c, cost_ref, node), c.cost_stats()[0])
 
         return path
 
     # -------- Expansion -------- #
-    def _expand(self, node: MCTSNode, outgoing_states: List[str]) -> MCTSNode:
+    def _expand(self, node: MCTSNode, outgoing_states: List[str], depth: Optional[int] = None) -> MCTSNode:
+        # depth: the new child's depth on the current walk
         unseen = [s for s in outgoing_states if not node.has_child(s)]
         if unseen:
             # pick = min(unseen, key=lambda s: self.state_visits.get(s, 0))
             pool = [s for s in unseen if s not in self.sink_states] or unseen
             pick = min(pool, key=lambda s: (self.state_visits.get(s, 0), random.random()))
-            print(f"[EXPAND] parent={node.state_path[-1]} -> pick={pick}")
-            return node.add_child(pick)
+            log.debug("[EXPAND] parent=%s -> pick=%s", node.state_path[-1], pick)
+            return self.child_of(node, pick, depth)
         # return min(node.children.values(), key=lambda n: self.state_visits.get(n.state_path[-1], 0))
         return min(node.children.values(), key=lambda n: (self.state_visits.get(n.state_path[-1], 0), random.random())
         )    
@@ -99,7 +309,7 @@ class MCTSSchedule:
 
 
         if self.selection_counter[curr_state_name] >= MAX_CONSECUTIVE_SELECTIONS:
-            print(f"[ANTI-STICKY] State {curr_state_name} selected too many times, selecting a different state.")
+            log.info("[ANTI-STICKY] State %s selected too many times, selecting a different state.", curr_state_name)
 
             alternate_node = random.choice([child for child in self.root.children.values() if child.state_path[-1] != curr_state_name])
             path = [self.root, alternate_node]
@@ -113,7 +323,7 @@ class MCTSSchedule:
 
         # if outgoing and leaf.n_sel == 0 and not leaf.children:
         if outgoing and (leaf.n_sel == 0 or leaf.n_sel > 0):
-            leaf = self._expand(leaf, outgoing)
+            leaf = self._expand(leaf, outgoing, len(path))
             path.append(leaf)
         return leaf, path
 
@@ -126,31 +336,60 @@ class MCTSSchedule:
 
     def _norm_weights(self):
         S = (self.state_reward + self.transition_reward +
-            self.error_reward + self.field_reward)
+            self.error_reward + self.field_reward + self.cov_reward)
         return (self.state_reward/S, self.transition_reward/S,
-                self.error_reward/S, self.field_reward/S)
+                self.error_reward/S, self.field_reward/S, self.cov_reward/S)
 
     # -------- Back-propagation -------- #
-    def backpropagate(self, path: List[MCTSNode], new_state: bool = False, new_transition: bool = False, error_reward: float = 0.0, new_fields_cnt: int = 0):
+    def _unique_path(self, path: List[MCTSNode]) -> List[MCTSNode]:
+        # a DAG walk may pass the same shared node twice; update it once per episode
+        if not self.transposition:
+            return path
+        seen = set()
+        out = []
+        for node in path:
+            if node not in seen:
+                seen.add(node)
+                out.append(node)
+        return out
+
+    def charge_cost(self, path: List[MCTSNode], cost: float):
+        # episodes aborted before backpropagate (failed alignment, resets) still cost time
+        if not path or cost <= 0.0:
+            return
+        for node in self._unique_path(path):
+            node.add_cost(cost)
+
+    def backpropagate(self, path: List[MCTSNode], new_state: bool = False, new_transition: bool = False, error_reward: float = 0.0, new_fields_cnt: int = 0, cost: float = 0.0, new_cov_edges: int = 0):
         if path == None:
-            print("path is None")
+            log.warning("path is None")
             return False
-        print("backpropagage path:", path)
-        ws, wt, we, wf = self._norm_weights()
+        self.charge_cost(path, cost)
+        log.debug("backpropagate path: %s", path[-1].state_path if path else [])
+        ws, wt, we, wf, wc = self._norm_weights()
         reward = ws * (1.0 if new_state else 0.0)
         reward += wt * (1.0 if new_transition else 0.0)
         reward += we * (error_reward)
         reward += wf * self._bounded_fields_gain(new_fields_cnt)
+        reward += wc * self._bounded_fields_gain(new_cov_edges, k=COV_GAIN_K)
         reward = max(0.0, min(1.0, reward))
         # for node in path:
         #     node.add_reward(reward)
-        path_len = len(path)
+        if self.transposition:
+            for a, b in zip(path, path[1:]):
+                k = b.state_path[-1]
+                if a.children.get(k) is b:
+                    a.edge_sel[k] = a.edge_sel.get(k, 0) + 1
+        walk = self._unique_path(path)
+        path_len = len(walk)
         if path_len == 0:
             return reward
         wl = [self.depth_gamma ** d for d in range(path_len)]
-        for depth, node in enumerate(path):
+        self.episode += 1
+        for depth, node in enumerate(walk):
             depth_reward = reward * (wl[depth] / float(sum(wl)))
             node.add_reward(depth_reward)
+            node.last_sel = self.episode
 
         # 动态标记 sink
         last = path[-1].state_path[-1] if path else None
@@ -162,17 +401,16 @@ class MCTSSchedule:
             else:
                 self.sink_hits[last] = max(0, self.sink_hits[last] - 1)
 
-        print(f"[BP] last={last} reward={reward:.3f} sink_hits={self.sink_hits.get(last,0)}")
+        log.debug("[BP] last=%s reward=%.3f cost=%.2fs sink_hits=%d", last, reward, cost, self.sink_hits.get(last, 0))
 
+        self.prune(protect=walk)
         return reward
 
     def path_from_fsm_path(self, fsm, path, *, verify: bool = False, allow_rebase: bool = True):
         ps = path.path_states
         acts = path.input_symbols
         outs = path.output_symbols
-        print("path_states", ps)
-        print("input_symbols", acts)
-        print("output_symbols", outs)
+        log.debug("path_states %s input_symbols %s output_symbols %s", ps, acts, outs)
         if not ps or not acts or len(ps) != len(acts) + 1:
             raise ValueError("Invalid Path: need path_states length = input_symbols length + 1")
 
@@ -183,7 +421,7 @@ class MCTSSchedule:
                 try:
                     start_idx = ps.index(root_state)
                 except ValueError:
-                    print(f"[MCTS] path_from_fsm_path: path does not contain root '{root_state}', mapping from root anyway")
+                    log.warning("[MCTS] path_from_fsm_path: path does not contain root '%s', mapping from root anyway", root_state)
                     start_idx = 0
             else:
                 raise ValueError(f"Path start_state '{ps[0]}' != MCTS root '{root_state}'")
@@ -206,11 +444,7 @@ class MCTSSchedule:
         node = self.root
         mcts_nodes = [node]
         for j in range(start_idx, len(ps) - 1):
-            next_state = ps[j + 1]
-            if not node.has_child(next_state):
-                node = node.add_child(next_state)
-            else:
-                node = node.children[next_state]
+            node = self.child_of(node, ps[j + 1], len(mcts_nodes))
             mcts_nodes.append(node)
 
         return mcts_nodes
@@ -0,0 +1,335 @@
+# Shared MCTS across workers
+# The master hosts one MCTSService in a manager process; every worker talks to it
+# through SharedMCTSSchedule, which keeps the choose_state/backpropagate API of
+# MCTSSchedule. Selections apply a virtual loss to the chosen path until the
+# worker backpropagates, so concurrent workers spread over different leaves.
+# The manager unpickles what its clients send, so the authkey is drawn fresh for
+# every campaign by the master and handed to the workers in a 0600 file.
+import logging, os, sys, threading, time
+from collections import defaultdict
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional, Tuple
+from .mcts_node import MCTSNode
+from .mcts_schedule import MCTSSchedule
+
+VIRTUAL_LOSS = 1
+TICKET_TIMEOUT = 900       # seconds before a virtual loss of a silent worker is dropped
+
+log = logging.getLogger("pascofuzz.mcts")
+
+
+class _EdgeFSM:
+    # union of (src, dst) edges reported by all workers; MCTSSchedule only reads t[0] and t[3]
+    def __init__(self):
+        self.transitions = []
+        self._seen = set()
+
+    def add_edges(self, edges):
+        for src, dst in edges:
+            if (src, dst) not in self._seen:
+                self._seen.add((src, dst))
+                self.transitions.append([src, "", "", dst])
+
+
+class MCTSService:
+    def __init__(self, select_mode: str = "reward", max_nodes: int = 0, transposition: bool = False,
+                 tt_bucket: int = 4, virtual_loss: int = VIRTUAL_LOSS, cov_reward: float = 0.0):
+        self.lock = threading.Lock()
+        self.opts = dict(select_mode=select_mode, max_nodes=max_nodes, transposition=transposition, tt_bucket=tt_bucket)
+        self.virtual_loss = virtual_loss
+        self.cov_reward = cov_reward
+        self.schedules: Dict[str, MCTSSchedule] = {}
+        self.fsms: Dict[str, _EdgeFSM] = {}
+        self.tickets: Dict[int, tuple] = {}
+        self.next_ticket = 1
+        self.calls = defaultdict(int)
+
+    # -------- helpers (lock held) -------- #
+    def _get(self, name: str, init_state: str) -> MCTSSchedule:
+        sch = self.schedules.get(name)
+        if sch is None:
+            sch = MCTSSchedule(init_state, **self.opts)
+            sch.cov_reward = self.cov_reward
+            self.schedules[name] = sch
+            self.fsms[name] = _EdgeFSM()
+        return sch
+
+    def _resolve(self, sch: MCTSSchedule, states) -> List[MCTSNode]:
+        # states: the state of every node from the root down, as walked by the worker
+        node = sch.root
+        nodes = [node]
+        for st in states[1:]:
+            node = sch.child_of(node, st, len(nodes))
+            nodes.append(node)
+        return nodes
+
+    def _merge(self, sch: MCTSSchedule, visit_delta, sink_delta):
+        for k, v in (visit_delta or {}).items():
+            sch.state_visits[k] += v
+        for k, v in (sink_delta or {}).items():
+            sch.sink_hits[k] = max(0, sch.sink_hits[k] + v)
+
+    def _release(self, ticket: Optional[int]):
+        rec = self.tickets.pop(ticket, None) if ticket else None
+        if rec is None:
+            return
+        for node in rec[2]:
+            node.n_sel = max(0, node.n_sel - self.virtual_loss)
+
+    def _expire(self):
+        now = time.monotonic()
+        for t in [t for t, rec in self.tickets.items() if now - rec[1] > TICKET_TIMEOUT]:
+            self._release(t)
+
+    def _reply(self, name: str, sch: MCTSSchedule):
+        return {"state_visits": dict(sch.state_visits), "sink_hits": dict(sch.sink_hits),
+                "n_nodes": sch.n_nodes, "max_nodes": sch.max_nodes,
+                "prune_count": sch.prune_count, "pruned_nodes": sch.pruned_nodes}
+
+    # -------- RPC -------- #
+    def choose(self, name, init_state, edges, visit_delta, sink_delta, release):
+        with self.lock:
+            self.calls["choose"] += 1
+            sch = self._get(name, init_state)
+            self._release(release)
+            self._expire()
+            self._merge(sch, visit_delta, sink_delta)
+            if edges:
+                self.fsms[name].add_edges(edges)
+            leaf, path = sch.choose_state(self.fsms[name], None)
+            vl_nodes = sch._unique_path(path)
+            for node in vl_nodes:
+                node.n_sel += self.virtual_loss
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            self.tickets[ticket] = (name, time.monotonic(), vl_nodes)
+            return ticket, [n.state_path for n in path], self._reply(name, sch)
+
+    def backprop(self, name, init_state, release, states, kwargs, visit_delta, sink_delta):
+        with self.lock:
+            self.calls["backprop"] += 1
+            sch = self._get(name, init_state)
+            self._release(release)
+            self._merge(sch, visit_delta, sink_delta)
+            path = self._resolve(sch, states) if states else None
+            reward = sch.backpropagate(path, **kwargs)
+            return reward, self._reply(name, sch)
+
+    def charge(self, name, init_state, release, states, cost, visit_delta, sink_delta):
+        with self.lock:
+            self.calls["charge"] += 1
+            sch = self._get(name, init_state)
+            self._release(release)
+            self._merge(sch, visit_delta, sink_delta)
+            if states:
+                sch.charge_cost(self._resolve(sch, states), cost)
+            return self._reply(name, sch)
+
+    def child(self, name, init_state, states, state_name):
+        with self.lock:
+            sch = self._get(name, init_state)
+            return sch.child_of(self._resolve(sch, states)[-1], state_name, len(states)).state_path
+
+    def children(self, name, init_state, states):
+        with self.lock:
+            sch = self._get(name, init_state)
+            return list(self._resolve(sch, states)[-1].children.keys())
+
+    def to_dict(self, name, init_state):
+        with self.lock:
+            return self._get(name, init_state).to_dict()
+
+    def load(self, name, init_state, d):
+        with self.lock:
+            self._get(name, init_state).load_tree(d)
+
+    def names(self):
+        with self.lock:
+            return list(self.schedules.keys())
+
+    def stats(self):
+        with self.lock:
+            return {"calls": dict(self.calls), "pending_tickets": len(self.tickets),
+                    "trees": {k: s.n_nodes for k, s in self.schedules.items()}}
+
+
+def new_authkey(path) -> bytes:
+    # master side: a random key for this campaign, readable by the owner only
+    key = os.urandom(32)
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key.hex().encode())
+    os.replace(tmp, path)
+    return key
+
+
+def read_authkey(path) -> bytes:
+    with open(path, "rb") as f:
+        return bytes.fromhex(f.read().decode().strip())
+
+
+class MCTSManager(BaseManager):
+    pass
+
+
+_SERVICE = None
+
+def _service():
+    return _SERVICE
+
+def _init_service(opts: dict, log_path: Optional[str]):
+    global _SERVICE
+    if log_path:
+        sys.stdout = sys.stderr = open(log_path, "a", buffering=1)
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(asctime)s %(levelname).1s %(name)s: %(message)s")
+    _SERVICE = MCTSService(**opts)
+
+MCTSManager.register("service", callable=_service)
+
+
+def start_mcts_service(address: Tuple[str, int], authkey: bytes, log_path: Optional[str] = None, **opts) -> MCTSManager:
+    # master side: spawn the manager process hosting the shared trees
+    mgr = MCTSManager(address=address, authkey=authkey)
+    mgr.start(initializer=_init_service, initargs=(opts, log_path))
+    return mgr
+
+
+def connect_mcts_service(address: Tuple[str, int], authkey: bytes, timeout: float = 30.0):
+    t0 = time.time()
+    while True:
+        mgr = MCTSManager(address=address, authkey=authkey)
+        try:
+            mgr.connect()
+            return mgr.service()
+        except (ConnectionRefusedError, OSError):
+            if time.time() - t0 > timeout:
+                raise
+            time.sleep(0.5)
+
+
+class _DeltaCounter(defaultdict):
+    # local copy of a server counter; writes are kept as deltas until the next RPC
+    def __init__(self):
+        super().__init__(int)
+        self.pending = defaultdict(int)
+
+    def __setitem__(self, key, value):
+        self.pending[key] += value - self.get(key, 0)
+        super().__setitem__(key, value)
+
+    def take(self):
+        out = dict(self.pending)
+        self.pending.clear()
+        return out
+
+    def refresh(self, snapshot: dict):
+        super().clear()
+        for k, v in snapshot.items():
+            super().__setitem__(k, v)
+
+
+class RemoteNode:
+    # worker side handle of a shared tree node, identified by its state path
+    __slots__ = ("schedule", "state_path")
+
+    def __init__(self, schedule: "SharedMCTSSchedule", state_path: List[str]):
+        self.schedule = schedule
+        self.state_path = list(state_path)
+
+    def __eq__(self, other):
+        return isinstance(other, RemoteNode) and other.state_path == self.state_path
+
+    def __hash__(self):
+        return hash(tuple(self.state_path))
+
+    def __repr__(self):
+        return f"<RemoteNode {'/'.join(self.state_path)}>"
+
+    @property
+    def children(self) -> Dict[str, "RemoteNode"]:
+        names = self.schedule._call("children", self.state_path)
+        return {k: RemoteNode(self.schedule, self.state_path + [k]) for k in names}
+
+    def has_child(self, state_name: str) -> bool:
+        return state_name in self.schedule._call("children", self.state_path)
+
+    def add_child(self, state_name: str) -> "RemoteNode":
+        return self.schedule.child_of(self, state_name)
+
+
+class SharedMCTSSchedule:
+    # drop-in replacement for MCTSSchedule backed by the master's MCTSService
+    def __init__(self, name: str, init_state: str, address: Tuple[str, int], authkey: bytes):
+        self.name = name
+        self.init_state = init_state
+        self.svc = connect_mcts_service(address, authkey)
+        self.root = RemoteNode(self, [init_state])
+        self.state_visits = _DeltaCounter()
+        self.sink_hits = _DeltaCounter()
+        self.n_nodes = 1
+        self.max_nodes = 0
+        self.prune_count = 0
+        self.pruned_nodes = 0
+        self._ticket = None
+        self._n_trans = -1
+
+    def _call(self, fn: str, *args):
+        return getattr(self.svc, fn)(self.name, self.init_state, *args)
+
+    def _update(self, reply: dict):
+        self.state_visits.refresh(reply["state_visits"])
+        self.sink_hits.refresh(reply["sink_hits"])
+        self.n_nodes = reply["n_nodes"]
+        self.max_nodes = reply["max_nodes"]
+        self.prune_count = reply["prune_count"]
+        self.pruned_nodes = reply["pruned_nodes"]
+
+    def _release(self):
+        t, self._ticket = self._ticket, None
+        return t
+
+    def choose_state(self, fsm, state_obj_map) -> Tuple[RemoteNode, List[RemoteNode]]:
+        edges = None
+        if len(fsm.transitions) != self._n_trans:
+            self._n_trans = len(fsm.transitions)
+            edges = sorted({(t[0], t[3]) for t in fsm.transitions if t[0] != t[3]})
+        ticket, paths, reply = self._call("choose", edges, self.state_visits.take(), self.sink_hits.take(), self._release())
+        self._ticket = ticket
+        self._update(reply)
+        nodes = [RemoteNode(self, p) for p in paths]
+        return nodes[-1], nodes
+
+    def backpropagate(self, path: List[RemoteNode], new_state: bool = False, new_transition: bool = False, error_reward: float = 0.0, new_fields_cnt: int = 0, cost: float = 0.0, new_cov_edges: int = 0):
+        if path == None:
+            log.warning("path is None")
+            return False
+        kwargs = dict(new_state=new_state, new_transition=new_transition, error_reward=error_reward,
+                      new_fields_cnt=new_fields_cnt, cost=cost, new_cov_edges=new_cov_edges)
+        reward, reply = self._call("backprop", self._release(), [n.state_path[-1] for n in path], kwargs,
+                                   self.state_visits.take(), self.sink_hits.take())
+        self._update(reply)
+        return reward
+
+    def charge_cost(self, path: List[RemoteNode], cost: float):
+        if not path or cost <= 0.0:
+            return
+        reply = self._call("charge", self._release(), [n.state_path[-1] for n in path], cost,
+                           self.state_visits.take(), self.sink_hits.take())
+        self._update(reply)
+
+    def child_of(self, node: RemoteNode, state_name: str, depth: Optional[int] = None) -> RemoteNode:
+        # the service takes the depth from node's state path
+        return RemoteNode(self, self._call("child", node.state_path, state_name))
+
+    def load_tree(self, d):
+        self._call("load", d)
+
+    def to_dict(self):
+        return self._call("to_dict")
+
+    def iter_nodes(self, start=None):
+        # walks a local snapshot of the shared tree
+        sch = MCTSSchedule(self.init_state)
+        sch.load_tree(self.to_dict())
+        yield from sch.iter_nodes()
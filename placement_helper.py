@@ -0,0 +1,134 @@
+# CPU placement of the fuzzing processes (PIN_CPUS=1)
+# Without placement 5gc, nr-gnb, the nr-ue processes, the workers, mongod and
+# tcpdump all float over every CPU, and a UE or NF that is descheduled at the
+# wrong moment shows up as a response timeout (null_action) in the worker.
+# The planner reads the physical cores from sysfs (hyperthread siblings stay
+# together, cores are ordered by NUMA node and package), restricted to the CPUs
+# the master may run on, and hands out whole cores: one for the master,
+# tcpdump and the collection pool, one for mongod, per core instance one each
+# for AMF, SMF, the other NFs and the gNB, and the rest split evenly over the
+# workers. A worker's nr-ue processes are its children and inherit its set.
+# With too few cores AMF/SMF/NFs share one set per instance, then workers
+# share cores; below that nothing is pinned.
+# Affinity is set on every thread of a process (os.sched_setaffinity works on
+# thread ids); threads started later inherit it from the thread creating them.
+import os, pathlib, subprocess
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+PIN_CPUS = int(config.get('PIN_CPUS', 0))
+PIN_MONGO = int(config.get('PIN_MONGO', 1))
+SYS_CPU = pathlib.Path("/sys/devices/system/cpu")
+SYS_NODE = pathlib.Path("/sys/devices/system/node")
+
+def parse_cpulist(text: str) -> set:
+    # "0-3,8,10-11" -> {0, 1, 2, 3, 8, 10, 11}
+    cpus = set()
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+def format_cpulist(cpus) -> str:
+    cpus = sorted(cpus)
+    out, i = [], 0
+    while i < len(cpus):
+        j = i
+        while j + 1 < len(cpus) and cpus[j + 1] == cpus[j] + 1:
+            j += 1
+        out.append(str(cpus[i]) if i == j else f"{cpus[i]}-{cpus[j]}")
+        i = j + 1
+    return ",".join(out)
+
+def _read(path, default=""):
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return default
+
+def cpu_topology(allowed=None) -> list:
+    # physical cores as sorted lists of logical CPUs, by (node, package, core id)
+    allowed = set(os.sched_getaffinity(0) if allowed is None else allowed)
+    node_of = {}
+    for node in SYS_NODE.glob("node[0-9]*"):
+        for cpu in parse_cpulist(_read(node / "cpulist")):
+            node_of[cpu] = int(node.name[4:])
+    cores = {}
+    for cpu in sorted(allowed):
+        topo = SYS_CPU / f"cpu{cpu}" / "topology"
+        pkg = int(_read(topo / "physical_package_id", "0") or 0)
+        core = int(_read(topo / "core_id", str(cpu)) or cpu)
+        cores.setdefault((node_of.get(cpu, 0), pkg, core), []).append(cpu)
+    return [sorted(c) for _, c in sorted(cores.items())]
+
+def plan_placement(cores: list, n_workers: int, n_instances: int = 1, mongo: bool = True) -> dict | None:
+    # role -> set of CPUs; roles: master, mongo, amf<k>, smf<k>, nf<k>, gnb<k>, w<wid>
+    free = list(cores)
+    split_nf = len(free) >= 1 + int(mongo) + 4 * n_instances + n_workers
+    if len(free) < 1 + int(mongo) + 2 * n_instances + 1:
+        return None
+    def take():
+        return set(free.pop(0))
+    plan = {"master": take()}
+    if mongo:
+        plan["mongo"] = take()
+    for k in range(n_instances):
+        if split_nf:
+            plan[f"amf{k}"], plan[f"smf{k}"], plan[f"nf{k}"] = take(), take(), take()
+        else:
+            plan[f"amf{k}"] = plan[f"smf{k}"] = plan[f"nf{k}"] = take()
+        plan[f"gnb{k}"] = take()
+    # contiguous chunks of the remaining cores; with fewer cores than workers they share round-robin
+    for wid in range(n_workers):
+        if len(free) >= n_workers:
+            lo, hi = wid * len(free) // n_workers, (wid + 1) * len(free) // n_workers
+            plan[f"w{wid}"] = set().union(*free[lo:hi])
+        else:
+            plan[f"w{wid}"] = set(free[wid % len(free)])
+    return plan
+
+def nf_role(comm: str, k: int) -> str:
+    # process name of an NF of instance k -> its role in the plan
+    if comm.startswith("open5gs-amf"):
+        return f"amf{k}"
+    if comm.startswith("open5gs-smf"):
+        return f"smf{k}"
+    return f"nf{k}"
+
+def pin(pid: int, cpus) -> int:
+    # every thread of pid onto cpus; returns the number of threads pinned
+    n = 0
+    try:
+        tids = [int(t) for t in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        return 0
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+            n += 1
+        except (ProcessLookupError, PermissionError):
+            continue
+    return n
+
+def pids_of(name: str) -> list:
+    try:
+        out = subprocess.check_output(["pgrep", "-x", name], text=True)
+    except subprocess.CalledProcessError:
+        return []
+    return [int(x) for x in out.split()]
+
+def timeout_summary(rows: list) -> dict:
+    # pooled recv timeout rate per placement mode over round rows of logs/placement.jsonl
+    out = {}
+    for r in rows:
+        m = out.setdefault("pinned" if r.get("pinned") else "unpinned",
+                           {"rounds": 0, "recvs": 0, "recv_timeouts": 0})
+        m["rounds"] += 1
+        m["recvs"] += r.get("recvs", 0)
+        m["recv_timeouts"] += r.get("recv_timeouts", 0)
+    for m in out.values():
+        m["timeout_rate"] = m["recv_timeouts"] / m["recvs"] if m["recvs"] else 0.0
+    return out
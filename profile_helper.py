@@ -0,0 +1,237 @@
+# Built-in profiling for workers (--profile)
+# "sample" runs a daemon thread that samples the fuzz loop's stack every
+# PROFILE_SAMPLE_MS and writes folded stacks (flamegraph.pl / speedscope input);
+# "cprofile" runs cProfile on the fuzz loop thread. Both rotate every
+# PROFILE_WINDOW seconds, keep the last PROFILE_KEEP windows and a cumulative
+# total. SIGUSR1 starts tracemalloc on the first signal and writes a snapshot
+# with the growth since the previous one on every later signal. Each dump
+# records gauges of the worker's own structures (paths, MCTS nodes, edge_hits)
+# so memory growth can be tied to them. Everything goes to one directory
+# that the master moves into the round output directory.
+import cProfile, io, json, os, pathlib, pstats, signal, sys, threading, time, tracemalloc
+from collections import Counter
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+PROFILE_WINDOW = float(config.get('PROFILE_WINDOW', 60))         # seconds per window
+PROFILE_KEEP = int(config.get('PROFILE_KEEP', 10))                 # windows kept on disk
+PROFILE_SAMPLE_MS = float(config.get('PROFILE_SAMPLE_MS', 10))
+PROFILE_TRACE_FRAMES = int(config.get('PROFILE_TRACE_FRAMES', 16))
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_TOP = 30
+
+def _frame_key(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def folded_stack(frame) -> str:
+    # root first, ";"-separated, as expected by flamegraph.pl
+    parts = []
+    while frame is not None:
+        parts.append(_frame_key(frame))
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+def write_folded(path, stacks: Counter):
+    with open(path, "w") as f:
+        for stack, n in stacks.most_common():
+            f.write(f"{stack} {n}\n")
+
+def read_folded(path) -> Counter:
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, n = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(n)
+    return stacks
+
+class WorkerProfiler:
+    def __init__(self, wid: int, out_dir, mode: str = "sample", gauges=None,
+                 window: float = PROFILE_WINDOW, keep: int = PROFILE_KEEP):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        self.wid = wid
+        self.out_dir = pathlib.Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        self.gauges = gauges
+        self.window = window
+        self.keep = keep
+        self.n_window = 0
+        self.t_window = time.monotonic()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread_id = threading.get_ident()
+        # sample mode
+        self.stacks = Counter()
+        self.total_stacks = Counter()
+        self.n_samples = 0
+        self.sampler = None
+        # cprofile mode
+        self.prof = None
+        self.total_stats = None
+        # tracemalloc
+        self.last_snapshot = None
+        self.n_snapshot = 0
+
+    # ---------- lifecycle ---------- #
+    def start(self):
+        # call from the thread that runs the fuzz loop
+        self.thread_id = threading.get_ident()
+        if self.mode == "cprofile":
+            self.prof = cProfile.Profile()
+            self.prof.enable()
+        else:
+            self.sampler = threading.Thread(target=self._sample_loop, name=f"profiler-w{self.wid}", daemon=True)
+            self.sampler.start()
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self._on_signal)
+        self._log_gauges("start")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.sampler is not None:
+            self.sampler.join(timeout=2)
+        self.rotate()
+        if tracemalloc.is_tracing():
+            self.snapshot("exit")
+            tracemalloc.stop()
+
+    def maybe_rotate(self):
+        # called once per fuzz loop iteration; cProfile must be swapped on its own thread
+        if time.monotonic() - self.t_window >= self.window:
+            self.rotate()
+
+    # ---------- windows ---------- #
+    def _sample_loop(self):
+        interval = PROFILE_SAMPLE_MS / 1000.0
+        while not self.stop_event.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = folded_stack(frame)
+            with self.lock:
+                self.stacks[stack] += 1
+                self.n_samples += 1
+
+    def rotate(self):
+        self.t_window = time.monotonic()
+        tag = f"{self.n_window:04d}_{time.strftime('%H%M%S')}"
+        if self.mode == "cprofile":
+            if self.prof is None:
+                return
+            self.prof.disable()
+            path = self.out_dir / f"cprofile_{tag}.pstats"
+            self.prof.dump_stats(path)
+            if self.total_stats is None:
+                self.total_stats = pstats.Stats(str(path))
+            else:
+                self.total_stats.add(str(path))
+            self.total_stats.dump_stats(self.out_dir / "cprofile_total.pstats")
+            self._prune("cprofile_*.pstats", "cprofile_total.pstats")
+            if not self.stop_event.is_set():
+                self.prof = cProfile.Profile()
+                self.prof.enable()
+        else:
+            with self.lock:
+                stacks, self.stacks = self.stacks, Counter()
+            if stacks:
+                write_folded(self.out_dir / f"stacks_{tag}.folded", stacks)
+                self.total_stacks.update(stacks)
+                write_folded(self.out_dir / "stacks_total.folded", self.total_stacks)
+                self._prune("stacks_*.folded", "stacks_total.folded")
+        self.n_window += 1
+        self._log_gauges(f"window {tag}")
+
+    def _prune(self, pattern: str, total: str):
+        files = sorted(p for p in self.out_dir.glob(pattern) if p.name != total)
+        for p in files[:-self.keep] if self.keep > 0 else []:
+            try: p.unlink()
+            except OSError: pass
+
+    # ---------- memory ---------- #
+    def _on_signal(self, signum, frame):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACE_FRAMES)
+            self.last_snapshot = self._take()
+            self._log_gauges("tracemalloc start")
+            return
+        self.snapshot("signal")
+
+    def _take(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def snapshot(self, reason: str):
+        snap = self._take()
+        current, peak = tracemalloc.get_traced_memory()
+        path = self.out_dir / f"tracemalloc_{self.n_snapshot:03d}_{time.strftime('%H%M%S')}.txt"
+        with open(path, "w") as f:
+            f.write(f"# worker {self.wid} {reason}: traced {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB\n")
+            f.write(f"# gauges {json.dumps(self._gauges())}\n\n## top allocations by line\n")
+            for st in snap.statistics("lineno")[:PROFILE_TOP]:
+                f.write(f"{st}\n")
+            if self.last_snapshot is not None:
+                f.write("\n## growth since previous snapshot\n")
+                for st in snap.compare_to(self.last_snapshot, "lineno")[:PROFILE_TOP]:
+                    f.write(f"{st}\n")
+        self.last_snapshot = snap
+        self.n_snapshot += 1
+        self._log_gauges(f"tracemalloc {reason}")
+
+    def _gauges(self) -> dict:
+        if self.gauges is None:
+            return {}
+        try:
+            return self.gauges()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _log_gauges(self, event: str):
+        rec = {"ts": time.time(), "event": event, "samples": self.n_samples, **self._gauges()}
+        if tracemalloc.is_tracing():
+            rec["traced_kb"] = tracemalloc.get_traced_memory()[0] // 1024
+        with open(self.out_dir / "gauges.jsonl", "a") as f:
+            f.write(json.dumps(rec) + "\n")
+
+def summarize_profile_dir(prof_dir, top: int = PROFILE_TOP) -> str:
+    # master side: text summary of the cumulative profile of one worker round
+    prof_dir = pathlib.Path(prof_dir)
+    out = io.StringIO()
+    total = prof_dir / "cprofile_total.pstats"
+    folded = prof_dir / "stacks_total.folded"
+    if total.exists():
+        st = pstats.Stats(str(total), stream=out).strip_dirs()
+        out.write("## cProfile, by own time\n")
+        st.sort_stats("tottime").print_stats(top)
+        out.write("## cProfile, by cumulative time\n")
+        st.sort_stats("cumulative").print_stats(top)
+    if folded.exists():
+        stacks = read_folded(folded)
+        n = sum(stacks.values()) or 1
+        self_cnt, incl_cnt = Counter(), Counter()
+        for stack, c in stacks.items():
+            frames = stack.split(";")
+            self_cnt[frames[-1]] += c
+            for fr in set(frames):
+                incl_cnt[fr] += c
+        out.write(f"## sampled stacks: {n} samples\n## by own samples\n")
+        for fr, c in self_cnt.most_common(top):
+            out.write(f"{c / n:7.1%} {c:8d}  {fr}\n")
+        out.write("## inclusive\n")
+        for fr, c in incl_cnt.most_common(top):
+            out.write(f"{c / n:7.1%} {c:8d}  {fr}\n")
+    gauges = prof_dir / "gauges.jsonl"
+    if gauges.exists():
+        lines = gauges.read_text().splitlines()
+        if lines:
+            out.write("## gauges first / last\n")
+            out.write(lines[0] + "\n" + lines[-1] + "\n")
+    text = out.getvalue()
+    if text:
+        (prof_dir / "summary.txt").write_text(text)
+    return text
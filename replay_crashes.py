@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# Reproduce and minimize the crashes recorded by the workers.
+# Crash rows (if_crash / if_crash_sm) are read from the worker collections,
+# the shortest alignment path to the row's state is rebuilt from the saved FSM
+# of that worker and the recorded mutated message is replayed as a
+# testMessage. Rows are spread over worker slots, one UE each, that align in
+# parallel; trigger messages go out one at a time so a crash in the shared
+# core.log can be attributed, and the core is restarted after every crash.
+# A reproduced crash is delta-debugged (ddmin) over its prefix with the crash
+# signature held fixed; the minimal sequence is written to logs/replay/.
+# Run from the repo root while no campaign is running, the slots use the UE
+# ports and IMSIs of the workers with the same id.
+import argparse, json, os, pathlib, queue, signal, socket, subprocess, sys, threading, time
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.mongo_client import MongoClient
+from dotenv import dotenv_values
+from crash_monitor import scan_crash_incidents
+from triage_helper import group_incidents, read_crash_window, crash_signature, signature_id
+from fsm_helper import get_states_and_tx
+from setup_helper import killCore, killGNB, startCore, startGNB, sendRRCRelease, MAX_IMSI_OFFSET
+
+config = dotenv_values(".env")
+
+LOG_ROOT = pathlib.Path("logs")
+CORE_LOG = LOG_ROOT / "core.log"
+GNB_LOG = LOG_ROOT / "gnb.log"
+REPLAY_DIR = LOG_ROOT / "replay"
+UE_PORT_BASE = int(config['UE_PORT_BASE'])
+IMSI_BASE = int(config['IMSI_BASE'])
+MAX_REALIGN = 5
+
+def positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--workers', type=str, default='', help='worker ids to read crash rows from, e.g. 0,2 (default: all)')
+parser.add_argument('--limit', type=int, default=0, help='replay at most this many crash rows')
+parser.add_argument('--slots', type=int, default=int(config.get('N_WORKERS', 1)), help='parallel UE slots')
+parser.add_argument('--tries', type=positive_int, default=3, help='replays of the full path before giving up')
+parser.add_argument('--confirm', type=positive_int, default=1, help='replays per ddmin test')
+parser.add_argument('--settle', type=float, default=1.0, help='seconds to wait for crash lines after the trigger')
+parser.add_argument('--boot', type=float, default=10.0, help='seconds the core needs after a restart')
+parser.add_argument('--no-restart', action='store_true', help='the core is restarted by someone else')
+parser.add_argument('--no-minimize', action='store_true')
+parser.add_argument('--fsm', type=str, default='', help='savedFSM.json or dot file (default: the worker\'s savedFSM.json)')
+parser.add_argument('--fsm-sm', type=str, default='')
+parser.add_argument('--sequence', type=str, default='', help='replay the sequence of a result file once')
+
+# ---------- alignment paths ---------- #
+def load_transitions(path: str):
+    # (init_state, transitions) of a savedFSM.json or of a dot model
+    if path.endswith(".json"):
+        with open(path) as f:
+            d = json.load(f)
+        return d["init_state"], [tuple(t) for t in d["transitions"]]
+    _, transitions, init = get_states_and_tx(path)
+    return init, [tuple(t) for t in transitions]
+
+@lru_cache(maxsize=None)
+def worker_fsm(wid: int, name: str, dot_key: str, override: str):
+    if override:
+        return load_transitions(override)
+    saved = LOG_ROOT / f"worker_{wid}" / name
+    if saved.is_file() and saved.stat().st_size:
+        return load_transitions(str(saved))
+    return load_transitions(config[dot_key])
+
+def shortest_path(init: str, transitions: list, target: str):
+    # BFS over state changes; plain symbols are preferred over learned test messages
+    if target == init:
+        return []
+    adj = {}
+    for src, inp, out, dst in sorted(transitions, key=lambda t: (":" in t[1], t[1])):
+        if src != dst:
+            adj.setdefault(src, []).append((inp, out, dst))
+    prev = {init: None}
+    todo = deque([init])
+    while todo:
+        s = todo.popleft()
+        for inp, out, dst in adj.get(s, []):
+            if dst in prev:
+                continue
+            prev[dst] = (s, inp, out)
+            if dst == target:
+                steps = []
+                while prev[dst] is not None:
+                    dst, inp, out = prev[dst]
+                    steps.append((inp, out))
+                return steps[::-1]
+            todo.append(dst)
+    return None
+
+def alignment_path(row: dict, args):
+    # [(input, expected output)] from the initial state to the row's state, "amf" or "amf:smf"
+    wid = row.get("worker_id", 0)
+    parts = str(row["state"]).split(":")
+    init, tx = worker_fsm(wid, "savedFSM.json", "FSM_PATH", args.fsm)
+    steps = shortest_path(init, tx, parts[0])
+    if steps is None or len(parts) == 1:
+        return steps
+    init_sm, tx_sm = worker_fsm(wid, "savedFSM_sm.json", "FSM_SM_PATH", args.fsm_sm)
+    steps_sm = shortest_path(init_sm, tx_sm, parts[1])
+    return None if steps_sm is None else steps + steps_sm
+
+def trigger_symbol(row: dict) -> str:
+    # the learned-transition form that sendSymbol replays as a testMessage
+    return f"{row['send_type']}:{row['new_msg']}:{row['secmod']}:{row['sht']}"
+
+# ---------- UE slots ---------- #
+class UESlot:
+    # one UE on the command port of worker `slot`, same port/IMSI plan as core_fuzzer.py
+    def __init__(self, slot: int, timeout: float = 5.0):
+        self.slot = slot
+        self.port = UE_PORT_BASE + slot * 100
+        self.imsi_base = IMSI_BASE + slot * 100
+        self.offset = 0
+        self.timeout = timeout
+        self.proc = None
+        self.sock = None
+
+    def restart(self):
+        self.stop()
+        cfg = os.path.join(config["UERANSIM_PATH"], "config", "open5gs-ue.yaml")
+        imsi = f"imsi-{self.imsi_base + self.offset}"
+        self.offset = (self.offset + 1) % (MAX_IMSI_OFFSET + 1)
+        with open(REPLAY_DIR / f"ue_slot{self.slot}.log", "w") as out:
+            self.proc = subprocess.Popen(["nr-ue", "-c", cfg, "-i", imsi, "-p", str(self.port)],
+                                         stdout=out, stderr=out, start_new_session=True)
+        end = time.time() + 8
+        while True:
+            try:
+                self.sock = socket.create_connection(("127.0.0.1", self.port), timeout=0.5)
+                break
+            except OSError:
+                if time.time() > end:
+                    raise
+                time.sleep(0.1)
+        self.sock.settimeout(self.timeout)
+        try:
+            self.sock.recv(1024)
+        except socket.timeout:
+            pass
+
+    def stop(self):
+        if self.sock is not None:
+            try: self.sock.close()
+            except OSError: pass
+            self.sock = None
+        if self.proc is not None and self.proc.poll() is None:
+            try:
+                self.proc.send_signal(signal.SIGINT)
+                self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc = None
+
+    def send(self, symbol: str) -> str:
+        # same protocol as core_fuzzer.sendSymbol
+        if "serviceRequest" in symbol:
+            sendRRCRelease()
+            time.sleep(0.1)
+        try:
+            if ":" in symbol:
+                self.send("testMessage")
+                self.sock.send(symbol[symbol.find(":") + 1:].encode())
+                return self.sock.recv(1024).decode().strip()
+            self.sock.send(symbol.encode())
+            for _ in range(3):
+                try:
+                    out = self.sock.recv(1024).decode().strip()
+                    if out:
+                        return out
+                except socket.timeout:
+                    pass
+                time.sleep(0.05)
+        except OSError:
+            pass
+        return ""
+
+# ---------- the shared core ---------- #
+class Core:
+    # serializes trigger messages on the shared core.log and restarts the core after a crash
+    def __init__(self, restart: bool, settle: float, boot: float):
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.do_restart = restart
+        self.settle = settle
+        self.boot = boot
+        self.restarts = 0
+
+    def restart(self):
+        if not self.do_restart:
+            return
+        print("[REPLAY] restarting Core & gNB")
+        killGNB()
+        killCore()
+        time.sleep(0.5)
+        startCore()
+        time.sleep(self.boot)
+        startGNB()
+        end = time.time() + 10
+        while time.time() < end:
+            if GNB_LOG.is_file() and "NG Setup procedure is successful" in GNB_LOG.read_text(errors="ignore"):
+                break
+            time.sleep(1.0)
+        else:
+            print("[REPLAY] WARN: gNB did not report NG Setup in time")
+        self.generation += 1
+        self.restarts += 1
+
+    def attempt(self, slot: UESlot, prefix: list, trigger: str, component: str):
+        # run prefix + trigger on a fresh UE; returns (signature or None, outputs of the prefix)
+        for _ in range(MAX_REALIGN):
+            gen = self.generation
+            try:
+                slot.restart()
+            except OSError as e:
+                print(f"[REPLAY] slot {slot.slot}: UE did not come up: {e}")
+                continue
+            outs = [slot.send(sym) for sym in prefix]
+            with self.lock:
+                if gen != self.generation:
+                    continue    # the core restarted under our prefix
+                base = _line_count(CORE_LOG)
+                slot.send(trigger)
+                time.sleep(self.settle)
+                hits = [x for x in scan_crash_incidents(str(CORE_LOG))
+                        if x["line_no"] > base and x["component"] == component]
+                if not hits:
+                    return None, outs
+                group = group_incidents(hits)[0]
+                _, _, frames = read_crash_window(str(CORE_LOG), group, context=0)
+                sig = crash_signature(component, group, frames)
+                self.restart()
+                return sig, outs
+        return None, []
+
+def _line_count(path) -> int:
+    try:
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+    except OSError:
+        return 0
+
+# ---------- minimization ---------- #
+def ddmin(items: list, test) -> list:
+    # Zeller's ddmin; test(subsequence) is True while the crash still reproduces
+    cache = {}
+    def check(sub):
+        key = tuple(sub)
+        if key not in cache:
+            cache[key] = test(sub)
+        return cache[key]
+    if check([]):
+        return []
+    n = 2
+    while len(items) >= 2:
+        size = -(-len(items) // n)
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        for i, chunk in enumerate(chunks):
+            if check(chunk):
+                items, n = chunk, 2
+                break
+            rest = [x for j, c in enumerate(chunks) if j != i for x in c]
+            if len(chunks) > 2 and check(rest):
+                items, n = rest, max(n - 1, 2)
+                break
+        else:
+            if n >= len(items):
+                break
+            n = min(n * 2, len(items))
+    if len(items) == 1 and check([]):
+        return []
+    return items
+
+def replay_row(row: dict, slots: queue.Queue, core: Core, args) -> dict:
+    component = "amf" if row.get("if_crash") else "smf"
+    res = {"id": str(row["_id"]), "worker_id": row.get("worker_id"), "component": component,
+           "state": row["state"], "send_type": row["send_type"], "base_msg": row.get("base_msg"),
+           "new_msg": row["new_msg"], "sht": row["sht"], "secmod": row["secmod"], "trigger": trigger_symbol(row)}
+    steps = alignment_path(row, args)
+    if steps is None:
+        res["status"] = "unreachable"
+        return res
+    prefix = [inp for inp, _ in steps]
+    res["path"] = [list(s) for s in steps]
+    t0 = time.time()
+    slot = slots.get()
+    try:
+        sig, n_ok = None, 0
+        for i in range(args.tries):
+            sig, outs = core.attempt(slot, prefix, res["trigger"], component)
+            res.setdefault("aligned", []).append(outs == [out for _, out in steps])
+            if sig is not None:
+                break
+        res["tries"] = i + 1
+        if sig is None:
+            res["status"] = "not_reproduced"
+            return res
+        sid = signature_id(sig)
+        res["signature"] = sig
+        res["bucket"] = f"{component}_{sid}"
+        minimal = prefix
+        if not args.no_minimize:
+            def still_crashes(sub):
+                for _ in range(args.confirm):
+                    s, _ = core.attempt(slot, sub, res["trigger"], component)
+                    if s is not None and signature_id(s) == sid:
+                        return True
+                return False
+            minimal = ddmin(prefix, still_crashes)
+            for _ in range(args.tries):
+                s, _ = core.attempt(slot, minimal, res["trigger"], component)
+                n_ok += s is not None and signature_id(s) == sid
+            res["confirmed"] = f"{n_ok}/{args.tries}"
+        res["status"] = "reproduced"
+        res["minimal_prefix"] = minimal
+        res["sequence"] = minimal + [res["trigger"]]
+        return res
+    finally:
+        slots.put(slot)
+        res["elapsed"] = round(time.time() - t0, 2)
+
+# ---------- crash rows ---------- #
+def crash_rows(args) -> list:
+    db = MongoClient(config["MONGO_URI"])["CoreFuzzer"]
+    prefix = f"{config['DB_NAME']}_w"
+    if args.workers:
+        names = [f"{prefix}{w}" for w in args.workers.split(",")]
+    else:
+        names = sorted(n for n in db.list_collection_names() if n.startswith(prefix) and n[len(prefix):].isdigit())
+    rows, seen = [], set()
+    for name in names:
+        for row in db[name].find({"$or": [{"if_crash": True}, {"if_crash_sm": True}]}).sort([("timestamp", 1)]):
+            key = (row["state"], row["new_msg"], row["sht"], row["secmod"])
+            if key in seen or not row.get("new_msg"):
+                continue
+            seen.add(key)
+            row.setdefault("worker_id", int(name[len(prefix):]))
+            rows.append(row)
+    return rows[:args.limit] if args.limit else rows
+
+def replay_sequence(path: str, core: Core, args) -> int:
+    res = json.loads(pathlib.Path(path).read_text())
+    slot = UESlot(0)
+    try:
+        sig, _ = core.attempt(slot, res["sequence"][:-1], res["sequence"][-1], res["component"])
+    finally:
+        slot.stop()
+    if sig is None:
+        print(f"[REPLAY] {path}: no {res['component']} crash")
+        return 1
+    bucket = f"{res['component']}_{signature_id(sig)}"
+    print(f"[REPLAY] {path}: crash {bucket} {sig['reason']} {sig['location']}"
+          f"{'' if bucket == res.get('bucket') else ' (different bucket than recorded)'}")
+    return 0
+
+def main() -> int:
+    args = parser.parse_args()
+    REPLAY_DIR.mkdir(parents=True, exist_ok=True)
+    core = Core(not args.no_restart, args.settle, args.boot)
+    if args.sequence:
+        core.restart()
+        return replay_sequence(args.sequence, core, args)
+    rows = crash_rows(args)
+    print(f"[REPLAY] {len(rows)} unique crash rows, {args.slots} slots")
+    if not rows:
+        return 0
+    core.restart()
+    slots = queue.Queue()
+    for s in range(max(1, args.slots)):
+        slots.put(UESlot(s))
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.slots)) as pool:
+        futures = [pool.submit(replay_row, row, slots, core, args) for row in rows]
+        for fut in futures:
+            res = fut.result()
+            results.append(res)
+            out = REPLAY_DIR / f"{res['component']}_w{res['worker_id']}_{res['id']}.json"
+            out.write_text(json.dumps(res, indent=1, default=str))
+            extra = ""
+            if res["status"] == "reproduced":
+                extra = f" {res['bucket']}, prefix {len(res['path'])} -> {len(res['minimal_prefix'])}"
+            print(f"[REPLAY] {res['id']} {res['state']}/{res['send_type']}: {res['status']}{extra}")
+    while not slots.empty():
+        slots.get().stop()
+    summary = {"rows": len(results), "core_restarts": core.restarts,
+               "reproduced": sum(r["status"] == "reproduced" for r in results),
+               "buckets": sorted({r["bucket"] for r in results if "bucket" in r}),
+               "results": [{k: r.get(k) for k in ("id", "status", "bucket", "state", "sequence")} for r in results]}
+    (REPLAY_DIR / "summary.json").write_text(json.dumps(summary, indent=1))
+    print(f"[REPLAY] {summary['reproduced']}/{len(results)} reproduced, {len(summary['buckets'])} buckets, "
+          f"{core.restarts} core restarts")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# Adaptive response timeouts from observed round trip times
+# The worker used fixed waits: three recv attempts of the 5 s UE socket
+# timeout per symbol, 3 s in send_symbol_on, 5 s for the UE banner, 1 s for
+# the gNB and 8 s for the UE command ports. Messages the core drops on purpose
+# never get an answer, so every such null_action paid the full wait.
+# RttEstimator keeps a smoothed RTT and RTT variance (Jacobson/Karels, as in
+# TCP's RTO) per (symbol, state class), the state class being the last
+# canonical response the UE returned, and per symbol over all classes. The
+# deadline of a request is (srtt + K * rttvar) * margin from the most specific
+# estimate with enough samples, never above the legacy wait and never below
+# the floor. Waits that time out give no sample (Karn); a reply that turns up
+# after its deadline is drained before the next send and counted as a late
+# sample, which widens the estimate again.
+# After a UE reset or a core restart the next RTT_COLD requests use the legacy
+# waits, since the first exchanges with a fresh core are the slow ones.
+import json, os
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+RTT_ADAPTIVE = int(config.get('RTT_ADAPTIVE', 1))
+RTT_K = float(config.get('RTT_K', 4))                           # variance weight
+RTT_MARGIN = float(config.get('RTT_MARGIN', 1.5))               # safety factor on srtt + K * rttvar
+RTT_MIN = float(config.get('RTT_MIN', 0.5))                     # floor of an adaptive deadline (s)
+RTT_MIN_SAMPLES = int(config.get('RTT_MIN_SAMPLES', 8))         # before an estimate is used
+RTT_COLD = int(config.get('RTT_COLD', 5))                       # requests on legacy waits after a reset
+RTT_ALPHA, RTT_BETA = 1 / 8, 1 / 4
+
+class RttEstimator:
+    def __init__(self, adaptive: bool = bool(RTT_ADAPTIVE)):
+        self.adaptive = adaptive
+        self.stats = {}             # key -> [samples, srtt, rttvar]
+        self.state = "init"         # state class of the next request
+        self.cold = RTT_COLD
+        self.pending = None         # (key, send time) of a request that timed out
+        self.late = 0
+        self.nulls = 0
+        self.null_wait = 0.0        # seconds spent waiting on requests without a reply
+        self.null_saved = 0.0       # against the legacy wait of the same requests
+
+    def _update(self, key, rtt: float):
+        st = self.stats.get(key)
+        if st is None:
+            self.stats[key] = [1, rtt, rtt / 2]
+            return
+        st[0] += 1
+        st[2] = (1 - RTT_BETA) * st[2] + RTT_BETA * abs(st[1] - rtt)
+        st[1] = (1 - RTT_ALPHA) * st[1] + RTT_ALPHA * rtt
+
+    def observe(self, key: tuple, rtt: float):
+        self._update(key, rtt)
+        if len(key) > 1:
+            self._update(key[:1], rtt)
+
+    def timeout(self, key: tuple, legacy: float) -> float:
+        # deadline in seconds for a request; legacy is the fixed wait it replaces
+        if not self.adaptive or self.cold > 0:
+            return legacy
+        for k in (key, key[:1]):
+            st = self.stats.get(k)
+            if st and st[0] >= RTT_MIN_SAMPLES:
+                return min(legacy, max(RTT_MIN, (st[1] + RTT_K * st[2]) * RTT_MARGIN))
+        return legacy
+
+    def done(self, key: tuple, waited: float, replied: bool, legacy: float, t_sent: float = 0.0):
+        # after every request; a request without a reply leaves a possible late reply pending
+        if self.cold > 0:
+            self.cold -= 1
+        if replied:
+            self.observe(key, waited)
+            self.pending = None
+            return
+        self.nulls += 1
+        self.null_wait += waited
+        self.null_saved += max(0.0, legacy - waited)
+        # with the legacy waits a late reply is left to the next request, as before
+        self.pending = (key, t_sent) if self.adaptive else None
+
+    def late_reply(self, now: float):
+        # a reply to the pending request arrived after its deadline
+        key, t_sent = self.pending
+        self.pending = None
+        self.late += 1
+        self.observe(key, now - t_sent)
+
+    def after_reset(self):
+        self.state = "init"
+        self.cold = RTT_COLD
+        self.pending = None
+
+    def summary(self) -> dict:
+        return {"rtt_keys": len(self.stats), "rtt_late": self.late, "null_waits": self.nulls,
+                "null_wait_sec": round(self.null_wait, 3), "null_saved_sec": round(self.null_saved, 3)}
+
+    def to_dict(self) -> dict:
+        return {"|".join(k): v for k, v in self.stats.items()}
+
+    def load(self, path) -> bool:
+        # estimates of the previous round; the worker still starts cold
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.stats = {tuple(k.split("|", 1)): v for k, v in data.items()}
+        return True
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
-import os, time, signal, subprocess, shutil, datetime, pathlib, sys, threading
+import os, time, signal, subprocess, shutil, datetime, pathlib, sys, threading, json, argparse
 from db_helper import *
 from setup_helper import *
 from lcov_helper import *
+from merge_helper import merge_worker_fsms
+from metrics_helper import last_snapshot, aggregate_snapshots, append_csv_row, append_jsonl, read_json, write_json_atomic, MetricsExporter
+from profile_helper import summarize_profile_dir, PROFILE_MODES
+from triage_helper import crash_index
+from campaign_helper import load_campaign, save_campaign, save_worker_checkpoint, restore_worker_checkpoint, save_files_ok, CHECKPOINT_DIR
+from watchdog_helper import WorkerWatch, read_heartbeat, clear_heartbeat, HB_GRACE, HB_MAX_RESTARTS
+from instance_helper import CoreInstance, INSTANCES, worker_instance, write_instance_configs, provision_subscribers, group_commands, group_pids, core_pattern, gnb_pattern, stop_groups, worker_ue_pattern
+from placement_helper import PIN_CPUS, PIN_MONGO, cpu_topology, plan_placement, format_cpulist, nf_role, pin, pids_of, timeout_summary
+from collect_helper import RoundCollector, snapshot_gcda, lcov_snapshot, export_increment
+from objects.mcts_shared import start_mcts_service, connect_mcts_service, new_authkey
 from dotenv import dotenv_values
 config = dotenv_values(".env")
 
@@ -18,13 +28,42 @@ LOG_ROOT  = pathlib.Path("logs")
 LOG_ROOT.mkdir(exist_ok=True)
 GCOV_DIR  = LOG_ROOT / pathlib.Path("gcov")
 GCOV_DIR.mkdir(exist_ok=True)
+CRASH_DIR = LOG_ROOT / "crash"
 
 CTRL_DIR = pathlib.Path("ctrl"); 
 CTRL_DIR.mkdir(exist_ok=True)
-EPOCH_FILE = CTRL_DIR / "epoch"
-RESET_REQ_DIR = CTRL_DIR / "reset_requests"; 
-RESET_REQ_DIR.mkdir(exist_ok=True)
-RESET_PENDING_FILE = CTRL_DIR / "reset_pending"
+# +++ Core + gNB instances (instance_helper); instance 0 keeps ctrl/epoch, ctrl/reset_requests, ctrl/reset_pending
+INSTS = [CoreInstance(k) for k in range(INSTANCES)]
+for _inst in INSTS:
+    _inst.reset_req_dir.mkdir(parents=True, exist_ok=True)
+
+MCTS_SHARED = PARALLEL and int(config.get('MCTS_SHARED', 0))
+MCTS_SHARED_PORT = int(config.get('MCTS_SHARED_PORT', 47000))
+MCTS_SHARED_DIR = LOG_ROOT / "mcts_shared"
+MCTS_MGR = None
+MCTS_AUTHKEY = None               # drawn per campaign, workers read it from ctrl/mcts_authkey
+FSM_MERGE = PARALLEL and int(config.get('FSM_MERGE', 0))
+METRICS_ROUNDS_CSV = LOG_ROOT / "metrics_rounds.csv"
+METRICS_PORT = int(config.get('METRICS_PORT', 0))
+METRICS_TEXTFILE = LOG_ROOT / "metrics.prom"
+PLACEMENT = None                  # role -> CPUs, see placement_helper
+PLACEMENT_LOG = LOG_ROOT / "placement.jsonl"
+MASTER_STATS = {"start": time.time(), "round": 0, "full_resets": 0, "worker_restarts": 0}
+WATCHDOG = int(config.get('WATCHDOG', 1))
+WATCHDOG_LOG = LOG_ROOT / "watchdog.jsonl"
+EXPORTER = None
+PROFILE = None
+COLLECTOR = RoundCollector()
+GCOV_STAGE_DIR = GCOV_DIR / "stage"
+EXPORT_HW = {}          # wid -> _id of the last document of a finished export
+EXPORT_PENDING = {}     # wid -> _id bound of the export still running
+EXPORT_LOCK = threading.Lock()  # export_done runs on the collector's callback thread
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--profile', nargs='?', const='sample', default=None, choices=PROFILE_MODES,
+                    help='run every worker with --profile; SIGUSR1 to the master is forwarded to the workers')
+parser.add_argument('--resume', action='store_true',
+                    help='continue the campaign in logs/campaign.json: keep the collections and .gcda counters, restore the worker checkpoints')
 
 def spawn_worker(wid:int):
     worker_logs_dir = LOG_ROOT / pathlib.Path(f"worker_{wid}") / pathlib.Path('logs')
@@ -33,21 +72,26 @@ def spawn_worker(wid:int):
     env = os.environ.copy()
     env["COREFUZZER_WID"] = str(wid)
     # return subprocess.Popen(['python3', 'core_fuzzer.py', '--wid', str(wid)], env=env, start_new_session=True)
-    return subprocess.Popen(['python3', 'core_fuzzer.py', '--wid', str(wid)],
-                            stdout=worker_log, stderr=worker_log, text=True, start_new_session=True)
+    cmd = ['python3', 'core_fuzzer.py', '--wid', str(wid)]
+    if PROFILE:
+        cmd += ['--profile', PROFILE]
+    proc = subprocess.Popen(cmd, stdout=worker_log, stderr=worker_log, text=True, start_new_session=True)
+    # +++ the worker's nr-ue processes inherit its CPUs
+    place(f"w{wid}", proc.pid)
+    return proc
 
 def collect_gcov(round_tag:str):
+    # +++ flush the running NFs, stage their .gcda files and capture in the background
     info_file = f"{GCOV_DIR}/app_{round_tag}.info"
     coverage_file = f"{GCOV_DIR}/coverage_{round_tag}.info"
-    with open(coverage_file, "w") as f:
-        subprocess.run([
-            'lcov',
-            '--directory', str(OPEN5GS),
-            '--capture',
-            '--output-file', str(info_file),
-            '--rc', 'lcov_branch_coverage=1',
-            '--ignore-errors', 'branch,callback,child,corrupt,count,deprecated,empty,excessive,fork,format,gcov,graph,internal,mismatch,missing,negative,package,parallel,parent,range,source,unsupported,unused,usage,utility,version'
-        ], stdout=f, stderr=subprocess.STDOUT, check=True)
+    nf_pids = [pid for name in ("open5gs-amfd", "open5gs-smfd") for pid in pgrep_all(name)]
+    gcov_flush_by_signal(nf_pids, timeout=1.0, settle=0.1)
+    stage = GCOV_STAGE_DIR / round_tag
+    n = snapshot_gcda(OPEN5GS, stage)
+    if not n:
+        print(f"[MASTER] no .gcda files under {OPEN5GS} for round {round_tag}")
+        return
+    COLLECTOR.submit(f"gcov {round_tag}", lcov_snapshot, stage, info_file, coverage_file)
 
 def collect_outputs(wid:int, round_tag:str):
     wdir   = LOG_ROOT / pathlib.Path(f'worker_{wid}')
@@ -59,12 +103,196 @@ def collect_outputs(wid:int, round_tag:str):
         if src.exists():
             shutil.copy(src, outdir / name)
 
-    subprocess.run([
-        'mongoexport',
-        f'--db=CoreFuzzer',
-        f'--collection={config["DB_NAME"]}_w{wid}',
-        f'--out={outdir}/db.json'
-    ], check=True)
+    # profiles of this round move with the round, the next round starts a fresh directory
+    prof = wdir / "profile"
+    if prof.is_dir():
+        dst = outdir / "profile"
+        if dst.exists():
+            shutil.rmtree(dst)
+        shutil.move(str(prof), str(dst))
+        COLLECTOR.submit(f"profile w{wid} {round_tag}", summarize_profile_dir, dst)
+
+    # only what was inserted since the previous round; the newest _id bounds it
+    # while the next round keeps writing
+    upto = last_doc_id(wid)
+    with EXPORT_LOCK:
+        running, since = wid in EXPORT_PENDING, EXPORT_HW.get(wid)
+        if not running and upto is not None and upto != since:
+            EXPORT_PENDING[wid] = upto
+    if running:
+        # the next round's export starts where the running one ends once it succeeds
+        print(f"[MASTER] db w{wid} {round_tag}: previous export still running, documents move to the next round")
+    elif upto is not None and upto != since:
+        fut = COLLECTOR.submit(f"db w{wid} {round_tag}", export_increment, 'CoreFuzzer', f'{config["DB_NAME"]}_w{wid}',
+                               outdir, since, upto)
+        fut.add_done_callback(lambda f, wid=wid, upto=upto: export_done(wid, upto, f))
+
+def export_done(wid:int, upto:str, fut):
+    # a failed export leaves the mark where it was, the next round exports the range again
+    ok = not fut.cancelled() and fut.exception() is None
+    with EXPORT_LOCK:
+        EXPORT_PENDING.pop(wid, None)
+        if ok:
+            EXPORT_HW[wid] = upto
+
+def wait_workers(procs, timeout:float=5.0) -> list:
+    # one deadline for all workers instead of timeout seconds per worker; workers still running
+    # after it are killed, a late one would rewrite its save files under collect/merge/checkpoint
+    deadline = time.monotonic() + timeout
+    killed = []
+    for wid, p in enumerate(procs):
+        try:
+            p.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+            killed.append(wid)
+    return killed
+
+def collect_metrics(round_tag:str, round_start:float):
+    snaps = []
+    for wid in range(N_WORKERS):
+        snap = last_snapshot(LOG_ROOT / f"worker_{wid}" / "metrics.jsonl", since=round_start)
+        if snap is not None:
+            snaps.append(snap)
+    if not snaps:
+        print(f"[MASTER] no worker metrics for round {round_tag}")
+        return None
+    agg = aggregate_snapshots(snaps)
+    append_csv_row(METRICS_ROUNDS_CSV, {"round": round_tag, "ts": time.time(), **agg})
+    append_jsonl(PLACEMENT_LOG, {"round": round_tag, "ts": time.time(), "pinned": PLACEMENT is not None,
+                                 "workers": N_WORKERS, "instances": INSTANCES, "recvs": agg["recvs"],
+                                 "recv_timeouts": agg["recv_timeouts"], "timeout_rate": agg["timeout_rate"],
+                                 "execs": agg["execs"], "align_rate": agg["align_rate"]})
+    print(f"[MASTER] round {round_tag}: execs={agg['execs']} ({agg['execs_per_sec']:.2f}/s) "
+          f"align={agg['align_rate']:.1%} timeouts={agg['timeout_rate']:.1%} "
+          f"resets/h={agg['resets_per_hour']:.1f} crashes={agg['crashes']}")
+    if agg["null_waits"]:
+        print(f"[MASTER] round {round_tag}: {agg['null_waits']:.0f} null responses waited {agg['null_wait_sec']:.1f}s, "
+              f"{agg['null_saved_sec']:.1f}s saved by adaptive timeouts")
+    return agg
+
+def collect_crashes(round_tag:str, round_start:float):
+    buckets = crash_index(CRASH_DIR)
+    if not buckets:
+        return
+    write_json_atomic(CRASH_DIR / "index.json", buckets)
+    new = [b for b in buckets if (b["first_ts"] or 0) >= round_start]
+    hits = sum(b["hits"] for b in buckets)
+    print(f"[MASTER] round {round_tag}: {len(new)} new crash buckets, {len(buckets)} total, {hits} crashes")
+    for b in new:
+        print(f"[MASTER]   {b['bucket']} x{b['hits']} {b['reason']} {b['location']} "
+              f"({b['state']}/{b['send_type']})")
+
+def setup_placement():
+    # pins the master first: tcpdump, the collection pool and 5gc inherit its CPUs until re-pinned
+    global PLACEMENT
+    if not PIN_CPUS:
+        return
+    mongod = pids_of("mongod") if PIN_MONGO else []
+    cores = cpu_topology()
+    PLACEMENT = plan_placement(cores, N_WORKERS, INSTANCES, mongo=bool(mongod))
+    if PLACEMENT is None:
+        print(f"[MASTER] placement: {len(cores)} cores are too few for {N_WORKERS} workers, not pinning")
+        return
+    for role, cpus in PLACEMENT.items():
+        print(f"[MASTER] placement: {role:>6} -> cpus {format_cpulist(cpus)}")
+    os.sched_setaffinity(0, PLACEMENT["master"])
+    for pid in mongod:
+        place("mongo", pid)
+
+def place(role:str, pid:int):
+    if PLACEMENT is not None:
+        pin(pid, PLACEMENT[role])
+
+def place_instance(k:int = 0):
+    # the NFs spawned by 5gc and the gNB of instance k
+    if PLACEMENT is None:
+        return
+    for pid, comm in group_pids(core_pattern(INSTS[k])):
+        place(nf_role(comm, k), pid)
+    for pid, _ in group_pids(gnb_pattern(INSTS[k])):
+        place(f"gnb{k}", pid)
+
+def placement_report():
+    # recv timeout rate of the rounds with and without placement, over every campaign in the log
+    try:
+        with open(PLACEMENT_LOG, "r") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return
+    for mode, m in sorted(timeout_summary(rows).items()):
+        print(f"[MASTER] {mode}: {m['rounds']} rounds, {m['recv_timeouts']}/{m['recvs']} "
+              f"responses timed out ({m['timeout_rate']:.2%})")
+
+def master_metrics():
+    # collected on every scrape: live worker snapshots plus master gauges
+    snaps = {wid: read_json(LOG_ROOT / f"worker_{wid}" / "metrics_live.json") for wid in range(N_WORKERS)}
+    master = {"epoch": read_epoch(), "round": MASTER_STATS["round"], "full_resets": MASTER_STATS["full_resets"],
+              "worker_restarts": MASTER_STATS["worker_restarts"], "workers": N_WORKERS,
+              "uptime_seconds": round(time.time() - MASTER_STATS["start"], 1)}
+    alive = {wid: wid < len(PROCS) and PROCS[wid].poll() is None for wid in range(N_WORKERS)}
+    return snaps, master, alive
+
+def start_metrics_exporter():
+    global EXPORTER
+    EXPORTER = MetricsExporter(master_metrics, port=METRICS_PORT, textfile=str(METRICS_TEXTFILE))
+    EXPORTER.start()
+    if METRICS_PORT:
+        print(f"[MASTER] metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+
+def stop_metrics_exporter():
+    global EXPORTER
+    if EXPORTER is not None:
+        EXPORTER.stop()
+        EXPORTER = None
+
+def start_shared_mcts():
+    global MCTS_MGR, MCTS_AUTHKEY
+    MCTS_SHARED_DIR.mkdir(exist_ok=True)
+    MCTS_AUTHKEY = new_authkey(CTRL_DIR / "mcts_authkey")
+    MCTS_MGR = start_mcts_service(("127.0.0.1", MCTS_SHARED_PORT), MCTS_AUTHKEY,
+                                  log_path=str(LOG_ROOT / "mcts_service.log"),
+                                  select_mode=config.get('MCTS_SELECT_MODE', 'reward'),
+                                  max_nodes=int(config.get('MCTS_MAX_NODES', 0)),
+                                  transposition=bool(int(config.get('MCTS_TRANSPOSITION', 0))),
+                                  tt_bucket=int(config.get('MCTS_TT_BUCKET', 4)),
+                                  virtual_loss=int(config.get('MCTS_VIRTUAL_LOSS', 1)),
+                                  cov_reward=float(config.get('GCDA_REWARD', 0.6)) if int(config.get('GCDA_COV', 0)) else 0.0)
+    print(f"[MASTER] shared MCTS service on 127.0.0.1:{MCTS_SHARED_PORT}")
+
+def save_shared_mcts(round_tag:str) -> dict:
+    saved = {}
+    if MCTS_MGR is None:
+        return saved
+    try:
+        svc = connect_mcts_service(("127.0.0.1", MCTS_SHARED_PORT), MCTS_AUTHKEY, timeout=5)
+        for name in svc.names():
+            data = json.dumps(svc.to_dict(name, ""))
+            path = MCTS_SHARED_DIR / f"savedMCTS_{name}_{round_tag}.json"
+            path.write_text(data)
+            saved[name] = str(path)
+        print(f"[MASTER] shared MCTS saved: {svc.stats()}")
+    except Exception as e:
+        print(f"[MASTER] shared MCTS save failed: {e}")
+    return saved
+
+# +++ 
+def load_shared_mcts(saved:dict):
+    try:
+        svc = connect_mcts_service(("127.0.0.1", MCTS_SHARED_PORT), MCTS_AUTHKEY, timeout=5)
+        for name, path in saved.items():
+            svc.load(name, "", json.loads(pathlib.Path(path).read_text()))
+        print(f"[MASTER] shared MCTS restored: {svc.stats()}")
+    except Exception as e:
+        print(f"[MASTER] shared MCTS restore failed: {e}")
+
+def stop_shared_mcts():
+    global MCTS_MGR
+    if MCTS_MGR is not None:
+        try: MCTS_MGR.shutdown()
+        except Exception: pass
+        MCTS_MGR = None
 
 tcpdump_proc = None
 def start_pcap():
@@ -83,36 +311,43 @@ def stop_pcap():
         tcpdump_proc.wait()
 
 CURRENT_EPOCH = 0
-def write_epoch(n:int):
-    EPOCH_FILE.write_text(str(n))
+def write_epoch(n:int, k:int = 0):
+    INSTS[k].epoch_file.write_text(str(n))
 
-def read_epoch()->int:
-    try: return int(EPOCH_FILE.read_text().strip())
+def read_epoch(k:int = 0)->int:
+    try: return int(INSTS[k].epoch_file.read_text().strip())
     except: return 0
 
-def clear_reset_requests():
-    for f in RESET_REQ_DIR.glob("*.req"):
+def clear_reset_requests(k:int = 0):
+    for f in INSTS[k].reset_req_dir.glob("*.req"):
         try: f.unlink()
         except: pass
 
 def reset_epoch_files():
-    try:
-        EPOCH_FILE.write_text("0")
-    except Exception:
-        pass
-    if RESET_PENDING_FILE.exists():
-        try: RESET_PENDING_FILE.unlink()
-        except: pass
-    clear_reset_requests()
-
-def wait_nf_procs(names, timeout=30):
+    for inst in INSTS:
+        try:
+            inst.epoch_file.write_text("0")
+        except Exception:
+            pass
+        if inst.reset_pending_file.exists():
+            try: inst.reset_pending_file.unlink()
+            except: pass
+        clear_reset_requests(inst.k)
+    # incident markers are keyed by epoch, which starts over here
+    shutil.rmtree(CRASH_DIR / "seen", ignore_errors=True)
+
+def wait_nf_procs(names, timeout=30, k:int = 0):
     t0 = time.time()
     while time.time() - t0 < timeout:
         try:
-            out = subprocess.check_output(["ps", "-eo", "comm"], text=True)
+            if INSTANCES > 1:
+                # the NFs of this instance, spawned into the process group of its 5gc
+                lines = group_commands(core_pattern(INSTS[k]))
+            else:
+                lines = subprocess.check_output(["ps", "-eo", "comm"], text=True).splitlines()
         except Exception:
             time.sleep(0.5); continue
-        ok = all(any(n == line.strip() for line in out.splitlines()) for n in names)
+        ok = all(any(n == line.strip() for line in lines) for n in names)
         if ok:
             print("Core start done")
             return True
@@ -121,8 +356,8 @@ def wait_nf_procs(names, timeout=30):
     return False
 
 
-def health_check(timeout=10)->bool:
-    gnb_log_path = LOG_ROOT / "gnb.log"
+def health_check(timeout=10, k:int = 0)->bool:
+    gnb_log_path = INSTS[k].gnb_log
     success_message = "NG Setup procedure is successful"
 
     print("[MASTER] Health Check: Verifying gNB connection to AMF...")
@@ -145,47 +380,132 @@ def health_check(timeout=10)->bool:
     print("[MASTER] Health Check FAILED: Timed out waiting for gNB to connect.")
     return False
 
-def do_full_reset()->int:
-    print("[MASTER] Full reset: restarting Core & gNB")
-    RESET_PENDING_FILE.write_text(str(int(time.time())))
+def do_full_reset(k:int = 0)->int:
+    # restarts Core & gNB of instance k; only the workers on it wait
+    inst = INSTS[k]
+    name = f" instance {k}" if INSTANCES > 1 else ""
+    print(f"[MASTER] Full reset{name}: restarting Core & gNB")
+    inst.reset_pending_file.write_text(str(int(time.time())))
     time.sleep(1.0)
 
-    tag = f"epoch{read_epoch()}"
+    tag = f"epoch{read_epoch(k)}"
 
-    killUE_all()
+    killUE_all(inst)
 
-    killGNB()
-    killCore()
+    killGNB(inst)
+    killCore(inst)
     time.sleep(0.5)
-    startCore(); 
-    if not wait_nf_procs(['open5gs-amfd','open5gs-smfd'], timeout=10):
-        print("[MASTER] WARN: AMF/SMF not detected in time")
+    startCore(inst); 
+    if not wait_nf_procs(['open5gs-amfd','open5gs-smfd'], timeout=10, k=k):
+        print(f"[MASTER] WARN: AMF/SMF{name} not detected in time")
     time.sleep(10)
-    startGNB();  
+    startGNB(inst);  
     time.sleep(3)
-    ok = health_check(timeout=10)
+    ok = health_check(timeout=10, k=k)
     if not ok:
-        print("[MASTER] WARN: gNB health_check failed, continue anyway")
-
-    CURRENT_EPOCH = read_epoch() + 1
-    write_epoch(CURRENT_EPOCH)
-    if RESET_PENDING_FILE.exists():
-        try: RESET_PENDING_FILE.unlink()
+        print(f"[MASTER] WARN: gNB{name} health_check failed, continue anyway")
+    place_instance(k)
+
+    CURRENT_EPOCH = read_epoch(k) + 1
+    write_epoch(CURRENT_EPOCH, k)
+    MASTER_STATS["full_resets"] += 1
+    if inst.reset_pending_file.exists():
+        try: inst.reset_pending_file.unlink()
         except: pass
-    clear_reset_requests()
-    print(f"[MASTER] Full reset done. epoch={CURRENT_EPOCH}")
+    clear_reset_requests(k)
+    print(f"[MASTER] Full reset{name} done. epoch={CURRENT_EPOCH}")
     return CURRENT_EPOCH
 
-def reset_watcher(stop_event:threading.Event):
+def do_full_reset_all():
+    if INSTANCES == 1:
+        do_full_reset()
+        return
+    threads = [threading.Thread(target=do_full_reset, args=(k,), daemon=True) for k in range(INSTANCES)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+def setup_instances():
+    # generated configs and subscriber copies of instances 1..K-1
+    if INSTANCES == 1:
+        return
+    for inst in INSTS:
+        write_instance_configs(inst)
+        n = provision_subscribers(inst, client)
+        print(f"[MASTER] instance {inst.k}: {inst.core_cfg}, db {inst.db_name} ({n} subscribers), "
+              f"workers {[w for w in range(N_WORKERS) if worker_instance(w) == inst.k]}")
+
+def reset_watcher(stop_event:threading.Event, k:int = 0):
+    reqs = INSTS[k].reset_req_dir
     while not stop_event.is_set():
-        if any(RESET_REQ_DIR.glob("*.req")):
-            print("found reset_request, do full reset")
-            do_full_reset()
+        if any(reqs.glob("*.req")):
+            print(f"found reset_request{f' on instance {k}' if INSTANCES > 1 else ''}, do full reset")
+            do_full_reset(k)
         stop_event.wait(0.2)
 
 PROCS = []
+ROUND_STOP = None
+# +++ 
+def restart_worker(wid:int, reason:str, hb, round_tag:str):
+    # stop the worker (SIGINT lets it save), fall back to its last checkpoint if the save files are torn
+    p = PROCS[wid]
+    if p.poll() is None:
+        try: p.send_signal(signal.SIGINT)
+        except ProcessLookupError: pass
+        try:
+            p.wait(timeout=HB_GRACE)
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+            # its nr-ue processes run in their own sessions and keep the command ports and IMSIs
+            n = stop_groups(worker_ue_pattern(UE_PORT_BASE + wid * 100), timeout=2)
+            print(f"[MASTER] watchdog: worker {wid} killed, {n} orphaned UEs stopped")
+    wdir = LOG_ROOT / f"worker_{wid}"
+    restored = 0
+    if not save_files_ok(wdir):
+        restored = restore_worker_checkpoint(wdir, wdir / CHECKPOINT_DIR)
+    clear_heartbeat(wid)
+    PROCS[wid] = spawn_worker(wid)
+    MASTER_STATS["worker_restarts"] += 1
+    print(f"[MASTER] watchdog: worker {wid} restarted ({reason})")
+    append_jsonl(WATCHDOG_LOG, {"ts": time.time(), "round": round_tag, "wid": wid, "reason": reason,
+                                "exit_code": p.returncode, "phase": hb["phase"] if hb else None,
+                                "episodes": hb["episodes"] if hb else None,
+                                "checkpoint_files": restored, "new_pid": PROCS[wid].pid})
+
+def watchdog(stop_event:threading.Event, round_tag:str):
+    watch = {wid: WorkerWatch(p.pid, time.time()) for wid, p in enumerate(PROCS)}
+    restarts = dict.fromkeys(watch, 0)
+    while not stop_event.wait(1.0):
+        resetting = [inst.reset_pending_file.exists() for inst in INSTS]
+        for wid, p in enumerate(list(PROCS)):
+            if restarts[wid] > HB_MAX_RESTARTS:
+                continue
+            hb = read_heartbeat(wid)
+            reason = watch[wid].check(hb, p.poll(), time.time(), resetting[worker_instance(wid)])
+            if reason is None or stop_event.is_set():
+                continue
+            restarts[wid] += 1
+            if restarts[wid] > HB_MAX_RESTARTS:
+                print(f"[MASTER] watchdog: worker {wid} {reason}, {HB_MAX_RESTARTS} restarts this round, giving up")
+                append_jsonl(WATCHDOG_LOG, {"ts": time.time(), "round": round_tag, "wid": wid,
+                                            "reason": f"{reason}, gave up", "exit_code": p.poll()})
+                continue
+            restart_worker(wid, reason, hb, round_tag)
+            watch[wid] = WorkerWatch(PROCS[wid].pid, time.time())
+
+def forward_profile_signal(signum, frame):
+    # SIGUSR1: tracemalloc start / snapshot in every running worker
+    for p in list(PROCS):
+        if p.poll() is None:
+            try: p.send_signal(signal.SIGUSR1)
+            except ProcessLookupError: pass
+    print(f"[MASTER] SIGUSR1 forwarded to {len(PROCS)} workers")
+
 def master_exit_handler(signum, frame):
     print("\n[MASTER] Ctrl+C received, stopping fuzz...")
+    if ROUND_STOP is not None:
+        # the watchdog must not bring the stopped workers back
+        ROUND_STOP.set()
     stop_pcap()
     print("[MASTER] Stopping worker processes...")
     for p in list(PROCS):
@@ -218,54 +538,159 @@ def master_exit_handler(signum, frame):
             pass
 
 
+    COLLECTOR.close(wait=True)
+    save_shared_mcts("exit")
+    stop_shared_mcts()
+    stop_metrics_exporter()
     killGNB()
     killCore()
     reset_epoch_files()
     sys.exit(0)
 
+# +++ campaign progress, see campaign_helper
+def new_campaign() -> dict:
+    return {"started": time.time(), "hours_total": HOURS_TOTAL, "slots_per_hour": SLOTS_PER_HOUR,
+            "next": [0, 0], "epoch": 0, "epochs": {}, "rounds": 0, "full_resets": 0,
+            "workers": {}, "shared_mcts": {}, "export_hw": {}}
+
+def resume_campaign(campaign:dict):
+    # workers of the crashed master may still be running and rewriting their save files
+    stale = pgrep_all("core_fuzzer.py --wid")
+    for pid in stale:
+        try: os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError: pass
+    for wid, w in campaign["workers"].items():
+        n = restore_worker_checkpoint(LOG_ROOT / f"worker_{wid}", w["checkpoint"])
+        print(f"[MASTER] worker {wid}: {n} checkpoint files of round {w['round']} restored")
+    epochs = campaign.get("epochs") or {"0": campaign["epoch"]}
+    for inst in INSTS:
+        write_epoch(epochs.get(str(inst.k), 0), inst.k)
+        if inst.reset_pending_file.exists():
+            inst.reset_pending_file.unlink()
+        clear_reset_requests(inst.k)
+    # markers of epochs after the checkpoint would swallow the new crashes of the replayed epochs
+    shutil.rmtree(CRASH_DIR / "seen", ignore_errors=True)
+    EXPORT_HW.update({int(wid): oid for wid, oid in campaign["export_hw"].items()})
+    MASTER_STATS["round"] = campaign["rounds"]
+    MASTER_STATS["full_resets"] = campaign["full_resets"]
+    hour, slot = campaign["next"]
+    print(f"[MASTER] resuming at round {hour:02d}_{slot}, epoch {campaign['epoch']}"
+          f"{f', killed {len(stale)} stale workers' if stale else ''}")
+
+def checkpoint_campaign(campaign:dict, hour:int, slot:int, round_tag:str, shared:dict):
+    nxt = hour * SLOTS_PER_HOUR + slot + 1
+    campaign["next"] = [nxt // SLOTS_PER_HOUR, nxt % SLOTS_PER_HOUR]
+    for wid in range(N_WORKERS):
+        ckpt = save_worker_checkpoint(LOG_ROOT / f"worker_{wid}")
+        if ckpt is None:
+            # keep the previous one, the next round starts from it on resume
+            print(f"[MASTER] worker {wid}: no consistent checkpoint after round {round_tag}")
+            continue
+        campaign["workers"][str(wid)] = {"checkpoint": ckpt, "round": round_tag}
+    if shared:
+        campaign["shared_mcts"] = shared
+    campaign["epoch"] = read_epoch()
+    campaign["epochs"] = {str(inst.k): read_epoch(inst.k) for inst in INSTS}
+    campaign["rounds"] = MASTER_STATS["round"]
+    campaign["full_resets"] = MASTER_STATS["full_resets"]
+    with EXPORT_LOCK:
+        campaign["export_hw"] = {str(wid): oid for wid, oid in EXPORT_HW.items()}
+    save_campaign(campaign)
+
 def main():
+    global PROFILE, ROUND_STOP
+    args = parser.parse_args()
+    PROFILE = args.profile
     signal.signal(signal.SIGINT, master_exit_handler)
-    if OPEN5GS:
-        os.system(f"lcov --directory {OPEN5GS} --zerocounters")
-    for w in range(N_WORKERS):
-        clear_db_col(w)
-
-    reset_epoch_files()
-    do_full_reset()
+    if PROFILE:
+        signal.signal(signal.SIGUSR1, forward_profile_signal)
+    campaign = load_campaign() if args.resume else None
+    if args.resume and campaign is None:
+        print("[MASTER] --resume: no campaign to resume, starting a new one")
+    if campaign is None:
+        if OPEN5GS:
+            os.system(f"lcov --directory {OPEN5GS} --zerocounters")
+        for w in range(N_WORKERS):
+            clear_db_col(w)
+        clear_pool_col()
+        reset_epoch_files()
+        campaign = new_campaign()
+    else:
+        resume_campaign(campaign)
+    start = tuple(campaign["next"])
+
+    setup_placement()
+    if int(config.get('GCOV_PRELOAD', 1)) and OPEN5GS:
+        build_gcov_shim()
+    setup_instances()
+    do_full_reset_all()
+    if MCTS_SHARED:
+        start_shared_mcts()
+        if campaign["shared_mcts"]:
+            load_shared_mcts(campaign["shared_mcts"])
+    start_metrics_exporter()
 
     start_pcap()
     if PARALLEL: 
         for hour in range(HOURS_TOTAL):
             for slot in range(SLOTS_PER_HOUR):
+                if (hour, slot) < start:
+                    continue
                 tag = f"{hour:02d}_{slot}"   
 
                 stop_evt = threading.Event()
-                watcher = threading.Thread(target=reset_watcher, args=(stop_evt,), daemon=True)
-                watcher.start()
+                ROUND_STOP = stop_evt
+                watchers = [threading.Thread(target=reset_watcher, args=(stop_evt, k), daemon=True)
+                            for k in range(INSTANCES)]
+                for watcher in watchers:
+                    watcher.start()
 
                 global PROCS
+                round_start = time.time()
+                MASTER_STATS["round"] += 1
                 PROCS = [spawn_worker(w) for w in range(N_WORKERS)]
                 print(f"[+] Round {tag} started with {N_WORKERS} workers")
+                dog = None
+                if WATCHDOG:
+                    dog = threading.Thread(target=watchdog, args=(stop_evt, tag), name="watchdog", daemon=True)
+                    dog.start()
                 time.sleep(ROUND_SEC)
 
                 stop_evt.set()
-                watcher.join(timeout=2)
+                for watcher in watchers:
+                    watcher.join(timeout=2)
+                if dog is not None:
+                    # a restart in progress finishes before the workers are stopped
+                    dog.join(timeout=HB_GRACE + 5)
 
                 for p in PROCS:
                     p.send_signal(signal.SIGINT)
-                for wid,p in enumerate(PROCS):
-                    try:
-                        p.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        pass
+                for wid in wait_workers(PROCS, timeout=5):
+                    wdir = LOG_ROOT / f"worker_{wid}"
+                    restored = 0 if save_files_ok(wdir) else restore_worker_checkpoint(wdir, wdir / CHECKPOINT_DIR)
+                    print(f"[MASTER] worker {wid} did not stop in time, killed ({restored} checkpoint files restored)")
+                for wid in range(N_WORKERS):
                     collect_outputs(wid, tag)
                 collect_gcov(tag)
+                shared = save_shared_mcts(tag)
+                collect_metrics(tag, round_start)
+                collect_crashes(tag, round_start)
+                if FSM_MERGE:
+                    try:
+                        merge_worker_fsms(range(N_WORKERS), tag)
+                    except Exception as e:
+                        print(f"[MASTER] FSM merge failed: {e}")
                 PROCS = []
-                do_full_reset()
-                print(f"[+] {tag} finished, data stored.")
+                checkpoint_campaign(campaign, hour, slot, tag, shared)
+                do_full_reset_all()
+                print(f"[+] {tag} finished, {COLLECTOR.pending()} collection jobs in background")
+        COLLECTOR.close(wait=True)
+        stop_shared_mcts()
+        stop_metrics_exporter()
         killGNB()
         killCore()
         reset_epoch_files()
+        placement_report()
         time.sleep(0.5)
     stop_pcap()   
 
@@ -1,8 +1,10 @@
 from dotenv import dotenv_values
-import os, subprocess, time, pathlib, signal
+import os, subprocess, time, pathlib, signal, logging
+from instance_helper import INSTANCES, BASE_UE_CFG, stop_groups, core_pattern, gnb_pattern, ue_pattern
 # helper functions for start and kill the components
 
 config = dotenv_values(".env")
+log = logging.getLogger("pascofuzz.setup")
 IMSI_OFFSET = 0
 MAX_IMSI_OFFSET = 98
 
@@ -14,13 +16,17 @@ IMSI_BASE   = 999700000000001
 UE_PROC  = None
 UE2_PROC = None
 UE3_PROC = None
+UE_CFG   = BASE_UE_CFG
+GNB_NAME = "UERANSIM-gnb-999-70-1"
 
 # +++ 
-def init_setup_path(port_base:int, imsi_base:int, logdir:str):
-    global PORT_BASE, IMSI_BASE, WID_LOG_DIR
+def init_setup_path(port_base:int, imsi_base:int, logdir:str, ue_cfg:str = BASE_UE_CFG, gnb_name:str = GNB_NAME):
+    global PORT_BASE, IMSI_BASE, WID_LOG_DIR, UE_CFG, GNB_NAME
     PORT_BASE  = port_base
     IMSI_BASE  = imsi_base
     WID_LOG_DIR = pathlib.Path(logdir)
+    UE_CFG = ue_cfg
+    GNB_NAME = gnb_name
 
 def setOffset(new_offset:int):
     global IMSI_OFFSET
@@ -30,15 +36,21 @@ def getOffset():
     global IMSI_OFFSET
     return IMSI_OFFSET
 
-def startCore():
-    with open("./logs/core.log", "w") as out:
-        cfg = os.path.join(config["OPEN5GS_PATH"], "build", "configs", "sample.yaml")
+def startCore(inst=None):
+    # inst: instance_helper.CoreInstance, None for the stock config
+    with open(inst.core_log if inst else "./logs/core.log", "w") as out:
+        cfg = inst.core_cfg if inst else os.path.join(config["OPEN5GS_PATH"], "build", "configs", "sample.yaml")
+        env = os.environ.copy()
+        # +++ the NFs inherit the gcov flush shim from 5gc (lcov_helper.gcov_flush_by_signal)
+        shim = pathlib.Path(config.get('GCOV_SHIM', 'gcov_flush/libgcovflush.so')).resolve()
+        if int(config.get('GCOV_PRELOAD', 1)) and shim.is_file():
+            env["LD_PRELOAD"] = " ".join(filter(None, [env.get("LD_PRELOAD"), str(shim)]))
         subprocess.Popen(args=["5gc", "-c", cfg], stdout=out, stderr=out, 
-                         start_new_session=True)
+                         start_new_session=True, env=env)
 
-def startGNB():
-    with open("./logs/gnb.log", "w") as out:
-        cfg = os.path.join(config["UERANSIM_PATH"], "config", "open5gs-gnb.yaml")
+def startGNB(inst=None):
+    with open(inst.gnb_log if inst else "./logs/gnb.log", "w") as out:
+        cfg = inst.gnb_cfg if inst else os.path.join(config["UERANSIM_PATH"], "config", "open5gs-gnb.yaml")
         subprocess.Popen(args=["nr-gnb", "-c", cfg], stdout=out, stderr=out, 
                          start_new_session=True)
 
@@ -52,9 +64,9 @@ def startGNB():
 def startUE():
     global UE_PROC
     with open(WID_LOG_DIR / "ue.log", "w") as out:
-        cfg  = os.path.join(config["UERANSIM_PATH"], "config", "open5gs-ue.yaml")
+        cfg  = UE_CFG
         imsi = f"imsi-{IMSI_BASE + IMSI_OFFSET}"
-        print("ue imsi:", imsi, "port:", PORT_BASE)
+        log.debug("ue imsi: %s port: %d", imsi, PORT_BASE)
         UE_PROC = subprocess.Popen(args=["nr-ue", "-c", cfg, "-i", imsi, "-p", str(PORT_BASE)],
                         stdout=out, stderr=out, start_new_session=True
         )
@@ -63,9 +75,9 @@ def startUE2():
     global IMSI_OFFSET, UE2_PROC
     IMSI_OFFSET += 1
     with open(WID_LOG_DIR / "ue2.log", "w") as out:
-        cfg = os.path.join(config["UERANSIM_PATH"], "config", "open5gs-ue.yaml")
+        cfg = UE_CFG
         imsi = f"imsi-{IMSI_BASE + IMSI_OFFSET}"
-        print("ue2 imsi:", imsi, "port:", PORT_BASE + 1)
+        log.debug("ue2 imsi: %s port: %d", imsi, PORT_BASE + 1)
         UE2_PROC = subprocess.Popen(args=["nr-ue", "-c", cfg, "-i", imsi, "-p", str(PORT_BASE + 1)], 
                         stdout=out, stderr=out, start_new_session=True)
         
@@ -73,13 +85,17 @@ def startUE3():
     global IMSI_OFFSET, UE3_PROC
     IMSI_OFFSET += 1
     with open(WID_LOG_DIR / "ue3.log", "w") as out:
-        cfg = os.path.join(config["UERANSIM_PATH"], "config", "open5gs-ue.yaml")
+        cfg = UE_CFG
         imsi = f"imsi-{IMSI_BASE + IMSI_OFFSET}"
-        print("ue3 imsi:", imsi, "port:", PORT_BASE + 2)
+        log.debug("ue3 imsi: %s port: %d", imsi, PORT_BASE + 2)
         UE3_PROC = subprocess.Popen(args=["nr-ue", "-c", cfg, "-i", imsi, "-p", str(PORT_BASE + 2)], 
                         stdout=out, stderr=out, start_new_session=True)
 
-def killCore():
+def killCore(inst=None):
+    if inst is not None and INSTANCES > 1:
+        # only this instance's 5gc and the NFs it spawned
+        stop_groups(core_pattern(inst))
+        return
     subprocess.run(["pkill", "-2", "-f", "5gc"], 
                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     proc = subprocess.run(["ps", "-ef"], encoding='utf-8', stdout=subprocess.PIPE)
@@ -90,11 +106,17 @@ def killCore():
         print(f"Killing pid {pid}")
         subprocess.run(["kill", "-2", pid])
 
-def killGNB():
+def killGNB(inst=None):
+    if inst is not None and INSTANCES > 1:
+        stop_groups(gnb_pattern(inst))
+        return
     subprocess.run(["pkill", "-2", "-f", "nr-gnb"],
                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-def killUE_all():
+def killUE_all(inst=None):
+    if inst is not None and INSTANCES > 1:
+        stop_groups(ue_pattern(inst), timeout=2.0)
+        return
     subprocess.run(["pkill", "-2", "-f", "nr-ue"], 
                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
@@ -104,7 +126,7 @@ def UE_Terminate(proc):
             proc.send_signal(signal.SIGINT)
             proc.wait(timeout=2)
         except subprocess.TimeoutExpired:
-            print(f"UE process {proc.pid} did not terminate gracefully, killing.")
+            log.warning("UE process %d did not terminate gracefully, killing.", proc.pid)
             proc.kill()
             proc.wait()
         except ProcessLookupError:
@@ -118,5 +140,5 @@ def killUE():
 
 
 def sendRRCRelease():
-    subprocess.Popen(args=["nr-cli", "UERANSIM-gnb-999-70-1", "--exec", "ue-release 1"])
+    subprocess.Popen(args=["nr-cli", GNB_NAME, "--exec", "ue-release 1"])
     time.sleep(0.25)
@@ -0,0 +1,81 @@
+# Corpus synchronization between workers
+# A daemon thread per worker promotes its interesting seeds into the global pool
+# and imports pool seeds for the states the worker is currently fuzzing; both
+# ways only for states every worker knows by the same name (shareable_state).
+# Every cycle is capped in documents and bytes, and cycles are spaced by
+# SYNC_INTERVAL, so sync never runs on the fuzzing hot path.
+import logging, threading, time
+from collections import deque
+from db_helper import promote_seeds, import_seeds
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+log = logging.getLogger("pascofuzz.sync")
+
+SYNC_INTERVAL = float(config.get('SYNC_INTERVAL', 30))          # seconds between cycles
+SYNC_MAX_DOCS = int(config.get('SYNC_MAX_DOCS', 200))           # promoted docs per cycle
+SYNC_IMPORT_DOCS = int(config.get('SYNC_IMPORT_DOCS', 20))      # imported docs per state per cycle
+SYNC_BYTES_PER_SEC = int(config.get('SYNC_BYTES_PER_SEC', 65536))
+SYNC_WANTED_STATES = 16
+
+def shareable_state(state: str, canonical: set | None = None) -> bool:
+    # learned H-states are named per worker, only share states every worker agrees on;
+    # with the FSM merge, H-states of the merged FSM the worker started from are canonical
+    return all(not part.startswith("H") or (canonical is not None and part in canonical)
+               for part in state.split(":"))
+
+class CorpusSync(threading.Thread):
+    def __init__(self, wid: int, interval: float = SYNC_INTERVAL, canonical: set | None = None):
+        super().__init__(name=f"corpus-sync-w{wid}", daemon=True)
+        self.wid = wid
+        self.canonical = canonical
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.wanted = deque(maxlen=SYNC_WANTED_STATES)
+        self.promote_ts = 0.0
+        self.import_ts = {}
+        self.stats = {"cycles": 0, "promoted": 0, "promote_dup": 0, "imported": 0,
+                      "import_dup": 0, "bytes": 0, "errors": 0}
+
+    def want(self, state: str):
+        # called from the fuzz loop, only touches an in-memory deque
+        if not shareable_state(state, self.canonical):
+            return
+        with self.lock:
+            if state in self.wanted:
+                self.wanted.remove(state)
+            self.wanted.append(state)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sync_once()
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.warning("sync failed: %s", e)
+
+    def sync_once(self):
+        budget = int(SYNC_BYTES_PER_SEC * self.interval)
+        new, dup, self.promote_ts, used = promote_seeds(self.wid, self.promote_ts, SYNC_MAX_DOCS, budget,
+                                                          keep=lambda s: shareable_state(s, self.canonical))
+        self.stats["promoted"] += new
+        self.stats["promote_dup"] += dup
+        budget -= used
+        with self.lock:
+            states = list(reversed(self.wanted))
+        for state in states:
+            if budget <= 0:
+                break
+            got, idup, last, used = import_seeds(self.wid, state, self.import_ts.get(state, 0.0),
+                                                 SYNC_IMPORT_DOCS, budget)
+            self.import_ts[state] = last
+            self.stats["imported"] += got
+            self.stats["import_dup"] += idup
+            budget -= used
+        self.stats["cycles"] += 1
+        self.stats["bytes"] += int(SYNC_BYTES_PER_SEC * self.interval) - budget
+        log.debug("sync cycle %s", self.stats)
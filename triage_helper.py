@@ -0,0 +1,169 @@
+# Crash triage: bucket crashes by signature instead of copying core.log
+# A signature is built from the incident lines crash_monitor finds: the
+# component, the assertion (or the first crash line with timestamps, addresses
+# and numbers masked), the reported file:line and the top backtrace frames.
+# Crashes are bucketed by the xxh64 of the signature. The first crash of a
+# bucket keeps a gzip'd window of core.log around the incident, the triggering
+# message and state; later crashes only append to the bucket's hits.jsonl.
+# Every worker scans the same core.log, so an incident is claimed once per
+# epoch through an O_EXCL marker and the other workers skip it.
+import gzip, json, os, pathlib, re, time, xxhash
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+CRASH_CONTEXT = int(config.get('CRASH_CONTEXT', 200))     # core.log lines kept before/after the incident
+CRASH_FRAMES = int(config.get('CRASH_FRAMES', 5))         # backtrace frames in the signature
+CRASH_GROUP_GAP = 64                                      # incidents closer than this are one crash
+
+_TS_RE = re.compile(r'^\s*\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2}(?:\.\d+)?:\s*')
+_LOC_RE = re.compile(r'\(([^()\s]+\.[ch]):(\d+)\)')
+_ASSERT_RE = re.compile(r"assertion\s+[`'\"](.+?)['\"]\s+failed", re.IGNORECASE)
+_BT_RE = re.compile(r'backtrace\(\) returned', re.IGNORECASE)
+# /path/libogscore.so.2(ogs_abort+0x2b) [0x7f..]  or  /path/open5gs-amfd(+0x1a2b3) [0x55..]
+_FRAME_RE = re.compile(r'([^\s()/]+)\(([\w.]*)\+(0x[0-9a-fA-F]+)\)')
+_HEX_RE = re.compile(r'0x[0-9a-fA-F]+')
+_NUM_RE = re.compile(r'\d+')
+_NOISE_FRAMES = ("ogs_abort", "abort", "raise", "__libc_start_main", "__libc_start_call_main",
+                 "_start", "ogs_log_backtrace", "ogs_assert_if_reached")
+
+def _normalize(text: str) -> str:
+    text = _TS_RE.sub('', text)
+    text = _LOC_RE.sub('', text)
+    text = _HEX_RE.sub('0x?', text)
+    return _NUM_RE.sub('N', text).strip()
+
+def group_incidents(incidents: list) -> list:
+    # one list of incidents per crash, split where the log has a gap
+    groups = []
+    for it in sorted(incidents, key=lambda x: x["line_no"]):
+        if groups and it["line_no"] - groups[-1][-1]["line_no"] <= CRASH_GROUP_GAP:
+            groups[-1].append(it)
+        else:
+            groups.append([it])
+    return groups
+
+def read_crash_window(core_log_path, group: list, context: int = CRASH_CONTEXT, n_frames: int = CRASH_FRAMES):
+    # one streaming pass: the context window and the frames after "backtrace() returned"
+    first, last = group[0]["line_no"], group[-1]["line_no"]
+    bt_lines = {it["line_no"] for it in group if _BT_RE.search(it["text"])}
+    lo, hi = max(1, first - context), last + context
+    window, frames = [], []
+    in_bt = False
+    with open(core_log_path, "r", encoding="utf-8", errors="ignore") as f:
+        for n, line in enumerate(f, 1):
+            if n < lo:
+                continue
+            if n > hi and not in_bt:
+                break
+            if n <= hi:
+                window.append(line)
+            if n in bt_lines:
+                in_bt = True
+                continue
+            if in_bt:
+                m = _FRAME_RE.search(line)
+                if not m:
+                    in_bt = False
+                    continue
+                binary, func, off = m.groups()
+                if func in _NOISE_FRAMES or binary.startswith(("libc.so", "libpthread")):
+                    continue
+                if len(frames) < n_frames:
+                    frames.append(func or f"{binary}+{off}")
+    return window, lo, frames
+
+def crash_signature(component: str, group: list, frames: list) -> dict:
+    reason, location = "", ""
+    for it in group:
+        if not reason:
+            m = _ASSERT_RE.search(it["text"])
+            if m:
+                reason = f"assert {m.group(1)}"
+        if not location and not _BT_RE.search(it["text"]):
+            m = _LOC_RE.search(it["text"])
+            if m:
+                location = f"{os.path.basename(m.group(1))}:{m.group(2)}"
+    if not reason:
+        first = next((it for it in group if not _BT_RE.search(it["text"])), group[0])
+        reason = _normalize(first["text"])
+    return {"component": component, "reason": reason, "location": location, "frames": frames}
+
+def signature_id(sig: dict) -> str:
+    return xxhash.xxh64(json.dumps(sig, sort_keys=True).encode()).hexdigest()
+
+class CrashTriage:
+    def __init__(self, crash_dir, wid: int, context: int = CRASH_CONTEXT, instance: int = 0):
+        self.wid = wid
+        self.instance = instance
+        self.context = context
+        self.bucket_dir = pathlib.Path(crash_dir) / "buckets"
+        self.seen_dir = pathlib.Path(crash_dir) / "seen"
+        self.bucket_dir.mkdir(parents=True, exist_ok=True)
+        self.seen_dir.mkdir(parents=True, exist_ok=True)
+
+    def _claim(self, epoch: int, component: str, line_no: int) -> bool:
+        # epochs and core.log line numbers are per core instance
+        scope = f"i{self.instance}_" if self.instance else ""
+        marker = self.seen_dir / f"{scope}e{epoch}_{component}_L{line_no}"
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def triage(self, component: str, incidents: list, core_log_path, epoch: int, trigger: dict) -> list:
+        # returns one {"bucket", "status", "dir", "signature"} per crash this worker claimed;
+        # status is "new" for the first crash of a bucket and "dup" afterwards
+        results = []
+        for group in group_incidents(incidents):
+            if not self._claim(epoch, component, group[0]["line_no"]):
+                continue
+            window, lo, frames = read_crash_window(core_log_path, group, self.context)
+            sig = crash_signature(component, group, frames)
+            bid = f"{component}_{signature_id(sig)}"
+            bdir = self.bucket_dir / bid
+            hit = {"ts": time.time(), "worker": self.wid, "epoch": epoch, "line_no": group[0]["line_no"],
+                   "state": trigger.get("state"), "send_type": trigger.get("send_type")}
+            if self.instance:
+                hit["instance"] = self.instance
+            try:
+                bdir.mkdir()
+                status = "new"
+            except FileExistsError:
+                status = "dup"
+            if status == "new":
+                with gzip.open(bdir / "context.log.gz", "wt", encoding="utf-8") as f:
+                    f.write(f"# core.log lines {lo}-{lo + len(window) - 1}, incident at L{group[0]['line_no']}\n")
+                    f.writelines(window)
+                rec = {"bucket": bid, "signature": sig, "incidents": group, **hit, **trigger}
+                with open(bdir / "trigger.json", "w") as f:
+                    json.dump(rec, f, indent=1, default=str)
+            with open(bdir / "hits.jsonl", "a") as f:
+                f.write(json.dumps(hit, default=str) + "\n")
+            results.append({"bucket": bid, "status": status, "dir": bdir, "signature": sig})
+        return results
+
+def crash_index(crash_dir) -> list:
+    # master side: one summary per bucket, most hit first
+    buckets = []
+    root = pathlib.Path(crash_dir) / "buckets"
+    if not root.is_dir():
+        return buckets
+    for bdir in root.iterdir():
+        trig = bdir / "trigger.json"
+        if not trig.exists():
+            continue
+        try:
+            rec = json.loads(trig.read_text())
+            hits = [json.loads(l) for l in (bdir / "hits.jsonl").read_text().splitlines() if l.strip()]
+        except (OSError, ValueError):
+            continue
+        sig = rec.get("signature", {})
+        buckets.append({"bucket": bdir.name, "component": sig.get("component"), "reason": sig.get("reason"),
+                        "location": sig.get("location"), "frames": sig.get("frames", []),
+                        "hits": len(hits), "workers": sorted({h.get("worker") for h in hits}),
+                        "first_ts": rec.get("ts"), "last_ts": max((h.get("ts", 0) for h in hits), default=rec.get("ts")),
+                        "state": rec.get("state"), "send_type": rec.get("send_type")})
+    buckets.sort(key=lambda b: (-b["hits"], b["first_ts"] or 0))
+    return buckets
@@ -0,0 +1,104 @@
+# Worker heartbeats and the master's watchdog checks
+# Every worker maps a small file under ctrl/heartbeat/ and rewrites one record
+# in it whenever the fuzz loop enters a phase: a sequence number, the wall time
+# of the beat, since when it is in the current phase, its episode count, its
+# pid and the phase name. Only the fuzz loop thread beats, so a worker blocked
+# on a socket or in a wait stops beating even though its metrics thread runs.
+# The master reads the records once a second and decides with WorkerWatch.check()
+# whether a worker is dead, silent, stuck in one wait, or spinning without
+# finishing episodes; run_parallel restarts it and appends the reason to
+# logs/watchdog.jsonl.
+import mmap, os, pathlib, struct, time
+from dotenv import dotenv_values
+
+config = dotenv_values(".env")
+
+HB_DIR = pathlib.Path("ctrl") / "heartbeat"
+HB_TIMEOUT = float(config.get('HB_TIMEOUT', 60))             # no beat at all for this long
+HB_START = float(config.get('HB_START', 120))                # first beat after spawn
+HB_WAIT_MAX = float(config.get('HB_WAIT_MAX', 120))          # in wait_epoch without a master reset
+HB_STALL = float(config.get('HB_STALL', 300))                # beating but no finished episode
+HB_GRACE = float(config.get('HB_GRACE', 5))                  # SIGINT to SIGKILL on a restart
+HB_MAX_RESTARTS = int(config.get('HB_MAX_RESTARTS', 3))      # per worker and round
+HB_FMT = struct.Struct("<QddQi20s")                           # seq, ts, phase since, episodes, pid, phase
+WAIT_PHASES = ("wait_epoch",)
+
+def heartbeat_path(wid: int) -> pathlib.Path:
+    return HB_DIR / f"w{wid}.hb"
+
+class Heartbeat:
+    # worker side, one record in a shared mapping
+    def __init__(self, wid: int):
+        HB_DIR.mkdir(parents=True, exist_ok=True)
+        path = heartbeat_path(wid)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, HB_FMT.size)
+            self.mm = mmap.mmap(fd, HB_FMT.size)
+        finally:
+            os.close(fd)
+        self.pid = os.getpid()
+        self.seq = 0
+        self.phase = ""
+        self.since = time.time()
+
+    def beat(self, phase: str, episodes: int = 0):
+        now = time.time()
+        if phase != self.phase:
+            self.phase, self.since = phase, now
+        self.seq += 1
+        HB_FMT.pack_into(self.mm, 0, self.seq, now, self.since, episodes, self.pid, phase.encode()[:20])
+
+def read_heartbeat(wid: int) -> dict | None:
+    try:
+        with open(heartbeat_path(wid), "rb") as f:
+            for _ in range(3):
+                a = f.read(HB_FMT.size)
+                f.seek(0)
+                b = f.read(HB_FMT.size)
+                f.seek(0)
+                if a == b:
+                    break
+    except OSError:
+        return None
+    if len(b) != HB_FMT.size:
+        return None
+    seq, ts, since, episodes, pid, phase = HB_FMT.unpack(b)
+    if not seq:
+        return None
+    return {"seq": seq, "ts": ts, "since": since, "episodes": episodes, "pid": pid,
+            "phase": phase.rstrip(b"\0").decode(errors="replace")}
+
+def clear_heartbeat(wid: int):
+    try:
+        heartbeat_path(wid).unlink()
+    except FileNotFoundError:
+        pass
+
+class WorkerWatch:
+    # master side state of one worker process
+    def __init__(self, pid: int, now: float):
+        self.pid = pid
+        self.spawned = now
+        self.episodes = -1
+        self.progress = now         # last time the episode count moved
+
+    def check(self, hb: dict | None, exit_code, now: float, resetting: bool) -> str | None:
+        # reason to restart the worker, or None
+        if exit_code is not None:
+            return f"exited with code {exit_code}"
+        if hb is None or hb["pid"] != self.pid:
+            return f"no heartbeat {now - self.spawned:.0f}s after spawn" if now - self.spawned > HB_START else None
+        if hb["episodes"] != self.episodes:
+            self.episodes, self.progress = hb["episodes"], now
+        if resetting:
+            # every worker waits while the master restarts the core
+            self.progress = now
+            return None
+        if now - hb["ts"] > HB_TIMEOUT:
+            return f"no heartbeat for {now - hb['ts']:.0f}s in {hb['phase']}"
+        if hb["phase"] in WAIT_PHASES and now - hb["since"] > HB_WAIT_MAX:
+            return f"in {hb['phase']} for {now - hb['since']:.0f}s"
+        if now - self.progress > HB_STALL:
+            return f"no episode for {now - self.progress:.0f}s (last phase {hb['phase']})"
+        return None